@@ -1,5 +1,5 @@
 # finz/app/config/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import os
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
@@ -26,6 +26,20 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Columnas nuevas en tablas que ya existían: create_all solo las crea junto con la tabla
+COLUMNAS_AGREGADAS = [
+    ("condiciones_alerta", "grupo_id INTEGER REFERENCES grupos_condicion(id)"),
+    ("notificaciones_outbox", "intentos INTEGER NOT NULL DEFAULT 0"),
+    ("alertas_porcentaje", "ventana_minutos INTEGER"),
+]
+
+
+def agregar_columnas():
+    """ALTER TABLE idempotente de las columnas agregadas (correr después de create_all)"""
+    with engine.begin() as conexion:
+        for tabla, columna in COLUMNAS_AGREGADAS:
+            conexion.execute(text(f"ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS {columna}"))
+
 
 def get_db():
     db = SessionLocal()
@@ -1,15 +1,30 @@
 from sqlalchemy.orm import Session
-from app.models.usuarios import Usuarios
 from app.services.alertas import AlertasService
+from app.services.cola_cambios import cola_cambios
+from app.services.indice_alertas import indice_alertas
+from app.services.cache_compartido import lider_refresco
 def evaluar_alertas(db: Session):
     """
-    Job que evalúa alertas.
+    Job que evalúa alertas de los tickers cuyo precio cambió.
     Recibe la DB desde el scheduler o desde un test.
     """
-    usuarios = db.query(Usuarios).all()
+    # Las alertas creadas en otros workers no pasan por el índice de este proceso
+    if lider_refresco.compartido and indice_alertas.reconstruir_si_cambio(db):
+        cola_cambios.publicar(*indice_alertas.tickers())
 
-    service = AlertasService(db)
-    for usuario in usuarios:
-        # AlertasService maneja lógica interna y notificaciones
-        service.evaluar_alertas(usuario.id)
-            
\ No newline at end of file
+    tickers = cola_cambios.tomar()
+    if not tickers:
+        return
+
+    try:
+        # Modo masivo con los precios recién refrescados: sin volver a consultar Yahoo
+        resultado = AlertasService(db).evaluar_alertas_bulk(tickers, desde_snapshot=True)
+    except Exception:
+        # Que los cambios no se pierdan si falla el ciclo
+        cola_cambios.publicar(*tickers)
+        raise
+    print(
+        f"🔔 Alertas: {resultado['alertas_evaluadas']} evaluadas ({resultado['alertas_omitidas']} sin cambios) "
+        f"en {resultado['tickers_evaluados']} tickers, {resultado['total_activadas']} activadas, "
+        f"filas escritas {resultado['filas_actualizadas']}, ratio omitidas {AlertasService.ratio_omitidas()}"
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy.orm import Session
+from app.services import outbox_notificaciones
+
+def drenar_notificaciones(db: Session):
+    """
+    Job que entrega las notificaciones pendientes del outbox.
+    Cada lote commitea su reclamo antes de entregar y su resultado al terminar.
+    """
+    total = {}
+    while True:
+        resultado = outbox_notificaciones.drenar(db)
+        for estado, cantidad in resultado.items():
+            total[estado] = total.get(estado, 0) + cantidad
+        # Los reintentos y los pushes lentos esperan a la próxima corrida del job
+        if sum(resultado.values()) < outbox_notificaciones.LOTE or resultado.get("reintento") or resultado.get("en_envio"):
+            break
+    if total:
+        print(f"📬 Notificaciones: {total}")
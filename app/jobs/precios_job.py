@@ -1,36 +1,65 @@
-import yfinance as yf
+import time
+from fastapi import HTTPException
+from sqlalchemy.exc import SQLAlchemyError
 from app.config.database import SessionLocal
 from app.models.alertas import AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta
-
-_precios_cache: dict = {}
+from app.services.cola_cambios import cola_cambios
+from app.services.snapshot_precios import snapshot_precios
+from app.services.historial_intradia import historial_intradia
+from app.services.indice_alertas import indice_alertas
+from app.services.planificador_precios import planificador_precios
+from app.services.precios_service import PreciosService
+from app.services import persistencia_precios
 
 def actualizar_precios_cache():
+    # La cadencia se cuenta desde el inicio del ciclo: lo que tarde la consulta no corre al ticker al ciclo siguiente
+    inicio = time.monotonic()
     db = SessionLocal()
     try:
         tickers = set()
         for model in [AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta]:
-            for a in db.query(model).filter(model.activo == True).all():
-                tickers.add(a.ticker)
-        
+            for (ticker,) in db.query(model.ticker).filter(model.activo == True).distinct():
+                tickers.add(ticker)
+
+        # Cada ticker se consulta con la cadencia de su nivel de proximidad;
+        # los que tienen alertas nuevas se consultan y evalúan ya
+        nuevos = indice_alertas.tomar_nuevos()
+        tickers = planificador_precios.vencidos(tickers, urgentes=nuevos, ahora=inicio)
         if not tickers:
             return
 
-        for t in tickers:
-            try:
-                info = yf.Ticker(t).info
-                precio = info.get("currentPrice") or info.get("regularMarketPrice")
-                if not precio:
-                    continue
-                apertura = info.get("regularMarketOpen", precio)
-                _precios_cache[t] = {
-                    "symbol": t,
-                    "price": round(precio, 2),
-                    "change": round(((precio - apertura) / apertura) * 100, 2)
-                }
-            except:
-                pass
+        # Cotizaciones de todos los tickers en consultas multi-símbolo. Los vencidos van
+        # siempre al proveedor: el TTL del cache haría que el nivel de 15s consulte cada 30s
+        try:
+            snapshot = PreciosService.obtener_snapshot(tickers, forzar=True)
+        except HTTPException as e:
+            print(f"❌ Error refrescando precios: {e.detail}")
+            return
+        cotizaciones = [
+            (t, round(precio, 2), cambio, volumen)
+            for t, precio, cambio, volumen in zip(snapshot["tickers"], snapshot["precio"], snapshot["cambio"], snapshot["volumen"])
+        ]
+        for t, precio, cambio, volumen in cotizaciones:
+            movido = snapshot_precios.actualizar(t, precio, cambio, volumen)
+            # Una muestra por refresco para ventanas intradía y sparklines
+            historial_intradia.agregar(t, precio, volumen)
+            # Solo los tickers que se movieron (o con alertas nuevas) disparan la evaluación
+            if movido or t in nuevos:
+                cola_cambios.publicar(t)
+            planificador_precios.reclasificar(t, indice_alertas.distancia(t, precio), ahora=inicio)
+        # Los que no cotizaron esperan la cadencia por defecto en vez de reintentar cada ciclo
+        for t in set(tickers) - set(snapshot["tickers"]):
+            planificador_precios.reclasificar(t, None, ahora=inicio)
+
+        # Persistido para que un reinicio arranque con el último precio conocido
+        try:
+            persistencia_precios.guardar(db, cotizaciones)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"❌ Error guardando snapshot de precios: {e}")
     finally:
         db.close()
 
 def get_cache() -> dict:
-    return _precios_cache
+    return snapshot_precios.como_dict()
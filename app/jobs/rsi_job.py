@@ -1,55 +1,57 @@
 from sqlalchemy.orm import Session
-from datetime import datetime
-import pytz
-import math
+import os
+import time
 from app.services.rsi_service import RSIService
-
-TZ_ARG = pytz.timezone("America/Argentina/Buenos_Aires")
-
-def esta_en_horario_mercado(ahora: datetime) -> bool:
-    """Verifica si estamos en horario de mercado USA (11:30 -> 18:00) en Buenos Aires."""
-    
-    # No opera sabados ni domingos
-    if ahora.weekday() >= 5:
-        return False
-    
-    # Horario de mercado 11:30 - 18:00
-    hora_apertura = ahora.replace(hour=11, minute=30, second=0, microsecond=0)
-    hora_cierre = ahora.replace(hour=18, minute=0, second=0, microsecond=0)
-    
-    # Usamos <= y < para evitar la ejecución justo al milisegundo de cierre (18:00:00)
-    return hora_apertura <= ahora < hora_cierre
+from app.services.pool_consultas import pool_consultas
+from app.services.calendario_mercado import calendario_mercado
+from app.services.cuota_api import libro_cuotas
+from app.providers.registro import obtener_proveedor
+
+# Contraste opcional con TwelveData: un lote multi-símbolo por ciclo, rotando
+VERIFICAR_TWELVEDATA = os.getenv("RSI_VERIFICAR_TWELVEDATA", "0") == "1"
+TOLERANCIA_VERIFICACION = 1.0
+# Créditos diarios de TwelveData que la verificación nunca toca
+RESERVA_TWELVEDATA = int(os.getenv("RSI_RESERVA_TWELVEDATA", "100"))
+_turno = 0
 
 def actualizar_rsi(db: Session):
-    ahora = datetime.now(TZ_ARG)
-
-    if not esta_en_horario_mercado(ahora):
-        return
-
-    limite_diario = 795
-    usados_hoy = RSIService.obtener_conteo_uso_hoy(db)
-
-    if usados_hoy >= limite_diario:
+    # Solo con rueda abierta (feriados, medias ruedas y horario de verano incluidos)
+    rueda = calendario_mercado.rueda()
+    if rueda is None:
         return
 
-    remaining_requests = limite_diario - usados_hoy
-
-    hora_cierre = ahora.replace(hour=18, minute=0, second=0, microsecond=0)
-    minutos_restantes = (hora_cierre - ahora).total_seconds() / 60
-
-    if minutos_restantes <= 0:
-        return
-
-    velocidad_optima = remaining_requests / minutos_restantes
-    batch_size = min(math.ceil(velocidad_optima), 5)
-
-    candidatos = RSIService.obtener_candidatos_actualizacion(db, batch_size)
-    if not candidatos:
+    tickers = RSIService.obtener_todos_los_tickers_seguidos(db)
+    if not tickers:
         return
 
-    for ticker in candidatos:
-        try:
-            result = RSIService.obtener_rsi_actual(ticker)
-            RSIService.guardar_rsi(db, result["ticker"], result["rsi_value"])
-        except Exception as e:
-            print(f"❌ Error {ticker}: {e}")
\ No newline at end of file
+    # Todos los tickers seguidos en cada ciclo: el cálculo es local, sin cupo de API
+    resultados = RSIService.calcular_rsi(tickers, db)
+    RSIService.guardar_rsi_lote(db, {ticker: r["rsi_value"] for ticker, r in resultados.items()})
+
+    if VERIFICAR_TWELVEDATA and resultados:
+        _verificar(db, resultados, cierre=rueda[1])
+
+def _verificar(db: Session, resultados: dict, cierre: float):
+    global _turno
+    fuente = obtener_proveedor().fuente("rsi")
+    # El cupo diario sale del libro de cuotas (compartido entre workers y reinicios)
+    restantes = libro_cuotas.restantes(fuente)
+    cantidad = pool_consultas.capacidad(fuente) or len(resultados)
+    if restantes is not None:
+        # Lo disponible sobre la reserva se reparte en los minutos que le quedan a la rueda
+        disponibles = restantes - RESERVA_TWELVEDATA
+        if disponibles <= 0:
+            return
+        minutos = max((cierre - time.time()) / 60, 1)
+        cantidad = min(cantidad, max(1, int(disponibles // minutos)))
+
+    # Rotando: cada ciclo verifica los siguientes `cantidad` tickers
+    ordenados = sorted(resultados)
+    tickers = [ordenados[(_turno + i) % len(ordenados)] for i in range(min(cantidad, len(ordenados)))]
+    _turno += len(tickers)
+
+    externos = RSIService.obtener_rsi_proveedor(tickers)
+    for ticker, externo in externos.items():
+        diferencia = abs(externo["rsi_value"] - resultados[ticker]["rsi_value"])
+        if diferencia > TOLERANCIA_VERIFICACION:
+            print(f"⚠️ RSI {ticker}: local {resultados[ticker]['rsi_value']} vs TwelveData {externo['rsi_value']}")
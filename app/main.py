@@ -55,26 +55,81 @@ app.include_router(analisis_router)
 
 @app.on_event("startup")
 async def startup_event():
-    from app.config.database import engine, Base
+    from app.config.database import engine, Base, agregar_columnas
     from app.services.mag7_service import actualizar_cache
+    from app.config.database import SessionLocal
+    from app.services.indice_alertas import indice_alertas
+    from app.services.alertas import AlertasService
+    from app.services.cache_compartido import lider_refresco
+    from app.services import persistencia_precios
+    from app.models.rsi import RSI
+    from app.models.notificaciones import NotificacionOutbox
     Base.metadata.create_all(bind=engine)
-    scheduler.start()
-    print("🚀 Scheduler de alertas iniciado")
-    actualizar_cache()
+    agregar_columnas()
+    # create_all no agrega índices nuevos a tablas que ya existían
+    for indice in [*RSI.__table__.indexes, *NotificacionOutbox.__table__.indexes]:
+        indice.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        AlertasService(db).sincronizar_registro()
+        indice_alertas.reconstruir(db)
+    finally:
+        db.close()
+
+    def iniciar_refresco():
+        # Últimos precios conocidos (stale) hasta que termine el primer refresco
+        db = SessionLocal()
+        try:
+            print(f"💾 {persistencia_precios.restaurar(db)} precios restaurados del snapshot")
+        finally:
+            db.close()
+        scheduler.start()
+        print("🚀 Scheduler de alertas iniciado")
+        actualizar_cache()
+
+    # Con varios workers solo el líder refresca; los demás leen el cache compartido
+    if lider_refresco.intentar():
+        iniciar_refresco()
+    else:
+        print("⏸️ Otro worker refresca los precios; este queda en espera")
+        lider_refresco.esperar(iniciar_refresco)
 
 @app.on_event("shutdown") 
 async def shutdown_event():
-    scheduler.shutdown()
+    from app.services.push_service import despachador_push
+    from app.providers.registro import obtener_proveedor
+    from app.providers.replay import ProveedorGrabador
+    from app.services.pool_consultas import pool_consultas
+    from app.services.cuota_api import libro_cuotas
+    if scheduler.running:
+        scheduler.shutdown()
+    despachador_push.detener()
+    pool_consultas.detener()
+    libro_cuotas.volcar()
+    # Con GRABAR_FIXTURES las respuestas de la sesión quedan listas para el replay
+    proveedor = obtener_proveedor()
+    if isinstance(proveedor, ProveedorGrabador):
+        proveedor.guardar()
     print("🛑 Scheduler detenido")
 
 @app.get("/health")
 async def health():
     """Endpoint para keep alive de Github Actions"""
     from datetime import datetime
+    from app.services.cache_cotizaciones import cache_cotizaciones
+    from app.services.planificador_precios import planificador_precios
+    from app.services.calendario_mercado import compuerta_mercado
+    from app.services.difusion_precios import difusion_precios
+    from app.services.cuota_api import libro_cuotas
     return {
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
-        "scheduler_running": scheduler.running
+        "scheduler_running": scheduler.running,
+        "cache_cotizaciones": cache_cotizaciones.metricas(),
+        "polling_precios": planificador_precios.metricas(),
+        "mercado": compuerta_mercado.metricas(),
+        "stream_precios": difusion_precios.metricas(),
+        "cuota_api": libro_cuotas.metricas()
     }
 
 @app.get("/")
@@ -3,7 +3,15 @@ from app.config.database import Base
 from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, CheckConstraint, Enum, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from app.enums.alertas import CampoEnum, TipoCondicionEnum
+from app.enums.alertas import CampoEnum, TipoCondicionEnum, TipoAlertaEnum
+
+# Registro global: un ID único para las 4 tablas de alertas, con su tipo y dueño
+class AlertaRegistro(Base):
+    __tablename__ = 'alertas_registro'
+
+    id = Column(Integer, primary_key=True)
+    tipo = Column(Enum(TipoAlertaEnum), nullable=False)
+    user_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False, index=True)
 
 # Modelo base con campos comunes / abstracto
 class AlertaBase(Base):
@@ -48,6 +56,7 @@ class AlertaPorcentaje(AlertaBase):
     campo = Column(Enum(CampoEnum), nullable=False)
     porcentaje_cambio = Column(Float, nullable=False)  # +5.0 = subió 5%, -10.0 = bajó 10%
     precio_referencia = Column(Float, nullable=True)  # Para tracking del cambio
+    ventana_minutos = Column(Integer, nullable=True)  # Con ventana: movimiento dentro de los últimos N minutos
     
     usuario = relationship("Usuarios", backref="alertas_porcentaje")
 
@@ -57,17 +66,31 @@ class CondicionAlerta(Base):
     
     id = Column(Integer, primary_key=True)
     alerta_compuesta_id = Column(Integer, ForeignKey('alertas_compuesta.id'), nullable=False)
+    grupo_id = Column(Integer, ForeignKey('grupos_condicion.id'), nullable=True)  # NULL = raíz de la alerta
     campo = Column(Enum(CampoEnum), nullable=False)
     tipo_condicion = Column(Enum(TipoCondicionEnum), nullable=False)
     valor = Column(Float, nullable=False)
     orden = Column(Integer, nullable=False)  # Para mantener el orden
 
+# Grupo anidado de condiciones: (precio > X AND (volumen > Y OR precio < Z))
+class GrupoCondicion(Base):
+    __tablename__ = 'grupos_condicion'
+
+    id = Column(Integer, primary_key=True)
+    alerta_compuesta_id = Column(Integer, ForeignKey('alertas_compuesta.id'), nullable=False)
+    grupo_padre_id = Column(Integer, ForeignKey('grupos_condicion.id'), nullable=True)  # NULL = cuelga de la raíz
+    operador_logico = Column(String(3), default="AND")  # AND, OR
+    orden = Column(Integer, nullable=False)
+
+    condiciones = relationship("CondicionAlerta", backref="grupo")
+
 # Alerta Compuesta: (precio > X AND volumen > Y) OR (precio < Z)
 class AlertaCompuesta(AlertaBase):
     __tablename__ = 'alertas_compuesta'
     
     operador_logico = Column(String(3), default="AND")  # AND, OR
     
-    # Relación con las condiciones
+    # Relación con las condiciones (todas, también las de grupos anidados)
     condiciones = relationship("CondicionAlerta", backref="alerta_compuesta", cascade="all, delete-orphan")
+    grupos = relationship("GrupoCondicion", cascade="all, delete-orphan")
     usuario = relationship("Usuarios", backref="alertas_compuesta")
\ No newline at end of file
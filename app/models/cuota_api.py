@@ -0,0 +1,14 @@
+# app/models/cuota_api.py
+from app.config.database import Base
+from sqlalchemy import Column, Integer, String, Date, DateTime
+
+# Consumo de APIs externas por proveedor y día (UTC), sumado por todos los procesos
+class CuotaAPI(Base):
+    __tablename__ = "cuota_api"
+
+    proveedor = Column(String(20), primary_key=True)
+    dia = Column(Date, primary_key=True)
+    consultas = Column(Integer, nullable=False, default=0)
+    creditos = Column(Integer, nullable=False, default=0)
+    primera_at = Column(DateTime, nullable=False)
+    ultima_at = Column(DateTime, nullable=False)
@@ -1,9 +1,36 @@
 from app.config.database import Base
-from sqlalchemy import Column, Integer, String, JSON
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Index, func, text
 
 class Suscripcion(Base):
     __tablename__ = "suscripciones_push"
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, unique=True, nullable=False)
-    subscription_data = Column(JSON, nullable=False)
\ No newline at end of file
+    subscription_data = Column(JSON, nullable=False)
+
+# Outbox: una fila por activación, escrita en la misma transacción que activada_at
+class NotificacionOutbox(Base):
+    __tablename__ = "notificaciones_outbox"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    activacion = Column(String(50), nullable=False)  # ej: "simple-12", "rango-salida-7"
+    mensaje = Column(String, nullable=False)
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente, en_envio, enviada, cooldown, sin_suscripcion, fallida, incierta
+    intentos = Column(Integer, nullable=False, default=0, server_default="0")  # entregas fallidas o sin respuesta
+    created_at = Column(DateTime, default=func.now())
+    procesada_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # El drenador solo recorre las pendientes
+        Index("ix_outbox_pendientes", "id", postgresql_where=text("estado = 'pendiente'")),
+        # Usuarios con un push en vuelo
+        Index("ix_outbox_en_envio", "user_id", postgresql_where=text("estado = 'en_envio'")),
+    )
+
+# Cooldown por usuario compartido entre procesos
+class CooldownNotificacion(Base):
+    __tablename__ = "notificaciones_cooldown"
+
+    user_id = Column(Integer, primary_key=True)
+    ultima_notif_at = Column(DateTime, nullable=False)
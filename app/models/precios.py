@@ -0,0 +1,13 @@
+# app/models/precios.py
+from app.config.database import Base
+from sqlalchemy import Column, String, Float, BigInteger, DateTime, func
+
+# Última cotización conocida por ticker, para arrancar con precios después de un reinicio
+class PrecioSnapshot(Base):
+    __tablename__ = "precios_snapshot"
+
+    ticker = Column(String(10), primary_key=True)
+    precio = Column(Float, nullable=False)
+    cambio = Column(Float)
+    volumen = Column(BigInteger)
+    actualizado_at = Column(DateTime, default=func.now(), nullable=False)
@@ -1,6 +1,6 @@
 # app/models/rsi.py
 from app.config.database import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, func, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 
 class RSI(Base):
@@ -11,6 +11,22 @@ class RSI(Base):
     rsi_value = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=func.now(), nullable=False)
 
+    # Último registro por ticker (DISTINCT ON) recorriendo el índice, sin ordenar
+    __table_args__ = (
+        Index("ix_rsi_history_ticker_timestamp", "ticker", timestamp.desc()),
+    )
+
+# Estado de Wilder al cierre de la última rueda: el RSI siguiente sale en O(1)
+class RSIEstado(Base):
+    __tablename__ = "rsi_estado"
+
+    ticker = Column(String(10), primary_key=True)
+    prom_suba = Column(Float, nullable=False)
+    prom_baja = Column(Float, nullable=False)
+    ultimo_cierre = Column(Float, nullable=False)
+    fecha_barra = Column(Date, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
 class SeguimientoRSI(Base):
     __tablename__ = "seguimiento_rsi"
 
@@ -0,0 +1,101 @@
+# app/providers/base.py
+from abc import ABC, abstractmethod
+from datetime import date
+
+
+class ProveedorMercado(ABC):
+    """
+    Fuente de datos de mercado. Cada implementación cubre cotizaciones, barras
+    diarias, RSI, calendario de earnings y fundamentales; los errores salen como HTTPException
+    (400 si falta configuración, 404 si no hay datos, 503 si el proveedor falla).
+    """
+
+    nombre = "base"
+
+    def fuente(self, tipo: str) -> str:
+        """Nombre del proveedor que atiende un tipo de dato (para aplicar su cupo)"""
+        return self.nombre
+
+    @abstractmethod
+    def cotizaciones(self, simbolos: list[str]) -> dict:
+        """{símbolo: {"precio", "volumen", "cambio"}} de los símbolos que cotizaron"""
+
+    @abstractmethod
+    def barras_diarias(self, ticker: str, desde: date) -> list[dict]:
+        """Barras diarias desde `desde`, de la más vieja a la más nueva: {"fecha", "apertura", "maximo", "minimo", "cierre", "volumen"}"""
+
+    def cierres_diarios(self, simbolos: list[str], desde: date) -> dict:
+        """
+        {símbolo: [(fecha, cierre), ...]} desde `desde`, de la más vieja a la más nueva.
+        Por defecto una consulta de barras por símbolo; los proveedores con descarga
+        multi-símbolo la sobreescriben.
+        """
+        resultado = {}
+        for simbolo in simbolos:
+            barras = self.barras_diarias(simbolo, desde)
+            if barras:
+                resultado[simbolo] = [(barra["fecha"], barra["cierre"]) for barra in barras]
+        return resultado
+
+    @abstractmethod
+    def rsi(self, ticker: str, periodo: int = 14) -> dict:
+        """Último RSI diario: {"valor", "fecha"}"""
+
+    def rsi_lote(self, simbolos: list[str], periodo: int = 14) -> dict:
+        """
+        {símbolo: {"valor", "fecha"}} de los símbolos con RSI. Por defecto una consulta
+        por símbolo; los proveedores con consultas multi-símbolo la sobreescriben.
+        """
+        return {simbolo: self.rsi(simbolo, periodo) for simbolo in simbolos}
+
+    @abstractmethod
+    def earnings(self, ticker: str, desde: date, hasta: date) -> list[date]:
+        """Fechas de reporte de resultados entre `desde` y `hasta`"""
+
+    @abstractmethod
+    def fundamentales(self, ticker: str) -> dict:
+        """Datos de la empresa: {"nombre", "sector", "industria", "precio_actual", "pe_ratio", "market_cap", ...}"""
+
+
+class ProveedorCombinado(ProveedorMercado):
+    """Arma un proveedor tomando cada tipo de dato de una fuente distinta"""
+
+    nombre = "combinado"
+
+    def __init__(self, cotizaciones: ProveedorMercado, barras: ProveedorMercado, rsi: ProveedorMercado, earnings: ProveedorMercado,
+                 fundamentales: ProveedorMercado):
+        self._cotizaciones = cotizaciones
+        self._barras = barras
+        self._rsi = rsi
+        self._earnings = earnings
+        self._fundamentales = fundamentales
+
+    def fuente(self, tipo: str) -> str:
+        return {
+            "cotizaciones": self._cotizaciones,
+            "barras": self._barras,
+            "rsi": self._rsi,
+            "earnings": self._earnings,
+            "fundamentales": self._fundamentales,
+        }[tipo].fuente(tipo)
+
+    def cotizaciones(self, simbolos: list[str]) -> dict:
+        return self._cotizaciones.cotizaciones(simbolos)
+
+    def barras_diarias(self, ticker: str, desde: date) -> list[dict]:
+        return self._barras.barras_diarias(ticker, desde)
+
+    def cierres_diarios(self, simbolos: list[str], desde: date) -> dict:
+        return self._barras.cierres_diarios(simbolos, desde)
+
+    def rsi(self, ticker: str, periodo: int = 14) -> dict:
+        return self._rsi.rsi(ticker, periodo)
+
+    def rsi_lote(self, simbolos: list[str], periodo: int = 14) -> dict:
+        return self._rsi.rsi_lote(simbolos, periodo)
+
+    def earnings(self, ticker: str, desde: date, hasta: date) -> list[date]:
+        return self._earnings.earnings(ticker, desde, hasta)
+
+    def fundamentales(self, ticker: str) -> dict:
+        return self._fundamentales.fundamentales(ticker)
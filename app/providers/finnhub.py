@@ -0,0 +1,47 @@
+# app/providers/finnhub.py
+import os
+from datetime import date, datetime
+import requests
+from fastapi import HTTPException
+from app.providers.base import ProveedorMercado
+
+URL_EARNINGS = "https://finnhub.io/api/v1/calendar/earnings"
+
+
+class ProveedorFinnhub(ProveedorMercado):
+    nombre = "finnhub"
+
+    def earnings(self, ticker: str, desde: date, hasta: date) -> list[date]:
+        api_key = os.getenv("FINNHUB_API_KEY")
+        if not api_key:
+            raise HTTPException(400, "FINNHUB_API_KEY no configurada")
+
+        params = {
+            "token": api_key,
+            "symbol": ticker,
+            "from": desde.isoformat(),
+            "to": hasta.isoformat(),
+        }
+        try:
+            response = requests.get(URL_EARNINGS, params=params, timeout=10)
+        except requests.exceptions.RequestException as e:
+            raise HTTPException(503, f"Error conectando con Finnhub: {str(e)}")
+        if response.status_code != 200:
+            raise HTTPException(503, f"Error Finnhub: {response.status_code}")
+
+        return [
+            datetime.strptime(earning["date"], "%Y-%m-%d").date()
+            for earning in response.json().get("earningsCalendar", [])
+        ]
+
+    def cotizaciones(self, simbolos: list[str]) -> dict:
+        raise HTTPException(400, "Cotizaciones de Finnhub no implementadas")
+
+    def barras_diarias(self, ticker: str, desde: date) -> list[dict]:
+        raise HTTPException(400, "Barras de Finnhub no implementadas")
+
+    def rsi(self, ticker: str, periodo: int = 14) -> dict:
+        raise HTTPException(400, "Finnhub no provee RSI")
+
+    def fundamentales(self, ticker: str) -> dict:
+        raise HTTPException(400, "Fundamentales de Finnhub no implementados")
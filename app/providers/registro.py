@@ -0,0 +1,46 @@
+# app/providers/registro.py
+import os
+from app.providers.base import ProveedorMercado, ProveedorCombinado
+from app.providers.yahoo import ProveedorYahoo
+from app.providers.twelvedata import ProveedorTwelveData
+from app.providers.finnhub import ProveedorFinnhub
+from app.providers.replay import ProveedorReplay, ProveedorGrabador
+
+_proveedor: ProveedorMercado | None = None
+
+
+def obtener_proveedor() -> ProveedorMercado:
+    """
+    Proveedor elegido con PROVEEDOR_DATOS: "vendors" (default: Yahoo, TwelveData
+    y Finnhub) o "replay" (offline). Con GRABAR_FIXTURES se graban las respuestas.
+    """
+    global _proveedor
+    if _proveedor is None:
+        _proveedor = crear_proveedor(os.getenv("PROVEEDOR_DATOS", "vendors"))
+    return _proveedor
+
+
+def configurar_proveedor(proveedor: ProveedorMercado | None):
+    """Reemplaza el proveedor del proceso (None vuelve a leer la configuración)"""
+    global _proveedor
+    _proveedor = proveedor
+
+
+def crear_proveedor(nombre: str) -> ProveedorMercado:
+    if nombre == "replay":
+        proveedor = ProveedorReplay(
+            fixtures=os.getenv("REPLAY_FIXTURES"),
+            semilla=int(os.getenv("REPLAY_SEMILLA", "0")),
+            latencia_ms=float(os.getenv("REPLAY_LATENCIA_MS", "0")),
+        )
+    elif nombre == "vendors":
+        yahoo = ProveedorYahoo()
+        proveedor = ProveedorCombinado(
+            cotizaciones=yahoo, barras=yahoo, rsi=ProveedorTwelveData(), earnings=ProveedorFinnhub(), fundamentales=yahoo
+        )
+    else:
+        raise ValueError(f"PROVEEDOR_DATOS desconocido: {nombre}")
+
+    if os.getenv("GRABAR_FIXTURES"):
+        proveedor = ProveedorGrabador(proveedor, os.getenv("GRABAR_FIXTURES"))
+    return proveedor
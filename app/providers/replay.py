@@ -0,0 +1,198 @@
+# app/providers/replay.py
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from app.providers.base import ProveedorMercado
+
+
+class ProveedorReplay(ProveedorMercado):
+    """
+    Proveedor determinístico para tests y benchmarks sin red. Sirve las respuestas
+    grabadas en `fixtures` (JSON con cotizaciones, barras, rsi, earnings y fundamentales por ticker)
+    y, para lo que no esté grabado, precios sintéticos con un random walk que
+    depende solo de la semilla y del número de consulta. `latencia_ms` simula la red.
+    """
+
+    nombre = "replay"
+
+    def __init__(self, fixtures: str | dict | None = None, semilla: int = 0, latencia_ms: float = 0):
+        if isinstance(fixtures, str):
+            with open(fixtures, encoding="utf-8") as archivo:
+                fixtures = json.load(archivo)
+        self._fixtures = fixtures or {}
+        self.semilla = semilla
+        self.latencia_ms = latencia_ms
+        self._lock = threading.Lock()
+        self._pasos = defaultdict(int)
+        self._precios: dict[str, tuple] = {}  # símbolo -> (apertura, último)
+        self.llamadas = Counter()
+
+    # ========== API ==========
+    def cotizaciones(self, simbolos: list[str]) -> dict:
+        self._consultar("cotizaciones")
+        grabadas = self._fixtures.get("cotizaciones", {})
+        resultado = {}
+        with self._lock:
+            for simbolo in simbolos:
+                paso = self._pasos[simbolo]
+                self._pasos[simbolo] += 1
+                if simbolo in grabadas:
+                    serie = grabadas[simbolo]
+                    if serie:
+                        resultado[simbolo] = dict(serie[paso % len(serie)])
+                else:
+                    resultado[simbolo] = self._cotizacion_sintetica(simbolo, paso)
+        return resultado
+
+    def barras_diarias(self, ticker: str, desde: date) -> list[dict]:
+        self._consultar("barras")
+        grabadas = self._fixtures.get("barras", {})
+        if ticker in grabadas:
+            barras = [{**barra, "fecha": date.fromisoformat(barra["fecha"])} for barra in grabadas[ticker]]
+            return [barra for barra in barras if barra["fecha"] >= desde]
+
+        rng = self._rng(ticker, "barras", desde)
+        cierre = self._precio_base(ticker)
+        barras = []
+        dia = desde
+        while dia <= date.today():
+            if dia.weekday() < 5:
+                apertura = cierre
+                cierre = round(apertura * (1 + rng.gauss(0, 0.015)), 2)
+                barras.append({
+                    "fecha": dia,
+                    "apertura": apertura,
+                    "maximo": round(max(apertura, cierre) * (1 + abs(rng.gauss(0, 0.005))), 2),
+                    "minimo": round(min(apertura, cierre) * (1 - abs(rng.gauss(0, 0.005))), 2),
+                    "cierre": cierre,
+                    "volumen": rng.randint(500_000, 5_000_000),
+                })
+            dia += timedelta(days=1)
+        return barras
+
+    def rsi(self, ticker: str, periodo: int = 14) -> dict:
+        self._consultar("rsi")
+        grabado = self._fixtures.get("rsi", {}).get(ticker)
+        if grabado is not None:
+            return dict(grabado)
+        hoy = date.today()
+        return {"valor": round(self._rng(ticker, "rsi", hoy).uniform(15, 85), 2), "fecha": hoy.isoformat()}
+
+    def earnings(self, ticker: str, desde: date, hasta: date) -> list[date]:
+        self._consultar("earnings")
+        grabadas = self._fixtures.get("earnings", {})
+        if ticker in grabadas:
+            fechas = [date.fromisoformat(f) for f in grabadas[ticker]]
+        else:
+            # Un reporte por trimestre, en un día fijo por ticker
+            dia = 15 + zlib.crc32(ticker.encode()) % 14
+            fechas = [date(anio, mes, dia) for anio in range(desde.year, hasta.year + 1) for mes in (1, 4, 7, 10)]
+        return [fecha for fecha in fechas if desde <= fecha <= hasta]
+
+    def fundamentales(self, ticker: str) -> dict:
+        self._consultar("fundamentales")
+        grabados = self._fixtures.get("fundamentales", {}).get(ticker)
+        if grabados is not None:
+            return dict(grabados)
+        rng = self._rng(ticker, "fundamentales")
+        precio = self._precio_base(ticker)
+        return {
+            "nombre": f"{ticker} Inc.",
+            "sector": rng.choice(["Technology", "Healthcare", "Financial Services", "Consumer Cyclical", "Energy"]),
+            "industria": None,
+            "precio_actual": precio,
+            "pe_ratio": round(rng.uniform(8, 60), 2),
+            "market_cap": rng.randint(1, 3000) * 1_000_000_000,
+            "revenue": rng.randint(1, 400) * 1_000_000_000,
+            "margen_bruto": round(rng.uniform(0.2, 0.8), 4),
+            "max_52w": round(precio * rng.uniform(1.05, 1.5), 2),
+            "min_52w": round(precio * rng.uniform(0.5, 0.95), 2),
+            "media_50d": round(precio * rng.uniform(0.9, 1.1), 2),
+            "media_200d": round(precio * rng.uniform(0.8, 1.2), 2),
+            "volumen_promedio": rng.randint(500_000, 50_000_000),
+            "beta": round(rng.uniform(0.5, 2.0), 2),
+        }
+
+    # ========== HELPERS ==========
+    def _consultar(self, tipo: str):
+        self.llamadas[tipo] += 1
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+
+    def _rng(self, *partes) -> random.Random:
+        return random.Random(":".join(str(p) for p in (self.semilla, *partes)))
+
+    def _precio_base(self, simbolo: str) -> float:
+        return float(20 + zlib.crc32(simbolo.encode()) % 480)
+
+    def _cotizacion_sintetica(self, simbolo: str, paso: int) -> dict:
+        apertura, precio = self._precios.get(simbolo) or (self._precio_base(simbolo),) * 2
+        rng = self._rng(simbolo, paso)
+        precio = round(precio * (1 + rng.gauss(0, 0.002)), 2)
+        self._precios[simbolo] = (apertura, precio)
+        return {
+            "precio": precio,
+            "volumen": 1_000_000 + paso * rng.randint(1_000, 10_000),
+            "cambio": round(((precio - apertura) / apertura) * 100, 2),
+        }
+
+
+class ProveedorGrabador(ProveedorMercado):
+    """Envuelve un proveedor real y guarda sus respuestas en el formato de fixtures del replay"""
+
+    nombre = "grabador"
+
+    def __init__(self, proveedor: ProveedorMercado, ruta: str):
+        self.proveedor = proveedor
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self.grabado = {"cotizaciones": defaultdict(list), "barras": {}, "rsi": {}, "earnings": {}, "fundamentales": {}}
+
+    def fuente(self, tipo: str) -> str:
+        return self.proveedor.fuente(tipo)
+
+    def cotizaciones(self, simbolos: list[str]) -> dict:
+        resultado = self.proveedor.cotizaciones(simbolos)
+        with self._lock:
+            for simbolo, fila in resultado.items():
+                self.grabado["cotizaciones"][simbolo].append(fila)
+        return resultado
+
+    def barras_diarias(self, ticker: str, desde: date) -> list[dict]:
+        barras = self.proveedor.barras_diarias(ticker, desde)
+        with self._lock:
+            self.grabado["barras"][ticker] = [{**barra, "fecha": barra["fecha"].isoformat()} for barra in barras]
+        return barras
+
+    def rsi(self, ticker: str, periodo: int = 14) -> dict:
+        resultado = self.proveedor.rsi(ticker, periodo)
+        with self._lock:
+            self.grabado["rsi"][ticker] = resultado
+        return resultado
+
+    def rsi_lote(self, simbolos: list[str], periodo: int = 14) -> dict:
+        resultado = self.proveedor.rsi_lote(simbolos, periodo)
+        with self._lock:
+            self.grabado["rsi"].update(resultado)
+        return resultado
+
+    def earnings(self, ticker: str, desde: date, hasta: date) -> list[date]:
+        fechas = self.proveedor.earnings(ticker, desde, hasta)
+        with self._lock:
+            self.grabado["earnings"][ticker] = [fecha.isoformat() for fecha in fechas]
+        return fechas
+
+    def fundamentales(self, ticker: str) -> dict:
+        datos = self.proveedor.fundamentales(ticker)
+        with self._lock:
+            self.grabado["fundamentales"][ticker] = datos
+        return datos
+
+    def guardar(self):
+        with self._lock:
+            with open(self.ruta, "w", encoding="utf-8") as archivo:
+                json.dump(self.grabado, archivo, indent=2, default=str)
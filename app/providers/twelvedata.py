@@ -0,0 +1,67 @@
+# app/providers/twelvedata.py
+import os
+from datetime import date
+import requests
+from fastapi import HTTPException
+from app.providers.base import ProveedorMercado
+
+URL_RSI = "https://api.twelvedata.com/rsi"
+
+
+class ProveedorTwelveData(ProveedorMercado):
+    nombre = "twelvedata"
+
+    def rsi(self, ticker: str, periodo: int = 14) -> dict:
+        resultado = self.rsi_lote([ticker], periodo)
+        if ticker.upper() not in resultado:
+            raise HTTPException(503, f"TwelveData no devolvió valores para {ticker}")
+        return resultado[ticker.upper()]
+
+    def rsi_lote(self, simbolos: list[str], periodo: int = 14) -> dict:
+        """Una consulta con `symbol` separado por comas; cada símbolo consume un crédito"""
+        api_key = os.getenv('TWELVEDATA_API_KEY')
+        if not api_key:
+            raise HTTPException(400, "TWELVEDATA_API_KEY no configurada")
+
+        simbolos = [simbolo.upper() for simbolo in simbolos]
+        params = {
+            "symbol": ",".join(simbolos),
+            "interval": "1day",
+            "time_period": periodo,
+            "outputsize": 1,
+            "apikey": api_key
+        }
+
+        try:
+            response = requests.get(URL_RSI, params=params, timeout=10)
+        except requests.exceptions.RequestException as e:
+            raise HTTPException(503, f"Error conectando con Twelve Data: {str(e)}")
+
+        data = response.json()
+        # TwelveData devuelve mensajes de error útiles en el JSON (a veces con status 200)
+        if response.status_code != 200 or data.get("status") == "error":
+            raise HTTPException(503, data.get("message", f"Error TwelveData: {response.status_code}"))
+
+        # Con un solo símbolo la respuesta no viene indexada por símbolo
+        por_simbolo = {simbolos[0]: data} if len(simbolos) == 1 else data
+        resultado = {}
+        for simbolo in simbolos:
+            valores = (por_simbolo.get(simbolo) or {}).get("values")
+            if not valores:
+                print(f"⚠️ TwelveData no devolvió RSI de {simbolo}: {por_simbolo.get(simbolo)}")
+                continue
+            # Último valor RSI
+            resultado[simbolo] = {"valor": float(valores[0]["rsi"]), "fecha": valores[0]["datetime"]}
+        return resultado
+
+    def cotizaciones(self, simbolos: list[str]) -> dict:
+        raise HTTPException(400, "Cotizaciones de TwelveData no implementadas")
+
+    def barras_diarias(self, ticker: str, desde: date) -> list[dict]:
+        raise HTTPException(400, "Barras de TwelveData no implementadas")
+
+    def earnings(self, ticker: str, desde: date, hasta: date) -> list[date]:
+        raise HTTPException(400, "TwelveData no provee calendario de earnings")
+
+    def fundamentales(self, ticker: str) -> dict:
+        raise HTTPException(400, "Fundamentales de TwelveData no implementados")
@@ -0,0 +1,92 @@
+# app/providers/yahoo.py
+from datetime import date
+import yfinance as yf
+from yfinance.data import YfData
+from fastapi import HTTPException
+from app.providers.base import ProveedorMercado
+
+URL_COTIZACIONES = "https://query1.finance.yahoo.com/v7/finance/quote"
+
+
+class ProveedorYahoo(ProveedorMercado):
+    nombre = "yahoo"
+
+    def cotizaciones(self, simbolos: list[str]) -> dict:
+        """Una consulta liviana (v7/quote) para todos los símbolos"""
+        respuesta = YfData().get_raw_json(URL_COTIZACIONES, params={"symbols": ",".join(simbolos), "formatted": "false"})
+        cotizaciones = {}
+        for quote in respuesta.get("quoteResponse", {}).get("result", []):
+            precio = quote.get("regularMarketPrice")
+            if not precio:
+                continue
+            apertura = quote.get("regularMarketOpen") or precio
+            cotizaciones[quote["symbol"].upper()] = {
+                "precio": precio,
+                "volumen": quote.get("regularMarketVolume"),
+                "cambio": round(((precio - apertura) / apertura) * 100, 2),
+            }
+        return cotizaciones
+
+    def barras_diarias(self, ticker: str, desde: date) -> list[dict]:
+        try:
+            data = yf.Ticker(ticker).history(start=desde.isoformat())
+        except Exception as e:
+            raise HTTPException(503, f"Error obteniendo barras de {ticker}: {str(e)}")
+        return [
+            {
+                "fecha": indice.date(),
+                "apertura": float(fila["Open"]),
+                "maximo": float(fila["High"]),
+                "minimo": float(fila["Low"]),
+                "cierre": float(fila["Close"]),
+                "volumen": int(fila["Volume"]),
+            }
+            for indice, fila in data.iterrows()
+        ]
+
+    def cierres_diarios(self, simbolos: list[str], desde: date) -> dict:
+        """Cierres de todos los símbolos en una llamada a yf.download (una consulta HTTP por símbolo)"""
+        try:
+            data = yf.download(
+                simbolos, start=desde.isoformat(), interval="1d", group_by="ticker",
+                auto_adjust=True, progress=False, threads=True
+            )
+        except Exception as e:
+            raise HTTPException(503, f"Error descargando cierres: {str(e)}")
+        cierres = {}
+        for simbolo in simbolos:
+            try:
+                serie = data[simbolo]["Close"].dropna()
+            except KeyError:
+                continue
+            if not serie.empty:
+                cierres[simbolo] = [(indice.date(), float(valor)) for indice, valor in serie.items()]
+        return cierres
+
+    def rsi(self, ticker: str, periodo: int = 14) -> dict:
+        raise HTTPException(400, "Yahoo no provee RSI")
+
+    def earnings(self, ticker: str, desde: date, hasta: date) -> list[date]:
+        raise HTTPException(400, "Yahoo no provee calendario de earnings")
+
+    def fundamentales(self, ticker: str) -> dict:
+        try:
+            info = yf.Ticker(ticker).info
+        except Exception as e:
+            raise HTTPException(503, f"Error obteniendo fundamentales de {ticker}: {str(e)}")
+        return {
+            "nombre": info.get("longName"),
+            "sector": info.get("sector"),
+            "industria": info.get("industry"),
+            "precio_actual": info.get("currentPrice") or info.get("regularMarketPrice"),
+            "pe_ratio": info.get("trailingPE"),
+            "market_cap": info.get("marketCap"),
+            "revenue": info.get("totalRevenue"),
+            "margen_bruto": info.get("grossMargins"),
+            "max_52w": info.get("fiftyTwoWeekHigh"),
+            "min_52w": info.get("fiftyTwoWeekLow"),
+            "media_50d": info.get("fiftyDayAverage"),
+            "media_200d": info.get("twoHundredDayAverage"),
+            "volumen_promedio": info.get("averageVolume"),
+            "beta": info.get("beta"),
+        }
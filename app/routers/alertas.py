@@ -1,10 +1,13 @@
 # finz/app/routers/alertas.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List
+from datetime import datetime
 from sqlalchemy.orm import Session
 
-from app.config.database import get_db
+from app.config.database import get_db, SessionLocal
 from app.schemas.alertas import (
     AlertaSimple, AlertaSimpleCreate,
     AlertaRango, AlertaRangoCreate,
@@ -12,7 +15,11 @@ from app.schemas.alertas import (
     AlertaCompuesta, AlertaCompuestaCreate
 )
 from app.services.alertas import AlertasService
-from app.utils.auth import get_current_user_id
+from app.services.precios_service import PreciosService
+from app.services.historial_intradia import historial_intradia
+from app.services.tickers_usuario import tickers_usuario
+from app.services.difusion_precios import difusion_precios
+from app.utils.auth import get_current_user_id, get_current_user_id_stream
 from app.middlewares.jwt_bearer import JWTBearer
 from app.jobs.precios_job import get_cache
 alertas_router = APIRouter()
@@ -51,16 +58,56 @@ def post_crear_alerta_compuesta(alerta: AlertaCompuestaCreate, user_id: int = De
 @alertas_router.get('/tickers-seguimiento', tags=['Alertas'])
 def get_tickers_seguimiento(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Tickers del usuario con precios"""
-    alertas = AlertasService(db).obtener_alertas_usuario(user_id)
-    tickers = list({a.ticker for alertas_tipo in alertas.values() for a in alertas_tipo if a.activo})
+    tickers = tickers_usuario.obtener(db, user_id)
 
     cache = get_cache()
+    # Los que el job todavía no cotizó se piden juntos en una sola consulta
+    faltantes = [t for t in tickers if t not in cache]
+    if faltantes:
+        try:
+            snapshot = PreciosService.obtener_snapshot(faltantes)
+            for t, precio, cambio in zip(snapshot["tickers"], snapshot["precio"], snapshot["cambio"]):
+                cache[t] = {"symbol": t, "price": round(precio, 2), "change": cambio, "stale": False}
+        except HTTPException as e:
+            print(f"❌ Error obteniendo precios: {e.detail}")
     return {"tickers": [cache.get(t, {"symbol": t, "price": None, "change": 0}) for t in tickers]}
 
+@alertas_router.get('/stream', tags=['Alertas'])
+async def get_stream_precios(request: Request, user_id: int = Depends(get_current_user_id_stream)):
+    """SSE con los precios de los tickers del usuario: un snapshot al conectar y después solo los cambios"""
+    def tickers_del_usuario():
+        db = SessionLocal()
+        try:
+            return tickers_usuario.obtener(db, user_id)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        difusion_precios.stream(lambda: run_in_threadpool(tickers_del_usuario), request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@alertas_router.get('/sparkline/{ticker}', tags=['Alertas'])
+def get_sparkline(ticker: str, minutos: int = Query(60, gt=0, le=390), user_id: int = Depends(get_current_user_id)):
+    """Precios intradía del ticker servidos desde el buffer del job (sin consultar al proveedor)"""
+    ticker = ticker.strip().upper()
+    puntos = historial_intradia.serie(ticker, minutos)
+    # Desde los mismos puntos: una ventana persistente por cada `minutos` pedido encarecería cada refresco
+    precios = [precio for _, precio, _ in puntos]
+    return {
+        "ticker": ticker,
+        "minutos": minutos,
+        "puntos": [{"t": datetime.fromtimestamp(t).isoformat(timespec="seconds"), "precio": precio} for t, precio, _ in puntos],
+        "primero": precios[0] if precios else None,
+        "minimo": min(precios, default=None),
+        "maximo": max(precios, default=None),
+    }
+
 @alertas_router.get('/mis-alertas', tags=['Alertas'])
 def get_mis_alertas(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Obtener las alertas del usuario autenticado"""
-    result = AlertasService(db).obtener_alertas_usuario(user_id)
+    result = AlertasService(db).listar_alertas_usuario(user_id)
     return jsonable_encoder(result)
 
 @alertas_router.get('/activadas', tags=['Alertas'])
@@ -72,34 +119,21 @@ def get_alertas_activadas(user_id: int = Depends(get_current_user_id), db: Sessi
 @alertas_router.get('/{alerta_id}', tags=['Alertas'])
 def get_alerta_por_id(alerta_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Obtener una alerta específica por ID (solo si pertenece al usuario)"""
-    result = AlertasService(db).obtener_alerta_por_id(alerta_id)
-
-    # Verificar que la alerta pertenece al usuario autenticado
-    if not result or result.user_id != user_id:
-        raise HTTPException(status_code=404, detail="Alerta no encontrada")
+    result = AlertasService(db).obtener_alerta_por_id(alerta_id, user_id)
     return jsonable_encoder(result)
 
 # Endpoints de gestión
 @alertas_router.put('/{alerta_id}/desactivar', tags=['Alertas'])
 def put_desactivar_alerta(alerta_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Desactivar una alerta específica (solo si pertenece al usuario)"""
-    alerta = AlertasService(db).obtener_alerta_por_id(alerta_id)
-    if not alerta or alerta.user_id != user_id:
+    # El registro global resuelve tipo y dueño en la misma consulta
+    if not AlertasService(db).desactivar_alerta(alerta_id, user_id):
         raise HTTPException(status_code=404, detail="Alerta no encontrada")
-    
-    result = AlertasService(db).desactivar_alerta(alerta_id)
-    if result:
-        return {"message": "Alerta desactivada correctamente"}
-    return {"message": "Alerta no encontrada"}
+    return {"message": "Alerta desactivada correctamente"}
 
 @alertas_router.delete('/{alerta_id}', tags=['Alertas'])
 def delete_alerta(alerta_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Eliminar una alerta (solo si pertenece al usuario)"""
-    alerta = AlertasService(db).obtener_alerta_por_id(alerta_id)
-    if not alerta or alerta.user_id != user_id:
+    if not AlertasService(db).eliminar_alerta(alerta_id, user_id):
         raise HTTPException(status_code=404, detail="Alerta no encontrada")
-    
-    success = AlertasService(db).eliminar_alerta(alerta_id)
-    if success:
-        return {"message": "Alerta eliminada correctamente"}
-    return {"message": "Alerta no encontrada"}
+    return {"message": "Alerta eliminada correctamente"}
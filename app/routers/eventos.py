@@ -5,11 +5,10 @@ from app.config.database import get_db
 from app.models.eventos import Evento
 from app.middlewares.jwt_bearer import JWTBearer
 from app.services.eventos_service import (
-    sincronizar_earnings_finnhub,
+    sincronizar_earnings,
     get_eventos_usuario,
 )
 from app.utils.auth import get_current_user_id
-import os
 
 eventos_router = APIRouter(prefix="/eventos", tags=["eventos"])
 
@@ -24,12 +23,8 @@ def mis_eventos(
 
 @eventos_router.post("/sincronizar", dependencies=[Depends(JWTBearer())])
 def sincronizar(db: Session = Depends(get_db)):
-    """Sync: Solo Finnhub (micro) por ahora"""
-    finnhub_key = os.getenv("FINNHUB_API_KEY")
-    if not finnhub_key:
-        raise HTTPException(400, "Falta API key: FINNHUB_API_KEY")
-
-    micro = sincronizar_earnings_finnhub(db, finnhub_key)
+    """Sync: Solo earnings (micro) por ahora"""
+    micro = sincronizar_earnings(db)
     return {"eventos_micro": micro, "eventos_macro": "Deshabilitado"}
 
 
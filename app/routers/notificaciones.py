@@ -5,9 +5,9 @@ from app.config.database import get_db
 from app.utils.auth import get_current_user_id
 from app.schemas.notificaciones import SuscripcionPush
 from app.models.notificaciones import Suscripcion
-from pywebpush import webpush, WebPushException
-import json 
-import os
+from app.services.push_service import despachador_push, emisor_push
+from pywebpush import WebPushException
+import json
 
 notificaciones_router = APIRouter(prefix="/notificaciones", tags=["notificaciones"])
 
@@ -43,15 +43,16 @@ def enviar_notificacion(
         return {"error": "Usuario no suscrito"}
     
     try:
-        webpush(
-            subscription_info=suscripcion.subscription_data,  
-            data=json.dumps({"title": titulo, "body": mensaje}),
-            vapid_private_key=os.getenv("VAPID_PRIVATE_KEY"),
-            vapid_claims={
-                "sub": f"mailto:{os.getenv('VAPID_EMAIL', 'admin@finz.com')}"
-            }
+        emisor_push.enviar(
+            suscripcion.subscription_data,
+            json.dumps({"title": titulo, "body": mensaje})
         )
         return {"message": "Notificación enviada"}
     except WebPushException as e:
         print(f"Error enviando push: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+@notificaciones_router.get('/metricas')
+def metricas_push(user_id: int = Depends(get_current_user_id)):
+    """Estado del pool de envío: cola, entregas, reintentos y latencia"""
+    return despachador_push.metricas()
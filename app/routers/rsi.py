@@ -42,13 +42,8 @@ def obtener_mis_rsi(
     db: Session = Depends(get_db)
 ):
     """Obtener RSi de todos los tickers que sigo (desde BD)"""
-    seguimientos = RSIService.obtener_seguimientos(db, user_id)
+    resultados = RSIService.obtener_rsi_seguimientos(db, user_id)
 
-    resultados = []
-    for seg in seguimientos:
-        rsi_data = RSIService.obtener_rsi_con_estado(db, seg.ticker)
-        resultados.append(rsi_data)
-    
     return {
         "total": len(resultados),
         "tickers": resultados
@@ -71,11 +66,7 @@ def forzar_actualizacion(
     """Forzar actualización RSI (ignora horario)"""
     seguimientos = RSIService.obtener_seguimientos(db, user_id)
 
-    for seg in seguimientos:
-        try:
-            result = RSIService.obtener_rsi_actual(seg.ticker)
-            RSIService.guardar_rsi(db, result["ticker"], result["rsi_value"])
-        except:
-            pass
+    resultados = RSIService.calcular_rsi([seg.ticker for seg in seguimientos], db)
+    RSIService.guardar_rsi_lote(db, {ticker: r["rsi_value"] for ticker, r in resultados.items()})
     
     return {"ok": True}
\ No newline at end of file
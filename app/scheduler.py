@@ -6,6 +6,18 @@ from app.jobs.eventos_job import sincronizar_eventos
 from app.jobs.reportes_job import sincronizar_reportes
 from app.jobs.precios_job import actualizar_precios_cache
 from app.jobs.mag7_job import actualizar_mercado
+from app.jobs.notificaciones_job import drenar_notificaciones
+from app.services.planificador_precios import planificador_precios
+from app.services.calendario_mercado import calendario_mercado, compuerta_mercado, PRECIOS_FUERA_DE_HORARIO
+from datetime import date
+
+def ejecutar_job_precios():
+    # Fuera de rueda los precios casi no se mueven: un refresco cada 30 min alcanza
+    if not compuerta_mercado.permitir("precios", cada=PRECIOS_FUERA_DE_HORARIO):
+        return
+    actualizar_precios_cache()
+    # Los tickers que cambiaron se evalúan apenas se refresca el cache
+    ejecutar_job_alertas()
 
 def ejecutar_job_alertas():
     db = SessionLocal()
@@ -18,7 +30,19 @@ def ejecutar_job_alertas():
     finally:
         db.close()
 
+def ejecutar_job_notificaciones():
+    db = SessionLocal()
+    try:
+        drenar_notificaciones(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Error en job notificaciones: {e}")
+    finally:
+        db.close()
+
 def ejecutar_job_rsi():
+    if not compuerta_mercado.permitir("rsi"):
+        return
     db = SessionLocal()
     try:
         actualizar_rsi(db)
@@ -40,6 +64,13 @@ def ejecutar_job_eventos():
     finally:
         db.close()
 
+def ejecutar_job_mercado():
+    # Los feriados no hay cierre nuevo que guardar
+    if not calendario_mercado.es_dia_habil(date.today()):
+        compuerta_mercado.evitar("mercado")
+        return
+    actualizar_mercado()
+
 def ejecutar_job_reportes():
     db = SessionLocal()
     try: 
@@ -54,10 +85,14 @@ def ejecutar_job_reportes():
 # Configurar scheduler
 scheduler = BackgroundScheduler(timezone='America/Argentina/Buenos_Aires')
 
-# Alertas cada 5 min
-scheduler.add_job(actualizar_precios_cache, 'interval', minutes=1, id="job_precios", max_instances=1, replace_existing=True)
-scheduler.add_job(ejecutar_job_alertas, 'interval', minutes=5, id="job_alertas", replace_existing=True)
-# scheduler.add_job(ejecutar_job_rsi, "cron", minute="*", hour="11-17", day_of_week="mon-fri")
+# Precios al ritmo del nivel más rápido (15s): cada ciclo consulta solo los tickers vencidos
+# y las alertas se evalúan a continuación, solo para los tickers que cambiaron
+scheduler.add_job(ejecutar_job_precios, 'interval', seconds=planificador_precios.intervalo_minimo, id="job_precios", max_instances=1, replace_existing=True)
+# Outbox en su propio job: un push service lento no frena el refresco de precios ni la evaluación.
+# Varios drenadores (uno por proceso) pueden correr en paralelo
+scheduler.add_job(ejecutar_job_notificaciones, 'interval', seconds=5, id="job_notificaciones", max_instances=1, replace_existing=True)
+# RSI local de todos los tickers seguidos cada minuto de rueda (la compuerta frena el resto)
+scheduler.add_job(ejecutar_job_rsi, 'interval', minutes=1, id="job_rsi", max_instances=1, replace_existing=True)
 scheduler.add_job(ejecutar_job_eventos, "cron", hour=0, minute=0, id="job_eventos", replace_existing=True)
 scheduler.add_job(ejecutar_job_reportes, 'cron', day_of_week='sat', hour=2,minute=0, id="job_reportes", replace_existing=True)
-scheduler.add_job(actualizar_mercado, "cron", hour=18, minute=30, day_of_week="mon-fri", id="job_mercado", replace_existing=True)
\ No newline at end of file
+scheduler.add_job(ejecutar_job_mercado, "cron", hour=18, minute=30, day_of_week="mon-fri", id="job_mercado", replace_existing=True)
\ No newline at end of file
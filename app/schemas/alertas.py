@@ -1,5 +1,5 @@
 # finz/app/schemas/alertas.py
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Optional, List
 from datetime import datetime
 from app.enums.alertas import CampoEnum, TipoCondicionEnum
@@ -55,11 +55,19 @@ class AlertaPorcentajeCreate(BaseModel):
     ticker: str = Field(..., max_length=10)
     campo: CampoEnum
     porcentaje_cambio: float
+    ventana_minutos: Optional[int] = Field(None, gt=0, le=390)  # ej: 3% en los últimos 30 min
    
     @field_validator('ticker')
     def ticker_uppercase(cls, v):
         return v.strip().upper()
 
+    @model_validator(mode='after')
+    def ventana_solo_precio(self):
+        # El volumen es acumulado del día: solo el precio tiene sentido en una ventana
+        if self.ventana_minutos and self.campo != CampoEnum.PRECIO:
+            raise ValueError("La ventana solo se puede usar con el campo precio")
+        return self
+
 class AlertaPorcentaje(AlertaPorcentajeCreate):
     id: int
     user_id: int
@@ -80,20 +88,54 @@ class CondicionAlertaCreate(BaseModel):
 class CondicionAlerta(CondicionAlertaCreate):
     id: int
     alerta_compuesta_id: int
+    grupo_id: Optional[int] = None
     
     class Config:
         from_attributes = True
 
+# ========== GRUPO DE CONDICIONES ==========
+class GrupoCondicionCreate(BaseModel):
+    operador_logico: str = Field(default="AND", pattern="^(AND|OR)$")
+    orden: int = 0
+    condiciones: List[CondicionAlertaCreate] = []
+    grupos: List["GrupoCondicionCreate"] = []
+
+    @model_validator(mode='after')
+    def validar_no_vacio(self):
+        if not self.condiciones and not self.grupos:
+            raise ValueError('Un grupo debe tener al menos una condición o subgrupo')
+        return self
+
+    def total_condiciones(self) -> int:
+        return len(self.condiciones) + sum(g.total_condiciones() for g in self.grupos)
+
+class GrupoCondicion(BaseModel):
+    id: int
+    grupo_padre_id: Optional[int] = None
+    operador_logico: str
+    orden: int
+
+    class Config:
+        from_attributes = True
+
 # ========== ALERTA COMPUESTA ==========
 class AlertaCompuestaCreate(BaseModel):
     ticker: str = Field(..., max_length=10)
     operador_logico: str = Field(default="AND", pattern="^(AND|OR)$")
-    condiciones: List[CondicionAlertaCreate] = Field(min_length=2)
+    condiciones: List[CondicionAlertaCreate] = []
+    grupos: List[GrupoCondicionCreate] = []
    
     @field_validator('ticker')
     def ticker_uppercase(cls, v):
         return v.strip().upper()
 
+    @model_validator(mode='after')
+    def validar_condiciones(self):
+        total = len(self.condiciones) + sum(g.total_condiciones() for g in self.grupos)
+        if total < 2:
+            raise ValueError('Una alerta compuesta necesita al menos 2 condiciones')
+        return self
+
 class AlertaCompuesta(BaseModel):
     id: int
     user_id: int
@@ -102,6 +144,7 @@ class AlertaCompuesta(BaseModel):
     created_at: datetime
     operador_logico: str
     condiciones: List[CondicionAlerta]
+    grupos: List[GrupoCondicion] = []
    
     class Config:
         from_attributes = True
\ No newline at end of file
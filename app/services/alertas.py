@@ -1,17 +1,34 @@
 # finz/app/services/alertas.py
-from sqlalchemy.orm import Session
-from app.models.alertas import AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta, CondicionAlerta
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, union_all, literal, cast, null, update, delete, text
+from sqlalchemy.dialects.postgresql import insert
+from app.models.alertas import AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta, CondicionAlerta, GrupoCondicion, AlertaRegistro
+from app.enums.alertas import CampoEnum, TipoAlertaEnum
 from app.schemas.alertas import AlertaSimpleCreate, AlertaRangoCreate, AlertaPorcentajeCreate, AlertaCompuestaCreate
 from app.services.precios_service import PreciosService
+from app.services.indice_alertas import indice_alertas
+from app.services import condiciones_compuestas
+from app.services.cola_cambios import cola_cambios
+from app.services.transiciones_alertas import TransicionesAlertas
+from app.services.snapshot_precios import snapshot_precios
+from app.services.historial_intradia import historial_intradia
+from app.services import outbox_notificaciones
+from app.services.tickers_usuario import tickers_usuario
 from fastapi import HTTPException
-from app.models.notificaciones import Suscripcion
-from pywebpush import webpush
-import json
-import os
-from datetime import datetime, timedelta
+from collections import defaultdict
+
+# Clave del advisory lock que serializa la sincronización del registro entre workers
+LOCK_SINCRONIZAR_REGISTRO = 4_621_001
 
 class AlertasService:
-    _ultima_notif = {}
+    _watermarks = {}  # (tipo, alerta_id) -> versiones del snapshot con las que se evaluó
+    estadisticas_watermark = {"evaluadas": 0, "omitidas": 0}
+    MODELOS = {
+        "simple": AlertaSimple,
+        "rango": AlertaRango,
+        "porcentaje": AlertaPorcentaje,
+        "compuesta": AlertaCompuesta,
+    }
    
     def __init__(self, db: Session) -> None:
         self.db = db
@@ -20,6 +37,7 @@ class AlertasService:
     def crear_alerta_simple(self, alerta: AlertaSimpleCreate, user_id: int):
         """Crear alerta simple"""
         new_alerta = AlertaSimple(
+            id=self._registrar("simple", user_id),
             user_id=user_id,
             ticker=alerta.ticker,
             campo=alerta.campo,
@@ -28,11 +46,13 @@ class AlertasService:
         )
         self.db.add(new_alerta)
         self.db.commit()
+        self._al_crear("simple", new_alerta)
         return new_alerta
 
     def crear_alerta_rango(self, alerta: AlertaRangoCreate, user_id: int):
         """Crear alerta de rango"""
         new_alerta = AlertaRango(
+            id=self._registrar("rango", user_id),
             user_id=user_id,
             ticker=alerta.ticker,
             campo=alerta.campo,
@@ -41,6 +61,7 @@ class AlertasService:
         )
         self.db.add(new_alerta)
         self.db.commit()
+        self._al_crear("rango", new_alerta)
         return new_alerta
 
     def crear_alerta_porcentaje(self, alerta: AlertaPorcentajeCreate, user_id: int):
@@ -52,19 +73,23 @@ class AlertasService:
             raise HTTPException(status_code=404, detail=f"Ticker {alerta.ticker} no encontrado")
 
         new_alerta = AlertaPorcentaje(
+            id=self._registrar("porcentaje", user_id),
             user_id=user_id,
             ticker=alerta.ticker,
             campo=alerta.campo,
             porcentaje_cambio=alerta.porcentaje_cambio,
-            precio_referencia=precio_actual
+            precio_referencia=precio_actual,
+            ventana_minutos=alerta.ventana_minutos
         )
         self.db.add(new_alerta)
         self.db.commit()
+        self._al_crear("porcentaje", new_alerta)
         return new_alerta
 
     def crear_alerta_compuesta(self, alerta: AlertaCompuestaCreate, user_id: int):
         """Crear alerta compuesta"""
         new_alerta = AlertaCompuesta(
+            id=self._registrar("compuesta", user_id),
             user_id=user_id,
             ticker=alerta.ticker,
             operador_logico=alerta.operador_logico
@@ -72,19 +97,113 @@ class AlertasService:
         self.db.add(new_alerta)
         self.db.commit()
         
-        # Crear condiciones
-        for condicion in alerta.condiciones:
+        # Crear condiciones de la raíz y grupos anidados
+        self._crear_condiciones(new_alerta.id, alerta.condiciones)
+        for grupo in alerta.grupos:
+            self._crear_grupo(new_alerta.id, grupo)
+        
+        self.db.commit()
+        self._al_crear("compuesta", new_alerta)
+        return new_alerta
+
+    def _crear_condiciones(self, alerta_id: int, condiciones, grupo_id: int = None):
+        for condicion in condiciones:
             new_condicion = CondicionAlerta(
-                alerta_compuesta_id=new_alerta.id,
+                alerta_compuesta_id=alerta_id,
+                grupo_id=grupo_id,
                 campo=condicion.campo,
                 tipo_condicion=condicion.tipo_condicion,
                 valor=condicion.valor,
                 orden=condicion.orden
             )
             self.db.add(new_condicion)
-        
+
+    def _crear_grupo(self, alerta_id: int, grupo, grupo_padre_id: int = None):
+        new_grupo = GrupoCondicion(
+            alerta_compuesta_id=alerta_id,
+            grupo_padre_id=grupo_padre_id,
+            operador_logico=grupo.operador_logico,
+            orden=grupo.orden
+        )
+        self.db.add(new_grupo)
+        self.db.flush()  # Necesitamos el ID para colgar condiciones y subgrupos
+
+        self._crear_condiciones(alerta_id, grupo.condiciones, new_grupo.id)
+        for subgrupo in grupo.grupos:
+            self._crear_grupo(alerta_id, subgrupo, new_grupo.id)
+
+    def _registrar(self, tipo: str, user_id: int) -> int:
+        """Reserva el ID global de una alerta nueva en el registro"""
+        registro = AlertaRegistro(tipo=TipoAlertaEnum(tipo), user_id=user_id)
+        self.db.add(registro)
+        self.db.flush()
+        return registro.id
+
+    def sincronizar_registro(self):
+        """
+        Registra las alertas previas al registro global (al arrancar).
+        Ante IDs repetidos entre tablas el registro queda para la primera tabla (el
+        mismo orden que usaba la búsqueda tabla por tabla) y las demás alertas se
+        mueven a IDs globales nuevos. La secuencia queda por encima de todos los IDs.
+        Corre bajo un advisory lock de la transacción: con varios workers arrancando a
+        la vez, el segundo espera el commit del primero y ya no ve IDs repetidos.
+        """
+        self.db.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_SINCRONIZAR_REGISTRO})
+        for tipo, model in self.MODELOS.items():
+            self.db.execute(
+                insert(AlertaRegistro)
+                .from_select(
+                    ["id", "tipo", "user_id"],
+                    select(model.id, literal(TipoAlertaEnum(tipo), AlertaRegistro.tipo.type), model.user_id),
+                )
+                .on_conflict_do_nothing(index_elements=["id"])
+            )
+        maximos = ", ".join(f"(SELECT COALESCE(MAX(id), 0) FROM {model.__tablename__})" for model in self.MODELOS.values())
+        self.db.execute(text(f"""
+            SELECT setval(pg_get_serial_sequence('alertas_registro', 'id'),
+                          GREATEST((SELECT COALESCE(MAX(id), 0) FROM alertas_registro), {maximos}, 1))
+        """))
+
+        for tipo, model in self.MODELOS.items():
+            repetidas = self.db.execute(
+                select(model.id, model.user_id)
+                .join(AlertaRegistro, AlertaRegistro.id == model.id)
+                .where(AlertaRegistro.tipo != TipoAlertaEnum(tipo))
+            ).all()
+            for viejo, user_id in repetidas:
+                nuevo = self._reasignar_id(tipo, model, viejo, user_id)
+                print(f"⚠️ Alerta {tipo} {viejo} repetía el ID de otra tabla: ahora es la {nuevo}")
         self.db.commit()
-        return new_alerta
+
+    def _reasignar_id(self, tipo: str, model, viejo: int, user_id: int) -> int:
+        """Copia la alerta con un ID global nuevo, mueve sus condiciones y borra la original"""
+        nuevo = self._registrar(tipo, user_id)
+        columnas = [columna for columna in model.__table__.columns if columna.name != "id"]
+        self.db.execute(
+            insert(model.__table__).from_select(
+                ["id"] + [columna.name for columna in columnas],
+                select(literal(nuevo), *columnas).where(model.id == viejo),
+            )
+        )
+        if model is AlertaCompuesta:
+            for hijo in (CondicionAlerta, GrupoCondicion):
+                self.db.execute(update(hijo).where(hijo.alerta_compuesta_id == viejo).values(alerta_compuesta_id=nuevo))
+        self.db.execute(delete(model).where(model.id == viejo))
+        return nuevo
+
+    def _al_crear(self, tipo: str, alerta):
+        """Registra la alerta nueva en el índice y la encola para evaluarla en el próximo ciclo"""
+        indice_alertas.agregar(tipo, alerta)
+        cola_cambios.publicar(alerta.ticker)
+        tickers_usuario.invalidar(alerta.user_id)
+
+    def _al_quitar(self, tipo: str, alerta_id: int, user_id: int):
+        """Limpia el estado en memoria de una alerta desactivada o eliminada"""
+        indice_alertas.quitar(tipo, alerta_id)
+        tickers_usuario.invalidar(user_id)
+        self._watermarks.pop((tipo, alerta_id), None)
+        if tipo == "compuesta":
+            condiciones_compuestas.invalidar(alerta_id)
 
     # ========== MÉTODOS DE CONSULTA ==========
     def obtener_alertas_usuario(self, user_id: int):
@@ -101,26 +220,65 @@ class AlertasService:
             "compuesta": alertas_compuesta
         }
 
-    def obtener_alerta_por_id(self, alerta_id: int):
-        """Obtener alerta por ID (busca en todas las tablas)"""
-        # Buscar en cada tipo de alerta
-        for model in [AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta]:
-            result = self.db.query(model).filter(model.id == alerta_id).first()
-            if result:
-                return result
-        raise HTTPException(status_code=404, detail="Alerta no encontrada")
+    def listar_alertas_usuario(self, user_id: int):
+        """Todas las alertas de un usuario con una sola consulta (UNION ALL de las 4 tablas)"""
+        columnas = {}
+        for model in self.MODELOS.values():
+            for columna in model.__table__.columns:
+                columnas.setdefault(columna.name, columna.type)
+
+        selects = []
+        for tipo, model in self.MODELOS.items():
+            tabla = model.__table__
+            selects.append(
+                select(
+                    literal(tipo).label("tipo"),
+                    *[
+                        (tabla.c[nombre] if nombre in tabla.c else cast(null(), tipo_columna)).label(nombre)
+                        for nombre, tipo_columna in columnas.items()
+                    ],
+                ).where(tabla.c.user_id == user_id)
+            )
+        filas = self.db.execute(union_all(*selects).order_by("id")).mappings().all()
+
+        result = {tipo: [] for tipo in self.MODELOS}
+        for fila in filas:
+            tabla = self.MODELOS[fila["tipo"]].__table__
+            result[fila["tipo"]].append({nombre: fila[nombre] for nombre in tabla.c.keys()})
+        return result
+
+    def _buscar_registro(self, alerta_id: int, user_id: int = None):
+        """Tipo y dueño de una alerta por su ID global (una consulta por PK)"""
+        query = self.db.query(AlertaRegistro).filter(AlertaRegistro.id == alerta_id)
+        if user_id is not None:
+            query = query.filter(AlertaRegistro.user_id == user_id)
+        return query.first()
+
+    def obtener_alerta_por_id(self, alerta_id: int, user_id: int = None):
+        """Obtener alerta por ID global (opcionalmente solo si pertenece al usuario)"""
+        registro = self._buscar_registro(alerta_id, user_id)
+        result = self.db.get(self.MODELOS[registro.tipo.value], alerta_id) if registro else None
+        if not result:
+            raise HTTPException(status_code=404, detail="Alerta no encontrada")
+        return result
 
     # ========== EVALUACIÓN DE ALERTAS ==========
     def evaluar_alertas(self, user_id: int, noticias_recientes: list[str] = None):
         """Evaluar todas las alertas activas de un usuario"""
-        alertas_activadas = []
         cache_precios = {}
-        
-        # Obtener todas las alertas activas
-        alertas_simple = self.db.query(AlertaSimple).filter(AlertaSimple.user_id == user_id, AlertaSimple.activo == True).all()
-        alertas_rango = self.db.query(AlertaRango).filter(AlertaRango.user_id == user_id, AlertaRango.activo == True).all()
-        alertas_porcentaje = self.db.query(AlertaPorcentaje).filter(AlertaPorcentaje.user_id == user_id, AlertaPorcentaje.activo == True).all()
-        alertas_compuesta = self.db.query(AlertaCompuesta).filter(AlertaCompuesta.user_id == user_id, AlertaCompuesta.activo == True).all()
+        versiones = {}
+        alertas = self._cargar_alertas_activas(user_id)
+
+        # Precios del snapshot del job; los que falten se consultan juntos en una sola tanda
+        faltantes = [
+            ticker for ticker in {a.ticker for alertas_tipo in alertas.values() for a in alertas_tipo}
+            if not self._cargar_desde_snapshot(ticker, cache_precios, versiones)
+        ]
+        if faltantes:
+            try:
+                self._cargar_precios(faltantes, cache_precios)
+            except HTTPException as e:
+                print(f"❌ Error obteniendo precios: {e.detail}")
 
         # Análisis de sentimiento
         sentimiento_general = 'neutral'
@@ -134,106 +292,229 @@ class AlertasService:
         #         sentimiento_general = 'negativo'
 
         # Evaluar cada tipo de alerta con CACHE
-        for alerta in alertas_simple:
-            if alerta.activada_at:
-                continue
-            try:
-                if self._evaluar_alerta_simple(alerta, sentimiento_general, cache_precios):
-                    alertas_activadas.append({"id": f"simple-{alerta.id}", "mensaje": self._generar_mensaje_simple(alerta, cache_precios)})
-                    alerta.activada_at = datetime.now()
-            except HTTPException:
-                continue
+        transiciones = TransicionesAlertas()
+        activaciones, omitidas, marcas = self._evaluar_lote(alertas, sentimiento_general, cache_precios, versiones, transiciones)
+        _, activadas_por_usuario = self._guardar_transiciones(transiciones, marcas, activaciones)
+        alertas_activadas = activadas_por_usuario.get(user_id, [])
 
-        for alerta in alertas_rango:
-            try:
-                dentro_del_rango = self._evaluar_alerta_rango(alerta, cache_precios)
-
-                # ENTRADA AL RANGO
-                if dentro_del_rango and not alerta.activada_at:
-                    alertas_activadas.append({
-                        "id": f"rango-entrada-{alerta.id}",
-                        "mensaje": f"📊 {alerta.ticker} ENTRÓ al rango ${alerta.valor_minimo}-${alerta.valor_maximo}"
-                    })
-                    alerta.activada_at = datetime.now()
-                # SALIDA DEL RANGO
-                elif not dentro_del_rango and alerta.activada_at:
-                    key = f"{alerta.ticker}_{alerta.campo.value}"
-                    if key not in cache_precios:
-                        cache_precios[key] = PreciosService.obtener_dato(alerta.ticker, alerta.campo)
-                    valor_actual = cache_precios.get(key, "N/A")
-                    
-                    alertas_activadas.append({
-                        "id": f"rango-salida-{alerta.id}",
-                        "mensaje": f"⚠️ {alerta.ticker} SALIÓ del rango (ahora ${valor_actual})"
-                    })
-                    alerta.activada_at = None # Resetear
-
-            except HTTPException:
-                continue
+        return {
+            "alertas_evaluadas": sum(len(alertas_tipo) for alertas_tipo in alertas.values()) - omitidas,
+            "alertas_omitidas": omitidas,
+            "alertas_activadas": alertas_activadas,
+            "total_activadas": len(alertas_activadas)
+        }
 
-        for alerta in alertas_porcentaje:
-            if alerta.activada_at:
-                continue
-            try:
-                if self._evaluar_alerta_porcentaje(alerta, cache_precios):
-                    alertas_activadas.append({"id": f"porcentaje-{alerta.id}", "mensaje": self._generar_mensaje_porcentaje(alerta, cache_precios)})
-                    alerta.activada_at = datetime.now()
-            except HTTPException:
-                continue
+    def evaluar_alertas_bulk(self, tickers: set[str] = None, desde_snapshot: bool = False):
+        """
+        Evaluar las alertas activas de todos los usuarios agrupadas por ticker.
+        Cada ticker se consulta una sola vez y las activaciones se agrupan por usuario
+        para notificar, así el costo crece con los tickers distintos y no con los usuarios.
+        El índice de umbrales decide qué alertas cruzaron y solo esas se cargan de la BD.
+        Con `tickers` se limita a esos tickers y con `desde_snapshot` usa los precios
+        que acaba de refrescar el job de precios en lugar de volver a consultar Yahoo.
+        """
+        if not indice_alertas.inicializado:
+            indice_alertas.reconstruir(self.db)
 
-        for alerta in alertas_compuesta:
-            if alerta.activada_at:
-                continue
+        cache_precios = {}
+        versiones = {}
+        candidatos = defaultdict(set)
+        evaluadas = {}
+        indexados = indice_alertas.tickers()
+        tickers = [t for t in indexados if t in tickers] if tickers is not None else indexados
+        if not desde_snapshot:
+            # Todos los tickers en consultas multi-símbolo, antes de recorrerlos
             try:
-                if self._evaluar_alerta_compuesta(alerta, cache_precios):
-                    alertas_activadas.append({"id": f"compuesta-{alerta.id}", "mensaje": self._generar_mensaje_compuesta(alerta, cache_precios)})
-                    alerta.activada_at = datetime.now()
-            except HTTPException:  
+                self._cargar_precios(tickers, cache_precios)
+            except HTTPException as e:
+                print(f"❌ Error obteniendo precios: {e.detail}")
+        for ticker in tickers:
+            if desde_snapshot:
+                if not self._cargar_desde_snapshot(ticker, cache_precios, versiones):
+                    continue
+            elif cache_precios.get(f"{ticker}_precio") is None:
                 continue
-            
-        self.db.commit()
 
-        if alertas_activadas:
-            ahora = datetime.now()
-            ultima = self._ultima_notif.get(user_id)
-            
-            if not ultima or (ahora - ultima) > timedelta(minutes=5):
-                try:
-                    suscripcion = self.db.query(Suscripcion).filter(
-                        Suscripcion.user_id == user_id
-                    ).first()
-                    
-                    if suscripcion:
-                        # Enviar notificación con el detalle de TODAS las alertas
-                        mensajes = [a["mensaje"] for a in alertas_activadas]
-                        body = "\n".join(mensajes) if len(mensajes) <= 3 else f"{mensajes[0]}\n... y {len(mensajes)-1} más"
-                        
-                        webpush(
-                            subscription_info=suscripcion.subscription_data,
-                            data=json.dumps({
-                                "title": f"🔔 {len(alertas_activadas)} Alerta(s) Activada(s)", 
-                                "body": body
-                            }),
-                            vapid_private_key=os.getenv("VAPID_PRIVATE_KEY"),
-                            vapid_claims={"sub": f"mailto:{os.getenv('VAPID_EMAIL')}"}
-                        )
-                        self._ultima_notif[user_id] = ahora
-                except Exception as e:
-                    print(f"Error enviando push: {e}")
+            for campo in CampoEnum:
+                valor = cache_precios.get(f"{ticker}_{campo.value}")
+                if valor is None:
+                    continue
+                claves = indice_alertas.candidatos(ticker, campo.value, valor)
+                evaluadas[(ticker, campo.value)] = claves
+                for tipo, alerta_id in claves:
+                    candidatos[tipo].add(alerta_id)
+
+        alertas = self._cargar_alertas_activas(ids=candidatos)
+
+        transiciones = TransicionesAlertas()
+        activaciones, omitidas, marcas = self._evaluar_lote(alertas, 'neutral', cache_precios, versiones, transiciones)
+        filas, activadas_por_usuario = self._guardar_transiciones(transiciones, marcas, activaciones)
+
+        # Recién con el estado guardado se avanza la referencia de cruce
+        for key, valor in cache_precios.items():
+            if valor is not None:
+                ticker, campo = key.rsplit("_", 1)
+                indice_alertas.confirmar(ticker, campo, valor, evaluadas.get((ticker, campo), frozenset()))
 
         return {
-            "alertas_evaluadas": len(alertas_simple) + len(alertas_rango) + len(alertas_porcentaje) + len(alertas_compuesta),
-            "alertas_activadas": alertas_activadas,
-            "total_activadas": len(alertas_activadas)
+            "tickers_evaluados": len(tickers),
+            "alertas_evaluadas": sum(len(alertas_tipo) for alertas_tipo in alertas.values()) - omitidas,
+            "alertas_omitidas": omitidas,
+            "usuarios_notificados": len(activadas_por_usuario),
+            "total_activadas": sum(len(a) for a in activadas_por_usuario.values()),
+            "filas_actualizadas": filas
         }
 
+    def _evaluar_lote(self, alertas: dict, sentimiento, cache_precios, versiones, transiciones):
+        """
+        Evalúa un lote de alertas salteando las que no tienen datos nuevos desde su última
+        evaluación (watermark). Devuelve (activaciones, omitidas, marcas a guardar).
+        """
+        activaciones = []
+        omitidas = 0
+        marcas = {}
+        for tipo, alertas_tipo in alertas.items():
+            for alerta in alertas_tipo:
+                campos = list(CampoEnum) if tipo == "compuesta" else [alerta.campo]
+                version = tuple(versiones.get((alerta.ticker, campo.value)) for campo in campos)
+                if None in version:
+                    version = None  # Sin snapshot no hay forma de saber si cambió
+                elif self._watermarks.get((tipo, alerta.id)) == version:
+                    omitidas += 1
+                    continue
+
+                try:
+                    activacion = self._evaluar_alerta(tipo, alerta, sentimiento, cache_precios, transiciones)
+                except HTTPException:
+                    continue
+                if version is not None:
+                    marcas[(tipo, alerta.id)] = version
+                if activacion:
+                    activaciones.append((tipo, alerta, activacion))
+
+        total = sum(len(alertas_tipo) for alertas_tipo in alertas.values())
+        self.estadisticas_watermark["evaluadas"] += total - omitidas
+        self.estadisticas_watermark["omitidas"] += omitidas
+        return activaciones, omitidas, marcas
+
+    def _guardar_transiciones(self, transiciones: TransicionesAlertas, marcas: dict, activaciones: list) -> tuple:
+        """
+        Escribe los cambios de estado del ciclo y sus notificaciones en una sola transacción.
+        Devuelve (filas por tabla, activaciones por usuario que efectivamente se aplicaron).
+        """
+        disparadas = transiciones.disparadas()
+        filas = transiciones.flush(self.db)
+        # Solo se notifica lo que cambió en este ciclo: otro worker pudo ganar la misma activación
+        activadas_por_usuario = defaultdict(list)
+        for tipo, alerta, activacion in activaciones:
+            if (tipo, alerta.id) in transiciones.aplicadas:
+                activadas_por_usuario[alerta.user_id].append(activacion)
+        # Outbox: el push sale después, pero solo si el cambio de estado quedó guardado
+        outbox_notificaciones.registrar(self.db, activadas_por_usuario)
+        self.db.commit()
+        # Con el estado guardado, las alertas quedan marcadas con la versión evaluada
+        self._watermarks.update(marcas)
+        # Ya disparadas: no vuelven a evaluarse, se sacan del índice
+        for tipo, alerta_id in disparadas:
+            indice_alertas.quitar(tipo, alerta_id)
+        return filas, activadas_por_usuario
+
+    @classmethod
+    def ratio_omitidas(cls) -> float:
+        """Proporción de evaluaciones salteadas por watermark desde que arrancó el proceso"""
+        total = cls.estadisticas_watermark["evaluadas"] + cls.estadisticas_watermark["omitidas"]
+        return round(cls.estadisticas_watermark["omitidas"] / total, 3) if total else 0.0
+
+    def _cargar_alertas_activas(self, user_id: int = None, ids: dict = None):
+        """Carga las alertas activas (de un usuario, por IDs o todas) con una consulta por tipo"""
+        alertas = {}
+        for tipo, model in self.MODELOS.items():
+            if ids is not None and not ids.get(tipo):
+                alertas[tipo] = []
+                continue
+            query = self.db.query(model).filter(model.activo == True)
+            if user_id is not None:
+                query = query.filter(model.user_id == user_id)
+            if ids is not None:
+                query = query.filter(model.id.in_(ids[tipo]))
+            if model is AlertaCompuesta:
+                # Traer todas las condiciones en una sola consulta extra
+                query = query.options(selectinload(AlertaCompuesta.condiciones))
+            alertas[tipo] = query.all()
+        return alertas
+
+    def _cargar_desde_snapshot(self, ticker: str, cache_precios: dict, versiones: dict) -> bool:
+        """Copia precio, volumen y sus versiones desde el snapshot del job de precios"""
+        datos, versiones_ticker = snapshot_precios.leer(ticker)
+        # Un precio restaurado de la base no se evalúa hasta que el job lo refresque
+        if not datos or datos.get("stale"):
+            return False
+        cache_precios[f"{ticker}_precio"] = datos["price"]
+        cache_precios[f"{ticker}_volumen"] = datos.get("volume")
+        for campo, version in versiones_ticker.items():
+            versiones[(ticker, campo)] = version
+        return True
+
+    def _cargar_precios(self, tickers, cache_precios: dict):
+        """Consulta precio y volumen de varios tickers en lote y los guarda en el cache"""
+        campos = [campo.value for campo in CampoEnum]
+        snapshot = PreciosService.obtener_snapshot(tickers, campos)
+        for campo in campos:
+            for ticker, valor in zip(snapshot["tickers"], snapshot[campo]):
+                cache_precios[f"{ticker}_{campo}"] = valor
+        # Los que no cotizaron quedan en None para no volver a consultarlos en el ciclo
+        for ticker in tickers:
+            for campo in campos:
+                cache_precios.setdefault(f"{ticker}_{campo}", None)
+
+    def _evaluar_alerta(self, tipo: str, alerta, sentimiento, cache_precios, transiciones: TransicionesAlertas):
+        """Evalúa una alerta y registra su cambio de estado. Devuelve la activación o None"""
+        if tipo == "rango":
+            dentro_del_rango = self._evaluar_alerta_rango(alerta, cache_precios)
+
+            # ENTRADA AL RANGO
+            if dentro_del_rango and not alerta.activada_at:
+                transiciones.activar(tipo, alerta.id)
+                return {
+                    "id": f"rango-entrada-{alerta.id}",
+                    "mensaje": f"📊 {alerta.ticker} ENTRÓ al rango ${alerta.valor_minimo}-${alerta.valor_maximo}"
+                }
+            # SALIDA DEL RANGO
+            if not dentro_del_rango and alerta.activada_at:
+                valor_actual = self._obtener_valor(alerta.ticker, alerta.campo, cache_precios)
+                transiciones.resetear(tipo, alerta.id)
+                return {
+                    "id": f"rango-salida-{alerta.id}",
+                    "mensaje": f"⚠️ {alerta.ticker} SALIÓ del rango (ahora ${valor_actual if valor_actual is not None else 'N/A'})"
+                }
+            return None
+
+        # Simple, porcentaje y compuesta se disparan una sola vez
+        if alerta.activada_at:
+            return None
+
+        if tipo == "simple" and self._evaluar_alerta_simple(alerta, sentimiento, cache_precios):
+            mensaje = self._generar_mensaje_simple(alerta, cache_precios)
+        elif tipo == "porcentaje" and self._evaluar_alerta_porcentaje(alerta, cache_precios):
+            mensaje = self._generar_mensaje_porcentaje(alerta, cache_precios)
+        elif tipo == "compuesta" and self._evaluar_alerta_compuesta(alerta, cache_precios):
+            mensaje = self._generar_mensaje_compuesta(alerta)
+        else:
+            return None
+
+        transiciones.activar(tipo, alerta.id)
+        return {"id": f"{tipo}-{alerta.id}", "mensaje": mensaje}
+
     # ========== MÉTODOS PRIVADOS DE EVALUACIÓN ==========
-    def _evaluar_alerta_simple(self, alerta, sentimiento, cache_precios):
-        key = f"{alerta.ticker}_{alerta.campo.value}"
+    def _obtener_valor(self, ticker: str, campo, cache_precios):
+        """Lee un dato del cache del ciclo y consulta el ticker solo si falta"""
+        key = f"{ticker}_{campo.value}"
         if key not in cache_precios:
-            cache_precios[key] = PreciosService.obtener_dato(alerta.ticker, alerta.campo)
-        
-        valor_actual = cache_precios[key]
+            self._cargar_precios([ticker], cache_precios)
+        return cache_precios.get(key)
+
+    def _evaluar_alerta_simple(self, alerta, sentimiento, cache_precios):
+        valor_actual = self._obtener_valor(alerta.ticker, alerta.campo, cache_precios)
         if valor_actual is None:
             return False
         
@@ -250,21 +531,17 @@ class AlertasService:
         return False
 
     def _evaluar_alerta_rango(self, alerta, cache_precios):
-        key = f"{alerta.ticker}_{alerta.campo.value}"
-        if key not in cache_precios:
-            cache_precios[key] = PreciosService.obtener_dato(alerta.ticker, alerta.campo)
-        valor_actual = cache_precios.get(key)
+        valor_actual = self._obtener_valor(alerta.ticker, alerta.campo, cache_precios)
         if valor_actual is None:
             return False
         return alerta.valor_minimo <= valor_actual <= alerta.valor_maximo
 
     def _evaluar_alerta_porcentaje(self, alerta, cache_precios):
-        key = f"{alerta.ticker}_{alerta.campo.value}"
-        if key not in cache_precios:
-            cache_precios[key] = PreciosService.obtener_dato(alerta.ticker, alerta.campo)
+        if alerta.ventana_minutos:
+            return self._movimiento_en_ventana(alerta, cache_precios) >= abs(alerta.porcentaje_cambio)
         if not alerta.precio_referencia:
             return False
-        valor_actual = cache_precios.get(key)
+        valor_actual = self._obtener_valor(alerta.ticker, alerta.campo, cache_precios)
         if valor_actual is None:
             return False
         
@@ -272,25 +549,12 @@ class AlertasService:
         return abs(cambio_porcentual) >= abs(alerta.porcentaje_cambio)
 
     def _evaluar_alerta_compuesta(self, alerta, cache_precios):
-        key = f"{alerta.ticker}_{alerta.campo.value}"
         if not alerta.condiciones:
             return False
-        
-        resultados = []
-        for condicion in alerta.condiciones:
-            valor_actual = PreciosService.obtener_dato(alerta.ticker, condicion.campo)
-            if valor_actual is None:
-                resultados.append(False)
-                continue
-
-            if condicion.tipo_condicion.value == "mayor_que":
-                resultados.append(valor_actual > condicion.valor)
-            elif condicion.tipo_condicion.value == "menor_que":
-                resultados.append(valor_actual < condicion.valor)
-            else:
-                resultados.append(False)
 
-        return any(resultados) if alerta.operador_logico == "OR" else all(resultados)
+        # Snapshot del ticker compartido por todas las condiciones del árbol
+        datos = {campo.value: self._obtener_valor(alerta.ticker, campo, cache_precios) for campo in CampoEnum}
+        return condiciones_compuestas.obtener_predicado(alerta)(datos)
 
     # ========== GENERADORES DE MENSAJES ==========
     def _generar_mensaje_simple(self, alerta, cache_precios):
@@ -316,11 +580,24 @@ class AlertasService:
         else:
             return f"⚠️ {alerta.ticker} SALIÓ del rango (${valor_actual})"
 
+    def _movimiento_en_ventana(self, alerta, cache_precios) -> float:
+        """Mayor movimiento % hasta el valor actual desde el mínimo o el máximo de la ventana"""
+        valor_actual = self._obtener_valor(alerta.ticker, alerta.campo, cache_precios)
+        ventana = historial_intradia.ventana(alerta.ticker, alerta.ventana_minutos)
+        if valor_actual is None or ventana is None:
+            return 0.0
+        suba = (valor_actual - ventana["minimo"]) / ventana["minimo"]
+        baja = (ventana["maximo"] - valor_actual) / ventana["maximo"]
+        return max(suba, baja) * 100
+
     def _generar_mensaje_porcentaje(self, alerta, cache_precios):
         key = f"{alerta.ticker}_{alerta.campo.value}"
         valor_actual = cache_precios.get(key)
         if valor_actual is None:
             return f"{alerta.ticker} {alerta.campo.value} - Precio no disponible"
+        if alerta.ventana_minutos:
+            movimiento = self._movimiento_en_ventana(alerta, cache_precios)
+            return f"{alerta.ticker} se movió {movimiento:.1f}% en los últimos {alerta.ventana_minutos} min"
         cambio = ((valor_actual - alerta.precio_referencia) / alerta.precio_referencia) * 100
         return f"{alerta.ticker} {alerta.campo.value} cambió {cambio:.1f}%"
 
@@ -328,21 +605,32 @@ class AlertasService:
         return f"{alerta.ticker} - Alerta compuesta activada"
 
     # ========== GESTIÓN DE ALERTAS ==========
-    def desactivar_alerta(self, alerta_id: int):
-        """Desactivar alerta (busca en todas las tablas)"""
-        for model in [AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta]:
-            alerta = self.db.query(model).filter(model.id == alerta_id).first()
-            if alerta:
-                alerta.activo = False
-                self.db.commit()
-                return alerta
-        return None
-
-    def eliminar_alerta(self, alerta_id: int):
-        """Eliminar alerta (busca en todas las tablas)"""
-        for model in [AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta]:
-            deleted = self.db.query(model).filter(model.id == alerta_id).delete()
-            if deleted:
-                self.db.commit()
-                return True
-        return False
\ No newline at end of file
+    def desactivar_alerta(self, alerta_id: int, user_id: int = None):
+        """Desactivar alerta (tipo y dueño desde el registro global)"""
+        registro = self._buscar_registro(alerta_id, user_id)
+        if not registro:
+            return False
+
+        tipo = registro.tipo.value
+        model = self.MODELOS[tipo]
+        self.db.execute(update(model).where(model.id == alerta_id).values(activo=False))
+        self.db.commit()
+        self._al_quitar(tipo, alerta_id, registro.user_id)
+        return True
+
+    def eliminar_alerta(self, alerta_id: int, user_id: int = None):
+        """Eliminar alerta (tipo y dueño desde el registro global)"""
+        registro = self._buscar_registro(alerta_id, user_id)
+        if not registro:
+            return False
+
+        tipo = registro.tipo.value
+        model = self.MODELOS[tipo]
+        if model is AlertaCompuesta:
+            self.db.execute(delete(CondicionAlerta).where(CondicionAlerta.alerta_compuesta_id == alerta_id))
+            self.db.execute(delete(GrupoCondicion).where(GrupoCondicion.alerta_compuesta_id == alerta_id))
+        self.db.execute(delete(model).where(model.id == alerta_id))
+        self.db.delete(registro)
+        self.db.commit()
+        self._al_quitar(tipo, alerta_id, registro.user_id)
+        return True
\ No newline at end of file
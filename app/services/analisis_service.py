@@ -1,7 +1,9 @@
 import os
-import yfinance as yf
+from fastapi import HTTPException
 from groq import Groq
 from dotenv import load_dotenv
+from app.providers.registro import obtener_proveedor
+from app.services.pool_consultas import pool_consultas
 
 load_dotenv()
 
@@ -21,7 +23,7 @@ class AnalisisService:
         """
         Orquesta los tres agentes en secuencia:
         1. Técnico -> Lee el chart (visión)
-        2. Fundamental -> Lee datos de yfinance
+        2. Fundamental -> Lee fundamentales del proveedor de datos
         3. Moderador -> Sintetiza ambos y emite veredicto
         """
         fundamentales = self._obtener_fundamentales(ticker)
@@ -39,27 +41,13 @@ class AnalisisService:
         }
     
     def _obtener_fundamentales(self, ticker: str) -> dict:
-        try:
-            info = yf.Ticker(ticker).info
-            return {
-                "nombre": info.get("longName"),
-                "sector": info.get("sector"),
-                "industria": info.get("industry"),
-                "precio_actual": info.get("currentPrice") or info.get("regularMarketPrice"),
-                "pe_ratio": info.get("trailingPE"),
-                "market_cap": info.get("marketCap"),
-                "revenue": info.get("totalRevenue"),
-                "margen_bruto": info.get("grossMargins"),
-                "max_52w": info.get("fiftyTwoWeekHigh"),
-                "min_52w": info.get("fiftyTwoWeekLow"),
-                "media_50d": info.get("fiftyDayAverage"),
-                "media_200d": info.get("twoHundredDayAverage"),
-                "volumen_promedio": info.get("averageVolume"),
-                "beta": info.get("beta"),
-
-            }
-        except Exception as e:
-            return {"error": f"No se pudieron obtener fundamentales_ {e}"}
+        proveedor = obtener_proveedor()
+        # Por el pool: respeta el límite del proveedor y queda anotada en el libro de cuotas
+        for _, datos, error in pool_consultas.mapear(proveedor.fuente("fundamentales"), proveedor.fundamentales, [ticker]):
+            if error is None:
+                return datos
+            detalle = error.detail if isinstance(error, HTTPException) else error
+            return {"error": f"No se pudieron obtener fundamentales_ {detalle}"}
         
     def _agente_tecnico(self, imagen_base64: str, media_type: str, ticker: str, timeframe: str) -> str:
         completion = self.client.chat.completions.create(
@@ -0,0 +1,284 @@
+# app/services/cache_compartido.py
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+# Con varios workers de uvicorn: directorio donde viven los archivos compartidos.
+# Sin configurar, cada proceso guarda todo en memoria (un solo worker).
+DIRECTORIO = os.getenv("CACHE_COMPARTIDO_DIR")
+
+CABECERA = struct.Struct("<4sIQI")  # magia, capacidad, secuencia (seqlock), cantidad
+# ticker, precio, volumen (-1 = None), cambio, versión precio, versión volumen, cambio precio, cambio volumen
+SLOT = struct.Struct("<12sdqdQQdd")
+# Historial: ticker y muestras agregadas, seguido del buffer circular de muestras
+SLOT_HISTORIAL = struct.Struct("<12sQ")
+MUESTRA = struct.Struct("<ddq")  # timestamp, precio, volumen (-1 = None)
+
+
+class ArchivoSlots:
+    """
+    Archivo de layout fijo mapeado en memoria: una cabecera y un slot de `tamano_slot`
+    bytes por ticker (los primeros 12, el ticker). Escribe un solo proceso (el líder
+    del refresco) y leen todos, sin red ni syscalls por lectura. Una secuencia
+    par/impar (seqlock) evita lecturas a medias.
+    """
+
+    MAGIA = b"FZP1"
+
+    def __init__(self, ruta: str, capacidad: int, tamano_slot: int):
+        self.ruta = ruta
+        self.capacidad = capacidad
+        self.tamano_slot = tamano_slot
+        self._mm = None
+        self._escritura = False
+        self._indice: dict[str, int] = {}  # ticker -> slot
+        self._lock = threading.Lock()
+
+    # ========== HELPERS ==========
+    def _escribir(self, ticker: str, escribir_slot) -> bool:
+        """Llama a `escribir_slot(offset, nuevo)` dentro del seqlock (con self._lock tomado)"""
+        self._abrir(escritura=True)
+        self._sincronizar_indice()
+        slot = self._indice.get(ticker)
+        _, capacidad, secuencia, cantidad = CABECERA.unpack_from(self._mm, 0)
+        nuevo = slot is None
+        if nuevo:
+            if cantidad >= capacidad:
+                print(f"Cache compartido lleno, {ticker} queda afuera")
+                return False
+            slot = cantidad
+            self._indice[ticker] = slot
+            cantidad += 1
+
+        CABECERA.pack_into(self._mm, 0, self.MAGIA, capacidad, secuencia + 1, cantidad)
+        escribir_slot(self._offset(slot), nuevo)
+        CABECERA.pack_into(self._mm, 0, self.MAGIA, capacidad, secuencia + 2, cantidad)
+        return True
+
+    def _offset(self, slot: int) -> int:
+        return CABECERA.size + slot * self.tamano_slot
+
+    def _consistente(self, leer, intentos: int = 1000):
+        for _ in range(intentos):
+            antes = CABECERA.unpack_from(self._mm, 0)[2]
+            if antes % 2:
+                time.sleep(0)
+                continue
+            resultado = leer()
+            if CABECERA.unpack_from(self._mm, 0)[2] == antes:
+                return resultado
+        # El escritor quedó a mitad de camino (murió): mejor un dato viejo que colgarse
+        return leer()
+
+    def _abrir(self, escritura: bool) -> bool:
+        if self._mm is not None and (self._escritura or not escritura):
+            return True
+        tamano = CABECERA.size + self.capacidad * self.tamano_slot
+        if escritura:
+            nuevo = not os.path.exists(self.ruta) or os.path.getsize(self.ruta) != tamano
+            with open(self.ruta, "a+b") as archivo:
+                if nuevo:
+                    archivo.truncate(0)
+                    archivo.truncate(tamano)
+                mm = mmap.mmap(archivo.fileno(), tamano)
+            if nuevo or mm[:4] != self.MAGIA:
+                CABECERA.pack_into(mm, 0, self.MAGIA, self.capacidad, 0, 0)
+            else:
+                # Un líder anterior pudo morir a mitad de una escritura
+                _, capacidad, secuencia, cantidad = CABECERA.unpack_from(mm, 0)
+                if secuencia % 2:
+                    CABECERA.pack_into(mm, 0, self.MAGIA, capacidad, secuencia + 1, cantidad)
+            self._escritura = True
+        else:
+            if not os.path.exists(self.ruta) or os.path.getsize(self.ruta) != tamano:
+                return False  # el líder todavía no lo creó
+            with open(self.ruta, "rb") as archivo:
+                mm = mmap.mmap(archivo.fileno(), tamano, access=mmap.ACCESS_READ)
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mm
+        self._indice.clear()
+        return True
+
+    def _sincronizar_indice(self):
+        """Agrega al índice local los tickers que el líder sumó desde la última lectura"""
+        cantidad = CABECERA.unpack_from(self._mm, 0)[3]
+        for slot in range(len(self._indice), cantidad):
+            ticker = self._mm[self._offset(slot):self._offset(slot) + 12]
+            self._indice[ticker.rstrip(b"\0").decode()] = slot
+
+
+class ArchivoPrecios(ArchivoSlots):
+    """Último precio por ticker, compartido entre workers (ver SnapshotPrecios)"""
+
+    def __init__(self, ruta: str, capacidad: int = 4096):
+        super().__init__(ruta, capacidad, SLOT.size)
+
+    # ========== ESCRITURA (solo el líder) ==========
+    def escribir(self, ticker: str, precio: float, cambio: float, volumen, versiones: tuple, cambiado_at: tuple):
+        with self._lock:
+            self._escribir(ticker, lambda offset, _: SLOT.pack_into(
+                self._mm, offset,
+                ticker.encode()[:12], precio, -1 if volumen is None else int(volumen), cambio,
+                versiones[0], versiones[1], cambiado_at[0], cambiado_at[1]
+            ))
+
+    # ========== LECTURA ==========
+    def leer(self, ticker: str) -> tuple | None:
+        """Fila del ticker (ticker, precio, volumen, cambio, versiones..., cambiados...) o None"""
+        with self._lock:
+            if not self._abrir(escritura=False):
+                return None
+            self._sincronizar_indice()
+            slot = self._indice.get(ticker)
+            if slot is None:
+                return None
+            return self._consistente(lambda: SLOT.unpack_from(self._mm, self._offset(slot)))
+
+    def leer_todo(self) -> list[tuple]:
+        with self._lock:
+            if not self._abrir(escritura=False):
+                return []
+
+            def filas():
+                cantidad = CABECERA.unpack_from(self._mm, 0)[3]
+                datos = self._mm[CABECERA.size:CABECERA.size + cantidad * SLOT.size]
+                return list(SLOT.iter_unpack(datos))
+
+            return self._consistente(filas)
+
+
+class ArchivoHistorial(ArchivoSlots):
+    """
+    Buffer circular de muestras intradía por ticker, compartido entre workers (ver
+    HistorialIntradia). Cada lector copia solo las muestras que le faltan.
+    """
+
+    MAGIA = b"FZH1"
+
+    def __init__(self, ruta: str, capacidad: int = 1024, muestras: int = 512):
+        super().__init__(ruta, capacidad, SLOT_HISTORIAL.size + muestras * MUESTRA.size)
+        self.muestras = muestras
+
+    # ========== ESCRITURA (solo el líder) ==========
+    def agregar(self, ticker: str, timestamp: float, precio: float, volumen):
+        def escribir_slot(offset: int, nuevo: bool):
+            total = 0 if nuevo else SLOT_HISTORIAL.unpack_from(self._mm, offset)[1]
+            MUESTRA.pack_into(
+                self._mm, self._offset_muestra(offset, total),
+                timestamp, precio, -1 if volumen is None else int(volumen)
+            )
+            SLOT_HISTORIAL.pack_into(self._mm, offset, ticker.encode()[:12], total + 1)
+
+        with self._lock:
+            self._escribir(ticker, escribir_slot)
+
+    # ========== LECTURA ==========
+    def leer(self, ticker: str, desde: int) -> tuple[int, list[tuple]]:
+        """(total, muestras) con las muestras de índice absoluto `desde` en adelante que siguen en el buffer"""
+        with self._lock:
+            if not self._abrir(escritura=False):
+                return 0, []
+            self._sincronizar_indice()
+            slot = self._indice.get(ticker)
+            if slot is None:
+                return 0, []
+            offset = self._offset(slot)
+
+            def leer():
+                total = SLOT_HISTORIAL.unpack_from(self._mm, offset)[1]
+                return total, [
+                    MUESTRA.unpack_from(self._mm, self._offset_muestra(offset, i))
+                    for i in range(max(desde, total - self.muestras), total)
+                ]
+
+            return self._consistente(leer)
+
+    def _offset_muestra(self, offset: int, indice: int) -> int:
+        return offset + SLOT_HISTORIAL.size + (indice % self.muestras) * MUESTRA.size
+
+
+class CacheJSON:
+    """Un dict compartido vía archivo JSON (escritura atómica, lectura según mtime)"""
+
+    def __init__(self, ruta: str | None):
+        self.ruta = ruta
+        self._datos: dict = {}
+        self._mtime = None
+
+    def guardar(self, datos: dict):
+        self._datos = datos
+        if self.ruta:
+            temporal = f"{self.ruta}.{os.getpid()}.tmp"
+            with open(temporal, "w", encoding="utf-8") as archivo:
+                json.dump(datos, archivo)
+            os.replace(temporal, self.ruta)
+
+    def leer(self) -> dict:
+        if self.ruta:
+            try:
+                mtime = os.stat(self.ruta).st_mtime_ns
+            except FileNotFoundError:
+                return self._datos
+            if mtime != self._mtime:
+                with open(self.ruta, encoding="utf-8") as archivo:
+                    self._datos = json.load(archivo)
+                self._mtime = mtime
+        return self._datos
+
+
+class LiderRefresco:
+    """
+    Elige un único proceso para correr los jobs de refresco (flock sobre un archivo).
+    Los demás reintentan cada tanto y toman el lugar si el líder muere.
+    Sin directorio compartido, cada proceso es su propio líder.
+    """
+
+    def __init__(self, ruta_lock: str | None, reintento: float = 15):
+        self.ruta_lock = ruta_lock
+        self.reintento = reintento
+        self.es_lider = False
+        self._archivo = None
+
+    @property
+    def compartido(self) -> bool:
+        return self.ruta_lock is not None
+
+    def intentar(self) -> bool:
+        if self.es_lider:
+            return True
+        if not self.compartido:
+            self.es_lider = True
+            return True
+        archivo = open(self.ruta_lock, "a+")
+        try:
+            fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            archivo.close()
+            return False
+        self._archivo = archivo  # el lock dura lo que viva el proceso
+        self.es_lider = True
+        return True
+
+    def esperar(self, al_asumir):
+        """Reintenta en segundo plano y llama a `al_asumir` cuando este proceso queda como líder"""
+        def bucle():
+            while not self.intentar():
+                time.sleep(self.reintento)
+            al_asumir()
+
+        threading.Thread(target=bucle, name="lider-refresco", daemon=True).start()
+
+
+def ruta(nombre: str) -> str | None:
+    if not DIRECTORIO:
+        return None
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    return os.path.join(DIRECTORIO, nombre)
+
+
+lider_refresco = LiderRefresco(ruta("refresco.lock"))
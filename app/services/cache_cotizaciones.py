@@ -0,0 +1,110 @@
+# app/services/cache_cotizaciones.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+
+# Segundos que vale cada campo; el volumen se mueve más lento que el precio
+TTL_POR_CAMPO = {
+    "precio": float(os.getenv("CACHE_TTL_PRECIO", "15")),
+    "volumen": float(os.getenv("CACHE_TTL_VOLUMEN", "60")),
+    "cambio": float(os.getenv("CACHE_TTL_PRECIO", "15")),
+}
+
+
+class CacheCotizaciones:
+    """
+    Cache de cotizaciones compartido por todo el proceso, con TTL por campo y
+    desalojo LRU. Los misses concurrentes de un mismo ticker esperan una única
+    consulta en vuelo (single-flight) en lugar de repetirla.
+    """
+
+    def __init__(self, max_entradas: int = 2000, ttl: dict | None = None):
+        self.max_entradas = max_entradas
+        self.ttl = ttl or TTL_POR_CAMPO
+        self._lock = threading.Lock()
+        self._entradas: OrderedDict[str, tuple] = OrderedDict()  # ticker -> (guardado_at, fila | None)
+        self._en_vuelo: dict[str, Future] = {}
+        self._contadores = {"hits": 0, "misses": 0, "coalescidas": 0, "desalojadas": 0}
+
+    def obtener(self, tickers: list[str], campos, cargar: Callable[[list[str]], dict], forzar: bool = False) -> dict:
+        """
+        Filas {ticker: {campo: valor}} de los tickers pedidos. Los que no están frescos
+        (todos, con `forzar`) se piden juntos con `cargar(tickers) -> ({ticker: fila}, fallidos)`;
+        los que ya está cargando otro hilo se esperan. Los tickers sin cotización no aparecen.
+        """
+        ttl = min(self.ttl.get(campo, 0) for campo in campos) if campos else 0
+        ahora = time.monotonic()
+        filas, mios, ajenos = {}, {}, {}
+        with self._lock:
+            for ticker in tickers:
+                entrada = self._entradas.get(ticker)
+                if entrada is not None and not forzar and ahora - entrada[0] < ttl:
+                    self._entradas.move_to_end(ticker)
+                    self._contadores["hits"] += 1
+                    if entrada[1] is not None:
+                        filas[ticker] = entrada[1]
+                elif ticker in self._en_vuelo:
+                    self._contadores["coalescidas"] += 1
+                    ajenos[ticker] = self._en_vuelo[ticker]
+                else:
+                    self._contadores["misses"] += 1
+                    mios[ticker] = self._en_vuelo[ticker] = Future()
+
+        if mios:
+            try:
+                cargadas, fallidos = cargar(list(mios))
+            except Exception as e:
+                with self._lock:
+                    for ticker in mios:
+                        self._en_vuelo.pop(ticker, None)
+                for futuro in mios.values():
+                    futuro.set_exception(e)
+                raise
+
+            with self._lock:
+                guardado_at = time.monotonic()
+                for ticker in mios:
+                    # También se guarda la ausencia, para no insistir con un ticker inválido,
+                    # salvo si su consulta falló: ese se vuelve a pedir en la próxima llamada
+                    if ticker not in fallidos:
+                        self._guardar(ticker, guardado_at, cargadas.get(ticker))
+                    self._en_vuelo.pop(ticker, None)
+            for ticker, futuro in mios.items():
+                futuro.set_result(cargadas.get(ticker))
+                if cargadas.get(ticker) is not None:
+                    filas[ticker] = cargadas[ticker]
+
+        for ticker, futuro in ajenos.items():
+            fila = futuro.result()
+            if fila is not None:
+                filas[ticker] = fila
+        return filas
+
+    def invalidar(self, ticker: str | None = None):
+        with self._lock:
+            if ticker is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(ticker, None)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            consultas = self._contadores["hits"] + self._contadores["misses"] + self._contadores["coalescidas"]
+            return {
+                **self._contadores,
+                "entradas": len(self._entradas),
+                "hit_ratio": round((self._contadores["hits"] + self._contadores["coalescidas"]) / consultas, 3) if consultas else 0.0,
+            }
+
+    def _guardar(self, ticker: str, guardado_at: float, fila: dict | None):
+        self._entradas[ticker] = (guardado_at, fila)
+        self._entradas.move_to_end(ticker)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self._contadores["desalojadas"] += 1
+
+
+cache_cotizaciones = CacheCotizaciones(max_entradas=int(os.getenv("CACHE_COTIZACIONES_MAX", "2000")))
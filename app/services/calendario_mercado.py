@@ -0,0 +1,233 @@
+# app/services/calendario_mercado.py
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+import pytz
+
+TZ_NY = pytz.timezone("America/New_York")
+TZ_ARG = pytz.timezone("America/Argentina/Buenos_Aires")
+
+APERTURA = (9, 30)
+CIERRE = (16, 0)
+CIERRE_MEDIA_RUEDA = (13, 0)
+DIA = 86400
+
+
+def _pascua(anio: int) -> date:
+    """Domingo de Pascua (algoritmo gregoriano anónimo)"""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    return date(anio, mes, (h + l - 7 * m + 114) % 31 + 1)
+
+
+def _nesimo(anio: int, mes: int, dia_semana: int, n: int) -> date:
+    """n-ésimo día de la semana del mes (n=-1: el último)"""
+    if n > 0:
+        primero = date(anio, mes, 1)
+        return primero + timedelta(days=(dia_semana - primero.weekday()) % 7 + 7 * (n - 1))
+    ultimo = (date(anio, mes + 1, 1) if mes < 12 else date(anio + 1, 1, 1)) - timedelta(days=1)
+    return ultimo - timedelta(days=(ultimo.weekday() - dia_semana) % 7)
+
+
+def _observado(fecha: date) -> date | None:
+    """Feriado fijo que cae en fin de semana: sábado -> viernes, domingo -> lunes"""
+    if fecha.weekday() == 5:
+        # NYSE no cierra el viernes 31/12 por el Año Nuevo del sábado
+        return None if (fecha.month, fecha.day) == (1, 1) else fecha - timedelta(days=1)
+    if fecha.weekday() == 6:
+        return fecha + timedelta(days=1)
+    return fecha
+
+
+def feriados_nyse(anio: int) -> set[date]:
+    fechas = {
+        _observado(date(anio, 1, 1)),
+        _nesimo(anio, 1, 0, 3),            # Martin Luther King Jr.
+        _nesimo(anio, 2, 0, 3),            # Presidents' Day
+        _pascua(anio) - timedelta(days=2),  # Good Friday
+        _nesimo(anio, 5, 0, -1),           # Memorial Day
+        _observado(date(anio, 7, 4)),
+        _nesimo(anio, 9, 0, 1),            # Labor Day
+        _nesimo(anio, 11, 3, 4),           # Thanksgiving
+        _observado(date(anio, 12, 25)),
+    }
+    if anio >= 2022:
+        fechas.add(_observado(date(anio, 6, 19)))  # Juneteenth
+    fechas.discard(None)
+    return fechas
+
+
+def medias_ruedas_nyse(anio: int, feriados: set[date]) -> set[date]:
+    """Cierre 13:00 ET: víspera de la Independencia, viernes después de Thanksgiving y Nochebuena"""
+    candidatas = {date(anio, 7, 3), _nesimo(anio, 11, 3, 4) + timedelta(days=1), date(anio, 12, 24)}
+    return {f for f in candidatas if f.weekday() < 5 and f not in feriados}
+
+
+class CalendarioMercado:
+    """
+    Ruedas de NYSE precalculadas (feriados, medias ruedas y horario de verano)
+    como timestamps UTC. Una rueda nunca cruza el día UTC, así que
+    `esta_abierto` y `proxima_apertura` son un acceso por índice de día: O(1).
+    """
+
+    def __init__(self, anios_atras: int = 1, anios_adelante: int = 2):
+        self._lock = threading.Lock()
+        self._atras = anios_atras
+        self._adelante = anios_adelante
+        self._anios = None                 # (primero, ultimo) precalculados
+        self._desde = 0                    # primer día UTC cubierto
+        self._ruedas: list[tuple] = []     # (apertura, cierre) ordenadas
+        self._por_dia: list[int] = []      # día UTC -> índice de la primera rueda que no terminó antes de ese día
+        self.feriados: set[date] = set()
+        self.medias_ruedas: set[date] = set()
+
+    # ========== CONSULTA ==========
+    def esta_abierto(self, ts: float | None = None) -> bool:
+        return self.rueda(ts) is not None
+
+    def rueda(self, ts: float | None = None) -> tuple | None:
+        """(apertura, cierre) de la rueda en curso, o None con el mercado cerrado"""
+        ts = time.time() if ts is None else ts
+        ruedas, i = self._indice(ts)
+        if i < len(ruedas) and ruedas[i][0] <= ts < ruedas[i][1]:
+            return ruedas[i]
+        return None
+
+    def proxima_apertura(self, ts: float | None = None) -> float:
+        """Timestamp de la primera apertura posterior a `ts`"""
+        ts = time.time() if ts is None else ts
+        ruedas, i = self._indice(ts)
+        if i < len(ruedas) and ruedas[i][0] <= ts:
+            i += 1
+        if i >= len(ruedas):
+            # Después de la última rueda precalculada: se cubre el año siguiente
+            with self._lock:
+                self._asegurar(datetime.fromtimestamp(ts, pytz.utc).year + 1)
+            ruedas, i = self._indice(ts)
+            if ruedas[i][0] <= ts:
+                i += 1
+        return ruedas[i][0]
+
+    def es_dia_habil(self, fecha: date) -> bool:
+        with self._lock:
+            self._asegurar(fecha.year)
+            return fecha.weekday() < 5 and fecha not in self.feriados
+
+    def apertura(self, fecha: date) -> float | None:
+        """Timestamp de apertura de la rueda del día (None si no opera)"""
+        if not self.es_dia_habil(fecha):
+            return None
+        return self._limites(fecha, False)[0]
+
+    def horario(self, fecha: date) -> dict | None:
+        """Apertura y cierre del día en hora de Nueva York y de Buenos Aires"""
+        if not self.es_dia_habil(fecha):
+            return None
+        apertura, cierre = self._limites(fecha, fecha in self.medias_ruedas)
+        return {
+            "fecha": fecha.isoformat(),
+            "media_rueda": fecha in self.medias_ruedas,
+            "apertura_ny": datetime.fromtimestamp(apertura, TZ_NY).strftime("%H:%M"),
+            "cierre_ny": datetime.fromtimestamp(cierre, TZ_NY).strftime("%H:%M"),
+            "apertura_arg": datetime.fromtimestamp(apertura, TZ_ARG).strftime("%H:%M"),
+            "cierre_arg": datetime.fromtimestamp(cierre, TZ_ARG).strftime("%H:%M"),
+        }
+
+    # ========== PRECÁLCULO ==========
+    def _indice(self, ts: float) -> tuple[list, int]:
+        with self._lock:
+            self._asegurar(datetime.fromtimestamp(ts, pytz.utc).year)
+            return self._ruedas, self._por_dia[int(ts // DIA) - self._desde]
+
+    def _asegurar(self, anio: int):
+        if self._anios is None:
+            self._construir(anio - self._atras, anio + self._adelante)
+        elif not self._anios[0] <= anio <= self._anios[1]:
+            self._construir(min(anio, self._anios[0]), max(anio, self._anios[1]))
+
+    @staticmethod
+    def _limites(fecha: date, media_rueda: bool) -> tuple[float, float]:
+        cierre = CIERRE_MEDIA_RUEDA if media_rueda else CIERRE
+        return (
+            TZ_NY.localize(datetime(fecha.year, fecha.month, fecha.day, *APERTURA)).timestamp(),
+            TZ_NY.localize(datetime(fecha.year, fecha.month, fecha.day, *cierre)).timestamp(),
+        )
+
+    def _construir(self, primero: int, ultimo: int):
+        feriados, medias = set(), set()
+        for anio in range(primero, ultimo + 1):
+            feriados_anio = feriados_nyse(anio)
+            feriados |= feriados_anio
+            medias |= medias_ruedas_nyse(anio, feriados_anio)
+
+        ruedas = []
+        fecha = date(primero, 1, 1)
+        while fecha.year <= ultimo:
+            if fecha.weekday() < 5 and fecha not in feriados:
+                ruedas.append(self._limites(fecha, fecha in medias))
+            fecha += timedelta(days=1)
+
+        desde = int(datetime(primero, 1, 1, tzinfo=pytz.utc).timestamp() // DIA)
+        hasta = int(datetime(ultimo + 1, 1, 1, tzinfo=pytz.utc).timestamp() // DIA)
+        por_dia, i = [], 0
+        for dia in range(desde, hasta):
+            while i < len(ruedas) and ruedas[i][1] <= dia * DIA:
+                i += 1
+            por_dia.append(i)
+
+        self._anios, self._desde = (primero, ultimo), desde
+        self._ruedas, self._por_dia = ruedas, por_dia
+        self.feriados, self.medias_ruedas = feriados, medias
+
+
+class CompuertaMercado:
+    """
+    Decide si un job corre según el calendario: en rueda siempre, fuera de rueda
+    como mucho cada `cada` segundos (o nunca). Cuenta las corridas evitadas por job.
+    """
+
+    def __init__(self, calendario: CalendarioMercado):
+        self.calendario = calendario
+        self._lock = threading.Lock()
+        self._ultima: dict[str, float] = {}
+        self.evitadas = Counter()
+
+    def permitir(self, job: str, cada: float | None = None, ts: float | None = None) -> bool:
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            if not self.calendario.esta_abierto(ts):
+                ultima = self._ultima.get(job)
+                if cada is None or (ultima is not None and ts - ultima < cada):
+                    self.evitadas[job] += 1
+                    return False
+            self._ultima[job] = ts
+            return True
+
+    def evitar(self, job: str):
+        with self._lock:
+            self.evitadas[job] += 1
+
+    def metricas(self) -> dict:
+        ahora = time.time()
+        with self._lock:
+            evitadas = dict(self.evitadas)
+        return {
+            "abierto": self.calendario.esta_abierto(ahora),
+            "proxima_apertura": datetime.fromtimestamp(self.calendario.proxima_apertura(ahora), TZ_ARG).isoformat(),
+            "corridas_evitadas": evitadas,
+        }
+
+
+calendario_mercado = CalendarioMercado()
+compuerta_mercado = CompuertaMercado(calendario_mercado)
+# Fuera de rueda los precios se refrescan cada 30 min (captura el cierre y el after-hours)
+PRECIOS_FUERA_DE_HORARIO = int(os.getenv("PRECIOS_FUERA_DE_HORARIO_MIN", "30")) * 60
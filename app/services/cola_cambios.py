@@ -0,0 +1,30 @@
+# app/services/cola_cambios.py
+import threading
+
+
+class ColaCambios:
+    """
+    Cola de tickers cuyo precio cambió (sin duplicados).
+    El refresco de precios publica y el evaluador de alertas consume.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tickers: set[str] = set()
+
+    def publicar(self, *tickers: str):
+        with self._lock:
+            self._tickers.update(tickers)
+
+    def tomar(self) -> set[str]:
+        """Vacía la cola y devuelve los tickers pendientes"""
+        with self._lock:
+            tickers, self._tickers = self._tickers, set()
+        return tickers
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tickers)
+
+
+cola_cambios = ColaCambios()
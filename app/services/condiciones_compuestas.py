@@ -0,0 +1,95 @@
+# app/services/condiciones_compuestas.py
+import threading
+from collections import defaultdict
+from typing import Callable
+
+# Un predicado recibe el snapshot del ticker en el ciclo: {"precio": 150.0, "volumen": 1000}
+Predicado = Callable[[dict], bool]
+
+_cache: dict[int, tuple] = {}  # alerta_id -> (created_at, predicado)
+_lock = threading.Lock()
+
+
+def obtener_predicado(alerta) -> Predicado:
+    """Predicado compilado de una alerta compuesta (cacheado por ID)"""
+    with _lock:
+        entrada = _cache.get(alerta.id)
+    # created_at descarta un predicado de otra alerta que tuvo el mismo ID
+    if entrada is not None and entrada[0] == alerta.created_at:
+        return entrada[1]
+
+    predicado = compilar(alerta)
+    with _lock:
+        _cache[alerta.id] = (alerta.created_at, predicado)
+    return predicado
+
+
+def invalidar(alerta_id: int):
+    """Descarta el predicado compilado cuando la alerta cambia"""
+    with _lock:
+        _cache.pop(alerta_id, None)
+
+
+def compilar(alerta) -> Predicado:
+    """Compila el árbol AND/OR de la alerta en un predicado con cortocircuito"""
+    condiciones_por_grupo = defaultdict(list)
+    for condicion in alerta.condiciones:
+        condiciones_por_grupo[condicion.grupo_id].append(condicion)
+
+    subgrupos = defaultdict(list)
+    for grupo in alerta.grupos:
+        subgrupos[grupo.grupo_padre_id].append(grupo)
+
+    def compilar_grupo(grupo_id, operador):
+        hijos = sorted(subgrupos[grupo_id], key=lambda g: g.orden)
+        predicados = [compilar_grupo(g.id, g.operador_logico) for g in hijos]
+        return _combinar(operador, condiciones_por_grupo[grupo_id], predicados)
+
+    return compilar_grupo(None, alerta.operador_logico or "AND")
+
+
+def _combinar(operador: str, condiciones: list, subpredicados: list) -> Predicado:
+    es_or = operador == "OR"
+
+    # Por campo y tipo alcanza con un solo umbral: en AND el más exigente
+    # (si ese no se cumple ninguno de los demás importa), en OR el más laxo.
+    umbrales = {}
+    for condicion in condiciones:
+        tipo = condicion.tipo_condicion.value
+        if tipo not in ("mayor_que", "menor_que"):
+            # igual_a nunca se cumple: anula un AND y no aporta a un OR
+            if es_or:
+                continue
+            return lambda datos: False
+        clave = (condicion.campo.value, tipo)
+        previo = umbrales.get(clave)
+        if previo is None:
+            umbrales[clave] = condicion.valor
+        elif (tipo == "mayor_que") != es_or:
+            umbrales[clave] = max(previo, condicion.valor)
+        else:
+            umbrales[clave] = min(previo, condicion.valor)
+
+    # Primero las hojas (una lectura del snapshot), después los subgrupos
+    predicados = [_hoja(campo, tipo, valor) for (campo, tipo), valor in sorted(umbrales.items())]
+    predicados.extend(subpredicados)
+
+    if not predicados:
+        return lambda datos: False
+    if len(predicados) == 1:
+        return predicados[0]
+    if es_or:
+        return lambda datos: any(p(datos) for p in predicados)
+    return lambda datos: all(p(datos) for p in predicados)
+
+
+def _hoja(campo: str, tipo: str, umbral: float) -> Predicado:
+    if tipo == "mayor_que":
+        def predicado(datos):
+            valor = datos.get(campo)
+            return valor is not None and valor > umbral
+    else:
+        def predicado(datos):
+            valor = datos.get(campo)
+            return valor is not None and valor < umbral
+    return predicado
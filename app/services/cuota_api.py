@@ -0,0 +1,149 @@
+# app/services/cuota_api.py
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.config.database import SessionLocal
+from app.models.cuota_api import CuotaAPI
+
+# Cupo diario por proveedor en créditos (los demás solo tienen límite por minuto)
+LIMITES_DIARIOS = {
+    "twelvedata": int(os.getenv("LIMITE_TWELVEDATA_DIA", "800")),
+}
+
+
+class LibroCuotas:
+    """
+    Libro de consumo de APIs externas por proveedor y día UTC (el reinicio de los
+    cupos). Cada consulta saliente se anota en memoria y se vuelca cada `intervalo`
+    segundos con un upsert que suma, así los workers comparten la misma cuenta.
+    Usa siempre su propia sesión: nunca confirma ni revierte la de quien lo llama.
+    """
+
+    def __init__(self, intervalo: float = 10, limites: dict | None = None):
+        self.intervalo = intervalo
+        self.limites = LIMITES_DIARIOS if limites is None else limites
+        self._lock = threading.Lock()
+        self._pendientes = defaultdict(lambda: [0, 0, None, None])  # (proveedor, dia) -> [consultas, creditos, primera, ultima]
+        self._compartido = {}  # (proveedor, dia) -> [consultas, creditos, primera] de la BD al último volcado o lectura
+        self._volcado = time.monotonic()
+        self._errores = 0
+
+    def registrar(self, proveedor: str, consultas: int = 1, creditos: int | None = None):
+        """Anota una consulta saliente (los créditos por defecto son las consultas)"""
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            pendiente = self._pendientes[(proveedor, ahora.date())]
+            pendiente[0] += consultas
+            pendiente[1] += consultas if creditos is None else creditos
+            pendiente[2] = pendiente[2] or ahora
+            pendiente[3] = ahora
+            vencido = time.monotonic() - self._volcado >= self.intervalo
+        if vencido:
+            self.volcar()
+
+    def volcar(self):
+        """Suma lo pendiente en la BD con un solo INSERT ... ON CONFLICT multi-fila"""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, defaultdict(lambda: [0, 0, None, None])
+            self._volcado = time.monotonic()
+        if not pendientes:
+            return
+
+        db = SessionLocal()
+        try:
+            stmt = pg_insert(CuotaAPI).values([
+                {"proveedor": proveedor, "dia": dia, "consultas": c, "creditos": cr, "primera_at": primera, "ultima_at": ultima}
+                for (proveedor, dia), (c, cr, primera, ultima) in pendientes.items()
+            ])
+            # RETURNING trae los totales compartidos: /health los muestra sin consultar la BD
+            filas = db.execute(stmt.on_conflict_do_update(
+                index_elements=[CuotaAPI.proveedor, CuotaAPI.dia],
+                set_={
+                    "consultas": CuotaAPI.consultas + stmt.excluded.consultas,
+                    "creditos": CuotaAPI.creditos + stmt.excluded.creditos,
+                    "ultima_at": stmt.excluded.ultima_at,
+                }
+            ).returning(CuotaAPI.proveedor, CuotaAPI.dia, CuotaAPI.consultas, CuotaAPI.creditos, CuotaAPI.primera_at)).all()
+            db.commit()
+            self._actualizar_compartido(filas)
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Error guardando consumo de APIs: {e}")
+            # Se devuelve a pendientes para el próximo volcado
+            with self._lock:
+                self._errores += 1
+                for clave, (c, cr, primera, ultima) in pendientes.items():
+                    pendiente = self._pendientes[clave]
+                    pendiente[0] += c
+                    pendiente[1] += cr
+                    pendiente[2] = min(filter(None, (pendiente[2], primera)))
+                    pendiente[3] = max(filter(None, (pendiente[3], ultima)))
+        finally:
+            db.close()
+
+    def uso(self) -> dict:
+        """
+        Consumo de hoy de todos los proveedores en una consulta:
+        {proveedor: {"consultas", "creditos", "limite_diario", "restantes", "creditos_por_minuto"}}
+        """
+        self.volcar()
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        db = SessionLocal()
+        try:
+            filas = db.query(
+                CuotaAPI.proveedor, CuotaAPI.dia, CuotaAPI.consultas, CuotaAPI.creditos, CuotaAPI.primera_at
+            ).filter(CuotaAPI.dia == ahora.date()).all()
+        finally:
+            db.close()
+        self._actualizar_compartido(filas)
+        return self._resumen({proveedor: [c, cr, primera] for proveedor, _, c, cr, primera in filas}, ahora)
+
+    def restantes(self, proveedor: str) -> int | None:
+        """Créditos que le quedan hoy a un proveedor (None si no tiene cupo diario)"""
+        return self.uso().get(proveedor, {}).get("restantes")
+
+    def metricas(self) -> dict:
+        """
+        Consumo de hoy sin tocar la BD: los totales compartidos del último volcado más
+        lo que este proceso todavía no volcó (los otros workers se ven con hasta
+        `intervalo` segundos de atraso).
+        """
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            totales = {proveedor: list(total) for (proveedor, dia), total in self._compartido.items() if dia == ahora.date()}
+            for (proveedor, dia), (c, cr, primera, _) in self._pendientes.items():
+                if dia != ahora.date():
+                    continue
+                total = totales.setdefault(proveedor, [0, 0, primera])
+                total[0] += c
+                total[1] += cr
+                total[2] = min(filter(None, (total[2], primera)))
+            errores = self._errores
+        return {"proveedores": self._resumen(totales, ahora), "errores_volcado": errores}
+
+    def _actualizar_compartido(self, filas):
+        with self._lock:
+            for proveedor, dia, consultas, creditos, primera in filas:
+                self._compartido[(proveedor, dia)] = [consultas, creditos, primera]
+
+    def _resumen(self, totales: dict, ahora: datetime) -> dict:
+        uso = {}
+        for proveedor, (consultas, creditos, primera) in totales.items():
+            minutos = max((ahora - primera).total_seconds() / 60, 1)
+            limite = self.limites.get(proveedor)
+            uso[proveedor] = {
+                "consultas": consultas,
+                "creditos": creditos,
+                "limite_diario": limite,
+                "restantes": None if limite is None else max(limite - creditos, 0),
+                "creditos_por_minuto": round(creditos / minutos, 2),
+            }
+        for proveedor, limite in self.limites.items():
+            uso.setdefault(proveedor, {"consultas": 0, "creditos": 0, "limite_diario": limite, "restantes": limite, "creditos_por_minuto": 0.0})
+        return uso
+
+
+libro_cuotas = LibroCuotas()
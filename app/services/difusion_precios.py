@@ -0,0 +1,114 @@
+# app/services/difusion_precios.py
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable
+from app.services.snapshot_precios import SnapshotPrecios, snapshot_precios
+
+KEEPALIVE = 15  # segundos sin eventos antes de mandar un comentario (y revisar los tickers del usuario)
+MAX_PENDIENTES = 100
+
+
+def formatear(evento: str, datos) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos)}\n\n"
+
+
+class _DifusorTicker:
+    """Un difusor por ticker: el evento se arma una vez y se reparte a sus clientes"""
+
+    def __init__(self):
+        self.clientes: set[asyncio.Queue] = set()
+        self.version = None
+
+
+class DifusionPrecios:
+    """
+    Stream de precios por SSE. Una tarea por proceso vigila en el snapshot solo las
+    versiones de los tickers con clientes conectados (memoria o archivo compartido,
+    sin BD) y, cuando una cambia, difunde el precio a los clientes de ese ticker.
+    """
+
+    def __init__(self, snapshot: SnapshotPrecios = snapshot_precios, intervalo: float = 1.0):
+        self.snapshot = snapshot
+        self.intervalo = intervalo
+        self._difusores: dict[str, _DifusorTicker] = {}
+        self._tarea: asyncio.Task | None = None
+        self.clientes = 0
+        self.eventos = 0
+
+    async def stream(self, tickers_de: Callable[[], Awaitable[list]], desconectado: Callable[[], Awaitable[bool]]):
+        """Snapshot inicial de los tickers del usuario y después solo sus cambios"""
+        tickers = set(await tickers_de())
+        cola = asyncio.Queue(maxsize=MAX_PENDIENTES)
+        self._suscribir(cola, tickers)
+        self.clientes += 1
+        try:
+            yield formatear("snapshot", {"tickers": [self._leer(t)[0] for t in sorted(tickers)]})
+            while not await desconectado():
+                try:
+                    yield await asyncio.wait_for(cola.get(), timeout=KEEPALIVE)
+                    continue
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+
+                # Alertas creadas o borradas mientras tanto (el set viene cacheado)
+                actuales = set(await tickers_de())
+                if actuales != tickers:
+                    self._desuscribir(cola, tickers - actuales)
+                    self._suscribir(cola, actuales - tickers)
+                    tickers = actuales
+                    yield formatear("snapshot", {"tickers": [self._leer(t)[0] for t in sorted(tickers)]})
+        finally:
+            self._desuscribir(cola, tickers)
+            self.clientes -= 1
+
+    def metricas(self) -> dict:
+        return {"clientes": self.clientes, "tickers": len(self._difusores), "eventos": self.eventos}
+
+    # ========== SUSCRIPCIONES ==========
+    def _suscribir(self, cola: asyncio.Queue, tickers):
+        for ticker in tickers:
+            difusor = self._difusores.get(ticker)
+            if difusor is None:
+                difusor = self._difusores[ticker] = _DifusorTicker()
+                difusor.version = self._leer(ticker)[1]
+            difusor.clientes.add(cola)
+        if self._difusores and (self._tarea is None or self._tarea.done()):
+            self._tarea = asyncio.get_running_loop().create_task(self._vigilar())
+
+    def _desuscribir(self, cola: asyncio.Queue, tickers):
+        for ticker in tickers:
+            difusor = self._difusores.get(ticker)
+            if difusor is None:
+                continue
+            difusor.clientes.discard(cola)
+            if not difusor.clientes:
+                del self._difusores[ticker]
+
+    # ========== DIFUSIÓN ==========
+    async def _vigilar(self):
+        while self._difusores:
+            await asyncio.sleep(self.intervalo)
+            for ticker, difusor in list(self._difusores.items()):
+                datos, version = self._leer(ticker)
+                if version == difusor.version:
+                    continue
+                difusor.version = version
+                evento = formatear("precio", datos)
+                self.eventos += 1
+                for cola in difusor.clientes:
+                    if cola.full():
+                        # Cliente lento: se descarta lo más viejo
+                        cola.get_nowait()
+                    cola.put_nowait(evento)
+
+    def _leer(self, ticker: str) -> tuple[dict, tuple]:
+        """Datos para el cliente y versión (precio, volumen), leídos juntos"""
+        datos, versiones = self.snapshot.leer(ticker)
+        version = (versiones["precio"], versiones["volumen"])
+        if datos is None:
+            return {"symbol": ticker, "price": None, "change": 0}, version
+        return {"symbol": ticker, "price": datos["price"], "change": datos["change"], "stale": datos.get("stale", False)}, version
+
+
+difusion_precios = DifusionPrecios(intervalo=float(os.getenv("STREAM_INTERVALO", "1")))
@@ -9,8 +9,9 @@ from app.models.alertas import (
 )
 from app.enums.eventos import ImpactoEvento, TipoEvento
 from datetime import date, datetime, timedelta
-import requests
-import os
+from fastapi import HTTPException
+from app.providers.registro import obtener_proveedor
+from app.services.pool_consultas import pool_consultas
 
 
 def obtener_tickers_activos(db: Session):
@@ -22,11 +23,12 @@ def obtener_tickers_activos(db: Session):
     return list(tickers)
 
 def sincronizar_eventos(db: Session):
-    api_key = os.getenv("FINNHUB_API_KEY")
-    if  not api_key:
+    try:
+        eventos_creados = sincronizar_earnings(db)
+    except HTTPException as e:
+        # Sin API key configurada no hay nada que sincronizar
+        print(f"Eventos no sincronizados: {e.detail}")
         return 0
-    
-    eventos_creados = sincronizar_earnings_finnhub(db, api_key)
     return eventos_creados
 
 # def sincronizar_eventos_fmp(db: Session, fmp_key: str):
@@ -92,29 +94,29 @@ def sincronizar_eventos(db: Session):
 #     return eventos_creados
 
 
-def sincronizar_earnings_finnhub(db: Session, finnhub_key: str):
-    """Eventos MICRO desde Finnhub (solo tickers con alertas)"""
+def sincronizar_earnings(db: Session):
+    """Eventos MICRO desde el proveedor de earnings (solo tickers con alertas)"""
     tickers = obtener_tickers_activos(db)
     if not tickers:
         return 0
 
     eventos_creados = 0
-    url = "https://finnhub.io/api/v1/calendar/earnings"
-
-    for ticker in tickers:
-        params = {
-            "token": finnhub_key,
-            "symbol": ticker,
-            "from": date.today().isoformat(),
-            "to": (date.today() + timedelta(days=60)).isoformat(),
-        }
-
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
+    proveedor = obtener_proveedor()
+    desde = date.today()
+    hasta = date.today() + timedelta(days=60)
+
+    # Consultas en paralelo con el cupo del proveedor; la BD se usa solo en este hilo
+    consultas = pool_consultas.mapear(
+        proveedor.fuente("earnings"), lambda ticker: proveedor.earnings(ticker, desde, hasta), tickers, plazo=300
+    )
+    for ticker, fechas, error in consultas:
+        if error:
+            if isinstance(error, HTTPException) and error.status_code == 400:
+                raise error
             continue
 
-        for earning in response.json().get("earningsCalendar", []):
-            fecha = datetime.strptime(earning["date"], "%Y-%m-%d")
+        for fecha_earning in fechas:
+            fecha = datetime.combine(fecha_earning, datetime.min.time())
 
             # No duplicar
             if (
@@ -0,0 +1,160 @@
+# app/services/historial_intradia.py
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from app.services.cache_compartido import ArchivoHistorial, ruta
+
+
+class _Ventana:
+    """
+    Ventana deslizante de `segundos` sobre el buffer: primer valor, mínimo y máximo en O(1)
+    (colas monótonas de índices absolutos, amortizado O(1) por muestra).
+    """
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self.inicio = 0  # índice absoluto de la primera muestra dentro de la ventana
+        self.minimos = deque()
+        self.maximos = deque()
+
+    def agregar(self, indice: int, precios: array, capacidad: int):
+        precio = precios[indice % capacidad]
+        while self.minimos and precios[self.minimos[-1] % capacidad] >= precio:
+            self.minimos.pop()
+        self.minimos.append(indice)
+        while self.maximos and precios[self.maximos[-1] % capacidad] <= precio:
+            self.maximos.pop()
+        self.maximos.append(indice)
+
+    def expirar(self, hasta: float, fin: int, tiempos: array, capacidad: int):
+        """Descarta lo anterior a `hasta` y lo que el buffer ya pisó"""
+        self.inicio = max(self.inicio, fin - capacidad)
+        while self.inicio < fin and tiempos[self.inicio % capacidad] < hasta:
+            self.inicio += 1
+        while self.minimos and self.minimos[0] < self.inicio:
+            self.minimos.popleft()
+        while self.maximos and self.maximos[0] < self.inicio:
+            self.maximos.popleft()
+
+
+class BufferTicker:
+    """Buffer circular de tamaño fijo con las muestras (timestamp, precio, volumen) de un ticker"""
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self.tiempos = array("d", bytes(8 * capacidad))
+        self.precios = array("d", bytes(8 * capacidad))
+        self.volumenes = array("q", bytes(8 * capacidad))
+        self.total = 0  # muestras agregadas desde el arranque (índice absoluto de la próxima)
+        self.ventanas: dict[float, _Ventana] = {}
+
+    def agregar(self, timestamp: float, precio: float, volumen):
+        slot = self.total % self.capacidad
+        self.tiempos[slot] = timestamp
+        self.precios[slot] = precio
+        self.volumenes[slot] = -1 if volumen is None else int(volumen)
+        self.total += 1
+        for ventana in self.ventanas.values():
+            # Primero se descarta lo pisado por la muestra nueva, después se la agrega
+            ventana.expirar(timestamp - ventana.segundos, self.total, self.tiempos, self.capacidad)
+            ventana.agregar(self.total - 1, self.precios, self.capacidad)
+
+    def ventana(self, segundos: float, ahora: float) -> dict | None:
+        """{"primero", "minimo", "maximo", "muestras"} de los últimos `segundos`"""
+        ventana = self.ventanas.get(segundos)
+        if ventana is None:
+            # Primera consulta de este largo: se arma una vez con lo que haya en el buffer
+            ventana = self.ventanas[segundos] = _Ventana(segundos)
+            ventana.inicio = max(0, self.total - self.capacidad)
+            for indice in range(ventana.inicio, self.total):
+                ventana.agregar(indice, self.precios, self.capacidad)
+        ventana.expirar(ahora - segundos, self.total, self.tiempos, self.capacidad)
+        if ventana.inicio >= self.total:
+            return None
+        return {
+            "primero": self.precios[ventana.inicio % self.capacidad],
+            "minimo": self.precios[ventana.minimos[0] % self.capacidad],
+            "maximo": self.precios[ventana.maximos[0] % self.capacidad],
+            "muestras": self.total - ventana.inicio,
+        }
+
+    def serie(self, desde: float) -> list[tuple]:
+        """Muestras desde `desde`, de la más vieja a la más nueva"""
+        return [
+            (self.tiempos[i % self.capacidad], self.precios[i % self.capacidad],
+             None if self.volumenes[i % self.capacidad] < 0 else self.volumenes[i % self.capacidad])
+            for i in range(max(0, self.total - self.capacidad), self.total)
+            if self.tiempos[i % self.capacidad] >= desde
+        ]
+
+
+class HistorialIntradia:
+    """
+    Un BufferTicker por ticker seguido; lo llena el job de precios en cada refresco.
+    Con `archivo`, el líder escribe las muestras en el archivo compartido y cada
+    proceso (el líder incluido) copia a su buffer solo las que le faltan al leer.
+    """
+
+    def __init__(self, capacidad: int = 512, archivo: ArchivoHistorial | None = None):
+        self.capacidad = capacidad
+        self._archivo = archivo
+        self._lock = threading.Lock()
+        self._buffers: dict[str, BufferTicker] = {}
+
+    def agregar(self, ticker: str, precio: float, volumen, timestamp: float | None = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            buffer = self._sincronizar(ticker)
+            # Muestras fuera de orden (ej: la restaurada al reiniciar) desarmarían las ventanas
+            if buffer is not None and buffer.total and timestamp <= buffer.tiempos[(buffer.total - 1) % self.capacidad]:
+                return
+            if self._archivo is not None:
+                self._archivo.agregar(ticker, timestamp, precio, volumen)
+                return
+            if buffer is None:
+                buffer = self._buffers[ticker] = BufferTicker(self.capacidad)
+            buffer.agregar(timestamp, precio, volumen)
+
+    def ventana(self, ticker: str, minutos: float, ahora: float | None = None) -> dict | None:
+        with self._lock:
+            buffer = self._sincronizar(ticker)
+            if buffer is None:
+                return None
+            return buffer.ventana(minutos * 60, time.time() if ahora is None else ahora)
+
+    def serie(self, ticker: str, minutos: float, ahora: float | None = None) -> list[tuple]:
+        with self._lock:
+            buffer = self._sincronizar(ticker)
+            if buffer is None:
+                return []
+            return buffer.serie((time.time() if ahora is None else ahora) - minutos * 60)
+
+    def _sincronizar(self, ticker: str) -> BufferTicker | None:
+        """Copia del archivo compartido las muestras nuevas del ticker (con self._lock tomado)"""
+        buffer = self._buffers.get(ticker)
+        if self._archivo is None:
+            return buffer
+        total, muestras = self._archivo.leer(ticker, buffer.total if buffer else 0)
+        if buffer is not None and total < buffer.total:
+            buffer = None  # el archivo se recreó: se arma de nuevo
+            total, muestras = self._archivo.leer(ticker, 0)
+        if total == 0:
+            self._buffers.pop(ticker, None)
+            return None
+        if buffer is None:
+            buffer = self._buffers[ticker] = BufferTicker(self.capacidad)
+            buffer.total = total - len(muestras)  # índices absolutos iguales a los del archivo
+        for timestamp, precio, volumen in muestras:
+            buffer.agregar(timestamp, precio, None if volumen < 0 else volumen)
+        return buffer
+
+
+# 512 muestras de a un minuto cubren una rueda completa (390 min)
+_muestras = int(os.getenv("HISTORIAL_INTRADIA_MUESTRAS", "512"))
+_ruta = ruta("historial.bin")
+historial_intradia = HistorialIntradia(
+    capacidad=_muestras,
+    archivo=ArchivoHistorial(_ruta, capacidad=int(os.getenv("HISTORIAL_INTRADIA_TICKERS", "1024")), muestras=_muestras) if _ruta else None,
+)
@@ -0,0 +1,261 @@
+# app/services/indice_alertas.py
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func
+from app.models.alertas import AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta, AlertaRegistro
+
+# Listas ordenadas que mantiene cada (ticker, campo)
+MAYOR_QUE = "mayor_que"          # se cumple cuando el valor sube por encima
+MENOR_QUE = "menor_que"          # se cumple cuando el valor baja por debajo
+RANGO = "rango"                  # extremos de rango: entrada o salida en cualquier sentido
+PORCENTAJE_SUBA = "pct_suba"     # precio_referencia * (1 + pct/100)
+PORCENTAJE_BAJA = "pct_baja"     # precio_referencia * (1 - pct/100)
+SIEMPRE = "siempre"              # sin umbral fijo (porcentaje con ventana): se evalúa en cada tick
+
+
+class _Umbrales:
+    """Umbrales de un (ticker, campo) en arrays ordenados y paralelos (valores, claves)"""
+
+    def __init__(self):
+        self.listas = {nombre: ([], []) for nombre in (MAYOR_QUE, MENOR_QUE, RANGO, PORCENTAJE_SUBA, PORCENTAJE_BAJA)}
+        self.ultimo_valor = None
+        self.pendientes = set()
+        self.siempre = set()
+
+    def insertar(self, lista: str, valor: float, clave: tuple):
+        valores, claves = self.listas[lista]
+        pos = bisect_right(valores, valor)
+        valores.insert(pos, valor)
+        claves.insert(pos, clave)
+
+    def eliminar(self, lista: str, valor: float, clave: tuple):
+        valores, claves = self.listas[lista]
+        pos = bisect_left(valores, valor)
+        while pos < len(valores) and valores[pos] == valor:
+            if claves[pos] == clave:
+                del valores[pos]
+                del claves[pos]
+                return
+            pos += 1
+
+    def vacio(self) -> bool:
+        return not self.pendientes and not self.siempre and not any(valores for valores, _ in self.listas.values())
+
+    def cruces(self, anterior: float, actual: float) -> set:
+        """Claves cuyo umbral quedó entre el valor anterior y el actual: O(log n + k)"""
+        resultado = set()
+
+        def rebanada(lista, inicio, fin):
+            resultado.update(self.listas[lista][1][inicio:fin])
+
+        if actual > anterior:
+            valores = self.listas[MAYOR_QUE][0]
+            # valor > umbral pasa a cumplirse con anterior <= umbral < actual
+            rebanada(MAYOR_QUE, bisect_left(valores, anterior), bisect_left(valores, actual))
+            valores = self.listas[PORCENTAJE_SUBA][0]
+            # valor >= disparo pasa a cumplirse con anterior < disparo <= actual
+            rebanada(PORCENTAJE_SUBA, bisect_right(valores, anterior), bisect_right(valores, actual))
+        elif actual < anterior:
+            valores = self.listas[MENOR_QUE][0]
+            # valor < umbral pasa a cumplirse con actual < umbral <= anterior
+            rebanada(MENOR_QUE, bisect_right(valores, actual), bisect_right(valores, anterior))
+            valores = self.listas[PORCENTAJE_BAJA][0]
+            # valor <= disparo pasa a cumplirse con actual <= disparo < anterior
+            rebanada(PORCENTAJE_BAJA, bisect_left(valores, actual), bisect_left(valores, anterior))
+
+        # Los rangos importan en los dos sentidos (entrada y salida)
+        valores = self.listas[RANGO][0]
+        bajo, alto = min(anterior, actual), max(anterior, actual)
+        rebanada(RANGO, bisect_left(valores, bajo), bisect_right(valores, alto))
+        return resultado
+
+    def distancia(self, valor: float) -> float | None:
+        """Distancia absoluta al umbral más cercano en cualquier sentido: O(log n) por lista"""
+        mejor = None
+        for valores, _ in self.listas.values():
+            pos = bisect_left(valores, valor)
+            for vecino in valores[max(pos - 1, 0):pos + 1]:
+                if mejor is None or abs(vecino - valor) < mejor:
+                    mejor = abs(vecino - valor)
+        return mejor
+
+    def cumplidas(self, actual: float) -> set:
+        """Sin valor previo (arranque): claves que se cumplen con el valor actual"""
+        resultado = set()
+        valores, claves = self.listas[MAYOR_QUE]
+        resultado.update(claves[:bisect_left(valores, actual)])
+        valores, claves = self.listas[MENOR_QUE]
+        resultado.update(claves[bisect_right(valores, actual):])
+        valores, claves = self.listas[PORCENTAJE_SUBA]
+        resultado.update(claves[:bisect_right(valores, actual)])
+        valores, claves = self.listas[PORCENTAJE_BAJA]
+        resultado.update(claves[bisect_left(valores, actual):])
+        # Los rangos se revisan todos para reconciliar su estado de entrada/salida
+        resultado.update(self.listas[RANGO][1])
+        return resultado
+
+
+class IndiceAlertas:
+    """
+    Índice en memoria de umbrales por (ticker, campo).
+    Con un precio nuevo devuelve solo las alertas cuyo umbral se cruzó desde el precio anterior.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._umbrales = defaultdict(_Umbrales)
+        self._entradas = {}  # (tipo, alerta_id) -> [(ticker, campo, lista, valor)]
+        self._nuevos: set[str] = set()  # tickers con alertas indexadas desde el último refresco
+        self._firma_registro = None
+        self.inicializado = False
+
+    # ========== MANTENIMIENTO ==========
+    def reconstruir(self, db: Session):
+        """Reconstruye el índice desde la BD (al arrancar)"""
+        firma = self._firma(db)
+        alertas = [
+            ("simple", db.query(AlertaSimple).filter(AlertaSimple.activo == True, AlertaSimple.activada_at.is_(None)).all()),
+            ("rango", db.query(AlertaRango).filter(AlertaRango.activo == True).all()),
+            ("porcentaje", db.query(AlertaPorcentaje).filter(AlertaPorcentaje.activo == True, AlertaPorcentaje.activada_at.is_(None)).all()),
+            ("compuesta", db.query(AlertaCompuesta)
+                .filter(AlertaCompuesta.activo == True, AlertaCompuesta.activada_at.is_(None))
+                .options(selectinload(AlertaCompuesta.condiciones)).all()),
+        ]
+        with self._lock:
+            self._umbrales.clear()
+            self._entradas.clear()
+            for tipo, alertas_tipo in alertas:
+                for alerta in alertas_tipo:
+                    self._agregar(tipo, alerta)
+            self._firma_registro = firma
+            self.inicializado = True
+
+    def reconstruir_si_cambio(self, db: Session) -> bool:
+        """
+        Con varios workers las alertas se crean y borran en otros procesos: si el
+        registro global cambió desde la última reconstrucción, se reconstruye.
+        """
+        if self.inicializado and self._firma(db) == self._firma_registro:
+            return False
+        self.reconstruir(db)
+        return True
+
+    @staticmethod
+    def _firma(db: Session) -> tuple:
+        return tuple(db.query(func.max(AlertaRegistro.id), func.count(AlertaRegistro.id)).one())
+
+    def agregar(self, tipo: str, alerta):
+        """Indexa una alerta nueva; se evalúa completa en el próximo tick de su ticker"""
+        with self._lock:
+            self._quitar((tipo, alerta.id))
+            self._agregar(tipo, alerta)
+
+    def quitar(self, tipo: str, alerta_id: int):
+        """Saca una alerta del índice (desactivada, eliminada o ya disparada)"""
+        with self._lock:
+            self._quitar((tipo, alerta_id))
+
+    def _agregar(self, tipo: str, alerta):
+        clave = (tipo, alerta.id)
+        entradas = []
+
+        if tipo == "simple":
+            if alerta.tipo_condicion.value in (MAYOR_QUE, MENOR_QUE):
+                entradas.append((alerta.campo.value, alerta.tipo_condicion.value, alerta.valor))
+        elif tipo == "rango":
+            entradas.append((alerta.campo.value, RANGO, alerta.valor_minimo))
+            entradas.append((alerta.campo.value, RANGO, alerta.valor_maximo))
+        elif tipo == "porcentaje":
+            if alerta.ventana_minutos:
+                # La referencia se mueve con la ventana: no hay umbral que indexar
+                entradas.append((alerta.campo.value, SIEMPRE, None))
+            elif alerta.precio_referencia:
+                pct = abs(alerta.porcentaje_cambio) / 100
+                entradas.append((alerta.campo.value, PORCENTAJE_SUBA, alerta.precio_referencia * (1 + pct)))
+                entradas.append((alerta.campo.value, PORCENTAJE_BAJA, alerta.precio_referencia * (1 - pct)))
+        elif tipo == "compuesta":
+            # Una compuesta solo puede pasar a cumplirse cuando alguna condición pasa a cumplirse
+            for condicion in alerta.condiciones:
+                if condicion.tipo_condicion.value in (MAYOR_QUE, MENOR_QUE):
+                    entradas.append((condicion.campo.value, condicion.tipo_condicion.value, condicion.valor))
+
+        self._nuevos.add(alerta.ticker)
+        self._entradas[clave] = []
+        for campo, lista, valor in entradas:
+            umbrales = self._umbrales[(alerta.ticker, campo)]
+            if lista == SIEMPRE:
+                umbrales.siempre.add(clave)
+            else:
+                umbrales.insertar(lista, valor, clave)
+            umbrales.pendientes.add(clave)
+            self._entradas[clave].append((alerta.ticker, campo, lista, valor))
+
+    def _quitar(self, clave: tuple):
+        for ticker, campo, lista, valor in self._entradas.pop(clave, []):
+            umbrales = self._umbrales.get((ticker, campo))
+            if not umbrales:
+                continue
+            if lista == SIEMPRE:
+                umbrales.siempre.discard(clave)
+            else:
+                umbrales.eliminar(lista, valor, clave)
+            umbrales.pendientes.discard(clave)
+            if umbrales.vacio():
+                del self._umbrales[(ticker, campo)]
+
+    # ========== CONSULTA ==========
+    def tickers(self) -> list[str]:
+        """Tickers con al menos una alerta indexada"""
+        with self._lock:
+            return sorted({ticker for ticker, _ in self._umbrales})
+
+    def tomar_nuevos(self) -> set[str]:
+        """Tickers con alertas nuevas desde la última llamada (se refrescan sin esperar su nivel)"""
+        with self._lock:
+            nuevos, self._nuevos = self._nuevos, set()
+        return nuevos
+
+    def candidatos(self, ticker: str, campo: str, valor: float) -> set:
+        """Claves (tipo, alerta_id) a re-evaluar con el valor nuevo"""
+        with self._lock:
+            umbrales = self._umbrales.get((ticker, campo))
+            if not umbrales:
+                return set()
+            if umbrales.ultimo_valor is None:
+                resultado = umbrales.cumplidas(valor)
+            else:
+                resultado = umbrales.cruces(umbrales.ultimo_valor, valor)
+            # Las pendientes salen recién en confirmar: si el ciclo falla se vuelven a evaluar
+            return resultado | umbrales.pendientes | umbrales.siempre
+
+    def distancia(self, ticker: str, precio: float) -> float | None:
+        """
+        Distancia relativa (0.02 = 2%) del precio al umbral de precio más cercano del ticker.
+        0 si tiene alertas sin umbral fijo (ventana); None si no tiene umbrales de precio.
+        """
+        with self._lock:
+            umbrales = self._umbrales.get((ticker, "precio"))
+            if not umbrales:
+                return None
+            if umbrales.siempre:
+                return 0.0
+            distancia = umbrales.distancia(precio)
+        if distancia is None or not precio:
+            return None
+        return distancia / abs(precio)
+
+    def confirmar(self, ticker: str, campo: str, valor: float, evaluadas: set = frozenset()):
+        """
+        Guarda el valor evaluado como referencia para el próximo cruce y saca de
+        pendientes las claves ya evaluadas (las agregadas mientras tanto quedan).
+        """
+        with self._lock:
+            umbrales = self._umbrales.get((ticker, campo))
+            if umbrales:
+                umbrales.ultimo_valor = valor
+                umbrales.pendientes -= evaluadas
+
+
+indice_alertas = IndiceAlertas()
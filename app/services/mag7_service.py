@@ -1,17 +1,20 @@
-import yfinance as yf
+from app.providers.registro import obtener_proveedor
+from app.services.pool_consultas import pool_consultas
+from app.services.cache_compartido import CacheJSON, ruta
 from datetime import date
 
 TICKERS = ["NVDA", "AAPL", "MSFT", "AMZN", "GOOGL", "META", "TSLA"]
 BENCHMARK = "SPY"
-_cache: dict = {}
+# Compartido entre workers cuando hay CACHE_COMPARTIDO_DIR: lo escribe el líder del refresco
+_cache = CacheJSON(ruta("mag7.json"))
 
 def _calcular_ytd(ticker: str) -> dict | None:
     try:
-        data = yf.Ticker(ticker).history(start=f"{date.today().year}-01-01")
-        if len(data) < 2:
+        barras = obtener_proveedor().barras_diarias(ticker, date(date.today().year, 1, 1))
+        if len(barras) < 2:
             return None
-        first = float(data.iloc[0]["Close"])
-        last = float(data.iloc[-1]["Close"])
+        first = barras[0]["cierre"]
+        last = barras[-1]["cierre"]
         return {
             "ticker": ticker,
             "ytd": round(((last - first) / first) * 100, 2),
@@ -21,7 +24,8 @@ def _calcular_ytd(ticker: str) -> dict | None:
         return None
 
 def actualizar_cache():
-    resultados = [r for t in TICKERS + [BENCHMARK] if (r := _calcular_ytd(t))]
+    fuente = obtener_proveedor().fuente("barras")
+    resultados = [r for _, r, _ in pool_consultas.mapear(fuente, _calcular_ytd, TICKERS + [BENCHMARK], plazo=120) if r]
     mag7 = [r for r in resultados if r["ticker"] != BENCHMARK]
     if mag7:
         resultados.append({
@@ -31,8 +35,7 @@ def actualizar_cache():
         })
     spy_row = [r for r in resultados if r["ticker"] == BENCHMARK]
     rest = sorted([r for r in resultados if r["ticker"] != BENCHMARK], key=lambda x: x["ytd"], reverse=True)
-    _cache["data"] = spy_row + rest
-    _cache["year"] = date.today().year
+    _cache.guardar({"data": spy_row + rest, "year": date.today().year})
 
 def get_cache() -> dict:
-    return _cache
\ No newline at end of file
+    return _cache.leer()
\ No newline at end of file
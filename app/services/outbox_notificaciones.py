@@ -0,0 +1,191 @@
+# app/services/outbox_notificaciones.py
+from collections import defaultdict
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+from functools import partial
+from sqlalchemy import select, insert, update, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.models.notificaciones import NotificacionOutbox, CooldownNotificacion, Suscripcion
+from app.services.push_service import despachador_push
+
+COOLDOWN = timedelta(minutes=5)
+LOTE = 500
+# Entregas fallidas o sin respuesta que se reintentan antes de darla por perdida
+MAX_INTENTOS = 5
+# Tope de cada entrega (cola, reintentos y timeouts incluidos), menor que la espera del drenador
+PLAZO_PUSH = 45
+# Una fila en_envio más vieja que esto quedó de un proceso caído
+ABANDONO = timedelta(minutes=10)
+
+
+def registrar(db: Session, activaciones_por_usuario: dict) -> int:
+    """
+    Agrega una fila al outbox por activación. No commitea: se escribe en la misma
+    transacción que los cambios de `activada_at` del ciclo.
+    """
+    filas = [
+        {"user_id": user_id, "activacion": activacion["id"], "mensaje": activacion["mensaje"]}
+        for user_id, activaciones in activaciones_por_usuario.items()
+        for activacion in activaciones
+    ]
+    if filas:
+        db.execute(insert(NotificacionOutbox), filas)
+    return len(filas)
+
+
+def drenar(db: Session, limite: int = LOTE, espera: float = PLAZO_PUSH + 15, despachador=despachador_push) -> dict:
+    """
+    Entrega un lote de pendientes en tres pasos:
+    1. Reclama filas con FOR UPDATE SKIP LOCKED (otros procesos toman las siguientes),
+       aplica el cooldown compartido, pasa a `en_envio` lo que se va a entregar y
+       commitea: ni las filas ni los cooldowns quedan bloqueados durante el HTTP.
+    2. Encola un push por usuario con un plazo (PLAZO_PUSH) menor que `espera`.
+    3. Guarda el resultado. Lo que falló vuelve a pendientes con un intento más (hasta
+       MAX_INTENTOS). Lo que sigue en vuelo queda en `en_envio` y se resuelve cuando
+       termina: nunca se vuelve a encolar.
+    Devuelve la cantidad de filas por estado.
+    """
+    ahora = datetime.now()
+    # Filas en_envio de un proceso que se cayó: no se sabe si el push salió, no se reenvían
+    db.execute(
+        update(NotificacionOutbox)
+        .where(NotificacionOutbox.estado == "en_envio", NotificacionOutbox.procesada_at < ahora - ABANDONO)
+        .values(estado="incierta")
+    )
+    pendientes = db.execute(
+        select(NotificacionOutbox.id, NotificacionOutbox.user_id, NotificacionOutbox.mensaje)
+        .where(NotificacionOutbox.estado == "pendiente")
+        .order_by(NotificacionOutbox.id)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not pendientes:
+        db.commit()
+        return {}
+
+    por_usuario = defaultdict(list)
+    for fila in pendientes:
+        por_usuario[fila.user_id].append(fila)
+
+    suscripciones = dict(db.execute(
+        select(Suscripcion.user_id, Suscripcion.subscription_data).where(Suscripcion.user_id.in_(por_usuario))
+    ).all())
+
+    bloqueados, habilitados = set(suscripciones), set()
+    if suscripciones:
+        # Siempre en orden de user_id: dos drenadores con usuarios en común no se bloquean en cruz
+        usuarios = sorted(suscripciones)
+        db.execute(
+            pg_insert(CooldownNotificacion)
+            .values([{"user_id": u, "ultima_notif_at": ahora - COOLDOWN} for u in usuarios])
+            .on_conflict_do_nothing(index_elements=[CooldownNotificacion.user_id])
+        )
+        # Un usuario que otro drenador está reclamando se saltea y sus filas siguen pendientes
+        cooldowns = db.execute(
+            select(CooldownNotificacion.user_id, CooldownNotificacion.ultima_notif_at)
+            .where(CooldownNotificacion.user_id.in_(usuarios))
+            .order_by(CooldownNotificacion.user_id)
+            .with_for_update(skip_locked=True)
+        ).all()
+        bloqueados -= {user_id for user_id, _ in cooldowns}
+        # Con el cooldown bloqueado se ve el en_envio ya commiteado: un push en vuelo espera a resolverse
+        bloqueados |= set(db.scalars(
+            select(NotificacionOutbox.user_id).distinct()
+            .where(NotificacionOutbox.estado == "en_envio", NotificacionOutbox.user_id.in_(usuarios))
+        ))
+        habilitados = {user_id for user_id, ultima in cooldowns if user_id not in bloqueados and ultima <= ahora - COOLDOWN}
+
+    ids_por_estado = defaultdict(list)
+    for user_id, filas in por_usuario.items():
+        if user_id in bloqueados:
+            continue
+        if user_id not in suscripciones:
+            estado = "sin_suscripcion"
+        elif user_id not in habilitados:
+            estado = "cooldown"
+        else:
+            estado = "en_envio"
+        ids_por_estado[estado].extend(fila.id for fila in filas)
+    for estado, ids in ids_por_estado.items():
+        db.execute(update(NotificacionOutbox).where(NotificacionOutbox.id.in_(ids)).values(estado=estado, procesada_at=ahora))
+    # El reclamo queda guardado antes de entregar: se liberan los locks
+    db.commit()
+
+    futuros = {}
+    for user_id in habilitados:
+        mensajes = [fila.mensaje for fila in por_usuario[user_id]]
+        body = "\n".join(mensajes) if len(mensajes) <= 3 else f"{mensajes[0]}\n... y {len(mensajes)-1} más"
+        futuros[user_id] = despachador.encolar(
+            suscripciones[user_id],
+            f"🔔 {len(mensajes)} Alerta(s) Activada(s)",
+            body,
+            plazo=PLAZO_PUSH
+        )
+    if futuros:
+        wait(futuros.values(), timeout=espera)
+
+    resultado = {estado: len(ids) for estado, ids in ids_por_estado.items() if estado != "en_envio"}
+    terminados = {}
+    for user_id, futuro in futuros.items():
+        ids = [fila.id for fila in por_usuario[user_id]]
+        if futuro.done():
+            terminados[user_id] = (ids, futuro)
+        else:
+            # Sigue en vuelo: se resuelve con su propia sesión cuando termine
+            futuro.add_done_callback(partial(_resolver_tarde, user_id, ids))
+            resultado["en_envio"] = resultado.get("en_envio", 0) + len(ids)
+    for estado, cantidad in _guardar_resultados(db, terminados).items():
+        resultado[estado] = resultado.get(estado, 0) + cantidad
+    db.commit()
+    return resultado
+
+
+def _guardar_resultados(db: Session, terminados: dict) -> dict:
+    """Pasa a enviada o de vuelta a pendiente las filas de pushes ya resueltos: {user_id: (ids, futuro)}"""
+    entregados, ids_enviadas, ids_reintento = [], [], []
+    for user_id, (ids, futuro) in sorted(terminados.items()):
+        if not futuro.cancelled() and futuro.exception() is None and futuro.result():
+            entregados.append(user_id)
+            ids_enviadas.extend(ids)
+        else:
+            ids_reintento.extend(ids)
+
+    ahora = datetime.now()
+    # El cooldown corre solo para los usuarios que efectivamente recibieron el push
+    if entregados:
+        db.execute(
+            update(CooldownNotificacion)
+            .where(CooldownNotificacion.user_id.in_(entregados))
+            .values(ultima_notif_at=ahora)
+        )
+        db.execute(
+            update(NotificacionOutbox)
+            .where(NotificacionOutbox.id.in_(ids_enviadas))
+            .values(estado="enviada", procesada_at=ahora)
+        )
+    if ids_reintento:
+        intentos = NotificacionOutbox.intentos + 1
+        db.execute(
+            update(NotificacionOutbox)
+            .where(NotificacionOutbox.id.in_(ids_reintento))
+            .values(
+                intentos=intentos,
+                estado=case((intentos >= MAX_INTENTOS, "fallida"), else_="pendiente"),
+                procesada_at=ahora,
+            )
+        )
+    return {estado: len(ids) for estado, ids in (("enviada", ids_enviadas), ("reintento", ids_reintento)) if ids}
+
+
+def _resolver_tarde(user_id: int, ids: list[int], futuro):
+    db = SessionLocal()
+    try:
+        _guardar_resultados(db, {user_id: (ids, futuro)})
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error guardando el resultado del push de {user_id}: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,42 @@
+# app/services/persistencia_precios.py
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.precios import PrecioSnapshot
+from app.services.historial_intradia import historial_intradia
+from app.services.snapshot_precios import snapshot_precios
+
+
+def guardar(db: Session, cotizaciones: list[tuple]):
+    """
+    Upsert de las cotizaciones del refresco (ticker, precio, cambio, volumen)
+    en un solo INSERT ... ON CONFLICT multi-fila. El commit queda a cargo del llamador.
+    """
+    if not cotizaciones:
+        return
+    ahora = datetime.now()
+    stmt = pg_insert(PrecioSnapshot).values([
+        {"ticker": t, "precio": precio, "cambio": cambio, "volumen": volumen, "actualizado_at": ahora}
+        for t, precio, cambio, volumen in cotizaciones
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[PrecioSnapshot.ticker],
+        set_={
+            "precio": stmt.excluded.precio,
+            "cambio": stmt.excluded.cambio,
+            "volumen": stmt.excluded.volumen,
+            "actualizado_at": stmt.excluded.actualizado_at,
+        }
+    ))
+
+
+def restaurar(db: Session) -> int:
+    """Carga el último snapshot guardado en memoria (una sola consulta), marcado como desactualizado"""
+    filas = db.query(
+        PrecioSnapshot.ticker, PrecioSnapshot.precio, PrecioSnapshot.cambio,
+        PrecioSnapshot.volumen, PrecioSnapshot.actualizado_at
+    ).all()
+    for ticker, precio, _, volumen, actualizado_at in filas:
+        # La muestra solo cuenta para ventanas que todavía la alcancen
+        historial_intradia.agregar(ticker, precio, volumen, actualizado_at.timestamp())
+    return snapshot_precios.restaurar(filas)
@@ -0,0 +1,72 @@
+# app/services/planificador_precios.py
+import os
+import threading
+import time
+from collections import Counter
+
+# (distancia relativa máxima al umbral más cercano, segundos entre consultas)
+NIVELES = (
+    (float(os.getenv("POLLING_CERCA_PCT", "1")) / 100, 15),
+    (float(os.getenv("POLLING_MEDIO_PCT", "5")) / 100, 60),
+    (float("inf"), 600),
+)
+# Sin umbral de precio (solo volumen, o el índice no lo conoce): cadencia histórica
+INTERVALO_SIN_UMBRAL = 60
+# Margen para el jitter del scheduler: un ticker que vence junto con el ciclo no se corre al siguiente
+HOLGURA = 1
+
+
+class PlanificadorPrecios:
+    """
+    Cadencia de refresco por ticker según qué tan cerca está el precio de disparar
+    una alerta. El job corre al ritmo del nivel más rápido y solo consulta los
+    tickers vencidos; después de cada refresco se los vuelve a clasificar.
+    """
+
+    def __init__(self, niveles: tuple = NIVELES, sin_umbral: float = INTERVALO_SIN_UMBRAL):
+        self.niveles = niveles
+        self.sin_umbral = sin_umbral
+        self._lock = threading.Lock()
+        self._proximo: dict[str, float] = {}   # ticker -> monotonic de la próxima consulta
+        self._intervalo: dict[str, float] = {}
+
+    @property
+    def intervalo_minimo(self) -> float:
+        return min(self.niveles[0][1], self.sin_umbral)
+
+    def vencidos(self, tickers, urgentes=(), ahora: float | None = None) -> list[str]:
+        """Tickers a consultar en este ciclo (los nuevos y los `urgentes` entran de inmediato)"""
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            # Los que ya no tienen alertas activas dejan de planificarse
+            for ticker in set(self._proximo) - set(tickers):
+                del self._proximo[ticker]
+                self._intervalo.pop(ticker, None)
+            return sorted(t for t in tickers if t in urgentes or self._proximo.get(t, 0) <= ahora + HOLGURA)
+
+    def reclasificar(self, ticker: str, distancia: float | None, ahora: float | None = None) -> float:
+        """
+        Asigna el nivel según la distancia relativa al umbral y devuelve el intervalo.
+        `ahora` es el inicio del ciclo que lo consultó, no el momento del refresco.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        if distancia is None:
+            intervalo = self.sin_umbral
+        else:
+            intervalo = next(segundos for maximo, segundos in self.niveles if distancia <= maximo)
+        with self._lock:
+            self._intervalo[ticker] = intervalo
+            self._proximo[ticker] = ahora + intervalo
+        return intervalo
+
+    def metricas(self) -> dict:
+        with self._lock:
+            por_nivel = Counter(self._intervalo.values())
+        refrescos = sum(cantidad * 60 / segundos for segundos, cantidad in por_nivel.items())
+        return {
+            "tickers_por_intervalo": {f"{int(segundos)}s": cantidad for segundos, cantidad in sorted(por_nivel.items())},
+            "refrescos_por_minuto": round(refrescos, 1),
+        }
+
+
+planificador_precios = PlanificadorPrecios()
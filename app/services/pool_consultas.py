@@ -0,0 +1,152 @@
+# app/services/pool_consultas.py
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturoTimeout
+from typing import Callable, Iterable, Iterator
+from app.services.cuota_api import libro_cuotas, LIMITES_DIARIOS
+
+# Cupos por minuto por proveedor: (consultas, período en segundos). Los diarios
+# (LIMITES_DIARIOS) se controlan contra el libro de cuotas, compartido y con corte UTC
+LIMITES = {
+    "yahoo": [(int(os.getenv("LIMITE_YAHOO_MINUTO", "60")), 60)],
+    "twelvedata": [(8, 60)],
+    "finnhub": [(int(os.getenv("LIMITE_FINNHUB_MINUTO", "60")), 60)],
+}
+
+
+class CupoAgotado(Exception):
+    """El proveedor ya usó su cupo diario"""
+
+
+class LimiteTokens:
+    """Token bucket: hasta `capacidad` consultas que se reponen de a poco en `periodo` segundos"""
+
+    def __init__(self, capacidad: int, periodo: float):
+        self.capacidad = capacidad
+        self.tasa = capacidad / periodo
+        self._tokens = float(capacidad)
+        self._actualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self, deadline: float | None = None, cantidad: int = 1) -> bool:
+        """Espera `cantidad` tokens. Devuelve False si no llegan antes del deadline (time.monotonic)"""
+        # Un pedido más grande que el balde nunca se completaría
+        cantidad = min(cantidad, self.capacidad)
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._actualizado) * self.tasa)
+                self._actualizado = ahora
+                if self._tokens >= cantidad:
+                    self._tokens -= cantidad
+                    return True
+                espera = (cantidad - self._tokens) / self.tasa
+            if deadline is not None and ahora + espera > deadline:
+                return False
+            time.sleep(min(espera, 1))
+
+
+class PoolConsultas:
+    """
+    Pool acotado de hilos para las consultas a proveedores externos. Cada lote respeta
+    los token buckets de su proveedor y un plazo total; los resultados se entregan a
+    medida que terminan, en el hilo del llamador (ahí se puede usar la sesión de BD).
+    Cada consulta que sale se anota con `registro(proveedor)` (el libro de cuotas) y
+    las de proveedores con cupo diario (`diarios`) antes consultan `restantes(proveedor)`.
+    """
+
+    def __init__(self, workers: int = 8, limites: dict | None = None, registro: Callable | None = None,
+                 restantes: Callable | None = None, diarios: Iterable = ()):
+        self.workers = workers
+        self.registro = registro
+        self.restantes = restantes
+        self.diarios = set(diarios)
+        self._limites = {
+            proveedor: [LimiteTokens(capacidad, periodo) for capacidad, periodo in cupos]
+            for proveedor, cupos in (LIMITES if limites is None else limites).items()
+        }
+        self._reservados = defaultdict(int)  # créditos diarios de consultas en vuelo, aún sin anotar
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def mapear(self, proveedor: str, funcion: Callable, items: Iterable, plazo: float = 30,
+               creditos: Callable | None = None) -> Iterator[tuple]:
+        """
+        Ejecuta `funcion(item)` para cada item y va devolviendo (item, resultado, error)
+        en orden de llegada. Lo que no termina dentro del plazo vuelve con TimeoutError.
+        `creditos(item)` es el costo de cada consulta en el cupo (por defecto 1).
+        """
+        deadline = time.monotonic() + plazo
+        limites = self._limites.get(proveedor, [])
+        executor = self._obtener_executor()
+
+        def tarea(item):
+            costo = creditos(item) if creditos else 1
+            reservado = self._reservar_diario(proveedor, costo)
+            try:
+                for limite in limites:
+                    if not limite.tomar(deadline, costo):
+                        raise TimeoutError(f"Sin cupo de {proveedor} dentro del plazo")
+                try:
+                    return funcion(item)
+                finally:
+                    # La consulta consume cupo aunque falle
+                    if self.registro:
+                        self.registro(proveedor, creditos=costo)
+            finally:
+                if reservado:
+                    with self._lock:
+                        self._reservados[proveedor] -= costo
+
+        futuros = {executor.submit(tarea, item): item for item in items}
+        pendientes = set(futuros)
+        try:
+            for futuro in as_completed(futuros, timeout=max(0, deadline - time.monotonic())):
+                pendientes.discard(futuro)
+                error = futuro.exception()
+                yield futuros[futuro], (None if error else futuro.result()), error
+        except FuturoTimeout:
+            for futuro in pendientes:
+                futuro.cancel()
+                yield futuros[futuro], None, TimeoutError(f"{proveedor}: sin respuesta dentro del plazo")
+
+    def _reservar_diario(self, proveedor: str, costo: int) -> bool:
+        """
+        Controla el cupo diario contra el libro de cuotas (una consulta a la BD, con corte
+        en el día UTC y compartido entre workers y reinicios) menos lo que ya está en vuelo.
+        """
+        if self.restantes is None or proveedor not in self.diarios:
+            return False
+        restantes = self.restantes(proveedor)
+        with self._lock:
+            if restantes is not None and restantes - self._reservados[proveedor] < costo:
+                raise CupoAgotado(f"Cupo diario de {proveedor} agotado ({restantes} créditos restantes)")
+            self._reservados[proveedor] += costo
+        return True
+
+    def capacidad(self, proveedor: str) -> int | None:
+        """Créditos máximos de una sola consulta: el balde más chico del proveedor"""
+        limites = self._limites.get(proveedor)
+        return min(limite.capacidad for limite in limites) if limites else None
+
+    def detener(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _obtener_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="consultas")
+            return self._executor
+
+
+pool_consultas = PoolConsultas(
+    workers=int(os.getenv("POOL_CONSULTAS_WORKERS", "8")),
+    registro=libro_cuotas.registrar,
+    restantes=libro_cuotas.restantes,
+    diarios=LIMITES_DIARIOS,
+)
@@ -1,31 +1,85 @@
 # finz/app/services/precios_service.py
-import yfinance as yf
 from typing import Optional
 from fastapi import HTTPException
+from app.services.cache_cotizaciones import cache_cotizaciones
+from app.providers.registro import obtener_proveedor
+from app.services.pool_consultas import pool_consultas
+
+CAMPOS = ("precio", "volumen", "cambio")
+# Yahoo acepta muchos símbolos por consulta; lotes chicos acotan el daño si uno falla
+TAMANO_LOTE = 50
+# Segundos, por debajo del ciclo de 15s del job de precios: un lote que no contestó a tiempo
+# no queda en cache y se vuelve a pedir en el ciclo siguiente en lugar de encimar ciclos
+PLAZO_COTIZACIONES = 12
 
 class PreciosService:
-    
+
     @staticmethod
     def obtener_dato(ticker: str, campo: str) -> Optional[float]:
         """Obtiene precio o volumen real de Yahoo Finance"""
+        if campo.lower() not in ("precio", "volumen"):
+            raise HTTPException(status_code=400, detail=f"Campo '{campo}' invalido")
+        return PreciosService.obtener_datos(ticker)[campo.lower()]
+
+    @staticmethod
+    def obtener_datos(ticker: str) -> dict:
+        """Obtiene precio y volumen de un ticker con una sola consulta a Yahoo Finance"""
         # Validar entrada vacía
         if not ticker or not ticker.strip():
             raise HTTPException(status_code=400, detail="Ticker vacío")
-        
-        try:
-            info = yf.Ticker(ticker.upper()).info
-            # Verificaciones
-            if not info or 'regularMarketPrice' not in info:
-                raise HTTPException(status_code=404, detail=f"Ticker {ticker} no encontrado")
-            
-            if campo.lower() == "precio":
-                return info.get("currentPrice") or info.get("regularMarketPrice")
-            elif campo.lower() == "volumen":
-                return info.get("regularMarketVolume") or info.get("volume")
+
+        snapshot = PreciosService.obtener_snapshot([ticker], ("precio", "volumen"))
+        if not snapshot["tickers"]:
+            raise HTTPException(status_code=404, detail=f"Ticker {ticker} no encontrado")
+        return {"precio": snapshot["precio"][0], "volumen": snapshot["volumen"][0]}
+
+    @staticmethod
+    def obtener_snapshot(tickers, campos=CAMPOS, forzar: bool = False) -> dict:
+        """
+        Cotiza muchos tickers con consultas multi-símbolo de a TAMANO_LOTE.
+        Devuelve columnas alineadas por posición: {"tickers": [...], "precio": [...], ...}.
+        Los tickers sin cotización quedan afuera. Con `forzar` se saltea el cache (y se lo renueva).
+        """
+        invalidos = [c for c in campos if c not in CAMPOS]
+        if invalidos:
+            raise HTTPException(status_code=400, detail=f"Campos invalidos: {invalidos}")
+
+        simbolos = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+        # Lo fresco sale del cache; lo demás se consulta una sola vez aunque lo pidan varios a la vez
+        filas = cache_cotizaciones.obtener(simbolos, campos, PreciosService._consultar, forzar=forzar)
+
+        snapshot = {"tickers": [], **{campo: [] for campo in campos}}
+        for simbolo in simbolos:
+            fila = filas.get(simbolo)
+            if fila is None:
+                continue
+            snapshot["tickers"].append(simbolo)
+            for campo in campos:
+                snapshot[campo].append(fila[campo])
+        return snapshot
+
+    @staticmethod
+    def _consultar(simbolos: list[str]) -> tuple[dict, set]:
+        """Consulta los símbolos en lotes de TAMANO_LOTE: ({símbolo: fila}, símbolos de lotes fallidos)"""
+        cotizaciones = {}
+        errores = []
+        fallidos = set()
+        lotes = [simbolos[i:i + TAMANO_LOTE] for i in range(0, len(simbolos), TAMANO_LOTE)]
+        # Los lotes van en paralelo: uno lento no demora a los demás
+        fuente = obtener_proveedor().fuente("cotizaciones")
+        for lote, resultado, error in pool_consultas.mapear(fuente, PreciosService._consultar_lote, lotes, plazo=PLAZO_COTIZACIONES):
+            if error:
+                print(f"❌ Error cotizando {lote[0]}..{lote[-1]}: {error}")
+                errores.append(error)
+                fallidos.update(lote)
             else:
-                raise HTTPException(status_code=400, detail=f"Campo '{campo}' invalido")
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=503, detail=f"Error obteniendo datos: {str(e)}")
+                cotizaciones.update(resultado)
+
+        if errores and not cotizaciones:
+            raise HTTPException(status_code=503, detail=f"Error obteniendo datos: {str(errores[0])}")
+        return cotizaciones, fallidos
+
+    @staticmethod
+    def _consultar_lote(simbolos: list[str]) -> dict:
+        """Una consulta multi-símbolo al proveedor de datos: {símbolo: {precio, volumen, cambio}}"""
+        return obtener_proveedor().cotizaciones(simbolos)
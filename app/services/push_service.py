@@ -0,0 +1,247 @@
+# app/services/push_service.py
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from urllib.parse import urlparse
+import requests
+from py_vapid import Vapid
+from pywebpush import WebPusher, WebPushException
+from app.config.database import SessionLocal
+from app.models.notificaciones import Suscripcion
+
+# Respuestas del push service que no tiene sentido reintentar
+ESTADOS_SIN_REINTENTO = {400, 401, 403, 404, 410, 413}
+# La suscripción ya no existe del lado del navegador
+ESTADOS_SUSCRIPCION_VENCIDA = {404, 410}
+
+
+class EmisorPush:
+    """
+    Envío de un push con la clave VAPID parseada una sola vez, los headers firmados
+    cacheados por origen hasta poco antes de vencer y una sesión keep-alive por host.
+    """
+
+    VIGENCIA_VAPID = 12 * 60 * 60  # el estándar permite hasta 24 hs
+    MARGEN_RENOVACION = 60 * 60
+
+    def __init__(self, clave_privada: str | None = None, email: str | None = None, ttl: int = 0):
+        self._clave_privada = clave_privada
+        self._email = email
+        self.ttl = ttl
+        self._vapid = None
+        self._lock = threading.Lock()
+        self._cabeceras: dict[str, tuple] = {}  # origen -> (exp, headers)
+        self._sesiones: dict[str, requests.Session] = {}
+        self.firmas = 0
+
+    def enviar(self, subscription_info: dict, data: str, timeout: float | None = None):
+        """Envía un push. Lanza WebPushException si el push service lo rechaza"""
+        endpoint = urlparse(subscription_info["endpoint"])
+        origen = f"{endpoint.scheme}://{endpoint.netloc}"
+        respuesta = WebPusher(subscription_info, requests_session=self._sesion(endpoint.netloc)).send(
+            data,
+            headers=dict(self._cabeceras_vapid(origen)),
+            ttl=self.ttl,
+            timeout=timeout
+        )
+        if respuesta.status_code > 202:
+            if respuesta.status_code in ESTADOS_SUSCRIPCION_VENCIDA:
+                self._eliminar_suscripcion(subscription_info["endpoint"])
+            raise WebPushException(
+                f"Push failed: {respuesta.status_code} {respuesta.reason}",
+                response=respuesta
+            )
+        return respuesta
+
+    def cerrar(self):
+        with self._lock:
+            sesiones, self._sesiones = self._sesiones, {}
+        for sesion in sesiones.values():
+            sesion.close()
+
+    # ========== HELPERS ==========
+    def _cabeceras_vapid(self, origen: str) -> dict:
+        ahora = int(time.time())
+        with self._lock:
+            entrada = self._cabeceras.get(origen)
+            if entrada is not None and entrada[0] - self.MARGEN_RENOVACION > ahora:
+                return entrada[1]
+
+            if self._vapid is None:
+                self._vapid = Vapid.from_string(private_key=self._clave_privada or os.getenv("VAPID_PRIVATE_KEY"))
+            exp = ahora + self.VIGENCIA_VAPID
+            email = self._email or os.getenv("VAPID_EMAIL", "admin@finz.com")
+            cabeceras = self._vapid.sign({"sub": f"mailto:{email}", "aud": origen, "exp": exp})
+            self._cabeceras[origen] = (exp, cabeceras)
+            self.firmas += 1
+            return cabeceras
+
+    def _sesion(self, host: str) -> requests.Session:
+        with self._lock:
+            sesion = self._sesiones.get(host)
+            if sesion is None:
+                sesion = self._sesiones[host] = requests.Session()
+            return sesion
+
+    def _eliminar_suscripcion(self, endpoint: str):
+        db = SessionLocal()
+        try:
+            db.query(Suscripcion).filter(
+                Suscripcion.subscription_data["endpoint"].as_string() == endpoint
+            ).delete(synchronize_session=False)
+            db.commit()
+            print(f"Suscripción vencida eliminada: {endpoint}")
+        except Exception as e:
+            db.rollback()
+            print(f"Error eliminando suscripción: {e}")
+        finally:
+            db.close()
+
+
+class DespachadorPush:
+    """
+    Entrega de notificaciones push fuera del ciclo de evaluación.
+    El evaluador encola y un pool acotado de workers entrega con timeout,
+    reintentos con backoff exponencial y un máximo de envíos concurrentes.
+    """
+
+    def __init__(self, emisor: EmisorPush, workers: int = 4, max_cola: int = 1000, timeout: float = 10, reintentos: int = 3, backoff: float = 1.0):
+        self.emisor = emisor
+        self.workers = workers
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self._cola: queue.Queue = queue.Queue(maxsize=max_cola)
+        self._lock = threading.Lock()
+        self._hilos: list[threading.Thread] = []
+        self._detener = threading.Event()
+        self._latencias = deque(maxlen=500)
+        self._contadores = {"encoladas": 0, "enviadas": 0, "fallidas": 0, "descartadas": 0, "vencidas": 0, "reintentos": 0}
+
+    # ========== CICLO DE VIDA ==========
+    def iniciar(self):
+        with self._lock:
+            if self._hilos:
+                return
+            self._detener.clear()
+            for i in range(self.workers):
+                hilo = threading.Thread(target=self._worker, name=f"push-worker-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def detener(self, espera: float = 5):
+        self._detener.set()
+        with self._lock:
+            hilos, self._hilos = self._hilos, []
+        for hilo in hilos:
+            hilo.join(timeout=espera)
+        self.emisor.cerrar()
+
+    # ========== API ==========
+    def encolar(self, subscription_info: dict, titulo: str, cuerpo: str, plazo: float | None = None) -> Future:
+        """
+        Encola una notificación sin bloquear. El Future se resuelve con True/False al entregar.
+        Con `plazo` (segundos) la entrega entera, cola y reintentos incluidos, termina dentro
+        de ese tiempo: lo que no llegó a salir se resuelve con False.
+        """
+        self.iniciar()
+        futuro = Future()
+        ahora = time.monotonic()
+        trabajo = {
+            "subscription_info": subscription_info,
+            "data": json.dumps({"title": titulo, "body": cuerpo}),
+            "encolada_at": ahora,
+            "deadline": None if plazo is None else ahora + plazo,
+            "futuro": futuro,
+        }
+        try:
+            self._cola.put_nowait(trabajo)
+        except queue.Full:
+            self._contar("descartadas")
+            futuro.set_result(False)
+            return futuro
+        self._contar("encoladas")
+        return futuro
+
+    def metricas(self) -> dict:
+        with self._lock:
+            latencias = sorted(self._latencias)
+            contadores = dict(self._contadores)
+        return {
+            **contadores,
+            "en_cola": self._cola.qsize(),
+            "firmas_vapid": self.emisor.firmas,
+            "workers": len(self._hilos),
+            "latencia_promedio_ms": round(sum(latencias) / len(latencias) * 1000, 1) if latencias else None,
+            "latencia_p95_ms": round(latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] * 1000, 1) if latencias else None,
+        }
+
+    # ========== WORKERS ==========
+    def _worker(self):
+        while not self._detener.is_set():
+            try:
+                trabajo = self._cola.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if trabajo["deadline"] is not None and time.monotonic() >= trabajo["deadline"]:
+                    # Venció esperando en la cola: nunca salió, se puede reintentar sin duplicar
+                    self._contar("vencidas")
+                    trabajo["futuro"].set_result(False)
+                    continue
+                ok = self._entregar(trabajo)
+                with self._lock:
+                    self._latencias.append(time.monotonic() - trabajo["encolada_at"])
+                self._contar("enviadas" if ok else "fallidas")
+                trabajo["futuro"].set_result(ok)
+            except Exception as e:
+                self._contar("fallidas")
+                trabajo["futuro"].set_exception(e)
+            finally:
+                self._cola.task_done()
+
+    def _entregar(self, trabajo: dict) -> bool:
+        deadline = trabajo["deadline"]
+        error = TimeoutError("plazo de entrega vencido")
+        for intento in range(self.reintentos + 1):
+            timeout = self.timeout if deadline is None else min(self.timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                self.emisor.enviar(trabajo["subscription_info"], trabajo["data"], timeout=timeout)
+                return True
+            except WebPushException as e:
+                estado = e.response.status_code if e.response is not None else None
+                if estado in ESTADOS_SIN_REINTENTO:
+                    print(f"Error enviando push ({estado}): {e}")
+                    return False
+                error = e
+            except Exception as e:
+                error = e
+
+            if intento < self.reintentos:
+                espera = self.backoff * 2 ** intento
+                if deadline is not None and time.monotonic() + espera >= deadline:
+                    break
+                self._contar("reintentos")
+                if self._detener.wait(espera):
+                    break
+
+        print(f"Error enviando push: {error}")
+        return False
+
+    def _contar(self, contador: str):
+        with self._lock:
+            self._contadores[contador] += 1
+
+
+emisor_push = EmisorPush()
+despachador_push = DespachadorPush(
+    emisor_push,
+    workers=int(os.getenv("PUSH_WORKERS", "4")),
+    timeout=float(os.getenv("PUSH_TIMEOUT", "10")),
+)
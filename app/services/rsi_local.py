@@ -0,0 +1,277 @@
+# app/services/rsi_local.py
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.rsi import RSIEstado
+from app.providers.registro import obtener_proveedor
+from app.services.calendario_mercado import calendario_mercado, TZ_NY
+from app.services.pool_consultas import pool_consultas
+from app.services.precios_service import PreciosService
+
+PERIODO = 14
+# ~275 ruedas: con esa historia el suavizado de Wilder ya no depende del arranque
+DIAS_HISTORIA = int(os.getenv("RSI_DIAS_HISTORIA", "400"))
+TAMANO_LOTE = 50
+# Diferencia relativa a partir de la cual el último cierre guardado ya no coincide
+# con la serie ajustada (hubo un split o un dividendo)
+TOLERANCIA_AJUSTE = 1e-4
+
+
+def promedios_wilder(cierres: np.ndarray, periodo: int = PERIODO) -> tuple:
+    """
+    Promedios de suba y baja de Wilder al último cierre de cada fila de una matriz
+    (tickers x días), más la cantidad de variaciones usadas. Las filas más cortas
+    van completadas con NaN a la izquierda.
+    """
+    cierres = np.atleast_2d(np.asarray(cierres, dtype=float))
+    deltas = np.diff(cierres, axis=1)
+    subas = np.where(deltas > 0, deltas, 0.0)
+    bajas = np.where(deltas < 0, -deltas, 0.0)
+
+    filas = cierres.shape[0]
+    cuenta = np.zeros(filas, dtype=int)
+    prom_suba = np.zeros(filas)
+    prom_baja = np.zeros(filas)
+    # Un paso por día, vectorizado sobre todos los tickers
+    for j in range(deltas.shape[1]):
+        valido = ~np.isnan(deltas[:, j])
+        cuenta += valido
+        # Las primeras `periodo` variaciones arman el promedio simple inicial
+        semilla = valido & (cuenta <= periodo)
+        prom_suba[semilla] += subas[semilla, j] / periodo
+        prom_baja[semilla] += bajas[semilla, j] / periodo
+        # Después, suavizado de Wilder: prom = (prom * (n - 1) + actual) / n
+        suavizar = valido & (cuenta > periodo)
+        prom_suba[suavizar] = (prom_suba[suavizar] * (periodo - 1) + subas[suavizar, j]) / periodo
+        prom_baja[suavizar] = (prom_baja[suavizar] * (periodo - 1) + bajas[suavizar, j]) / periodo
+    return prom_suba, prom_baja, cuenta
+
+
+def rsi_desde_promedios(prom_suba, prom_baja):
+    prom_suba, prom_baja = np.asarray(prom_suba, dtype=float), np.asarray(prom_baja, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + prom_suba / prom_baja)
+    return np.where(prom_baja == 0, np.where(prom_suba == 0, 50.0, 100.0), rsi)
+
+
+def rsi_wilder(cierres: np.ndarray, periodo: int = PERIODO) -> np.ndarray:
+    """RSI de Wilder del último cierre de cada fila (NaN con menos de `periodo` + 1 cierres)"""
+    prom_suba, prom_baja, cuenta = promedios_wilder(cierres, periodo)
+    rsi = rsi_desde_promedios(prom_suba, prom_baja)
+    rsi[cuenta < periodo] = np.nan
+    return rsi
+
+
+def avanzar(estado: tuple, cierre: float, fecha: date, periodo: int = PERIODO) -> tuple:
+    """Estado (prom_suba, prom_baja, ultimo_cierre, fecha_barra) con un cierre más: O(1)"""
+    prom_suba, prom_baja, ultimo, _ = estado
+    delta = cierre - ultimo
+    return (
+        (prom_suba * (periodo - 1) + max(delta, 0.0)) / periodo,
+        (prom_baja * (periodo - 1) + max(-delta, 0.0)) / periodo,
+        cierre,
+        fecha,
+    )
+
+
+class MotorRSI:
+    """
+    RSI diario local con el estado de Wilder por ticker al cierre de la última rueda.
+    Una vez por día el estado avanza con las barras nuevas (O(1) por barra); se
+    recalcula desde la historia completa solo si falta o si hay un hueco de ruedas.
+    El RSI intradía es provisorio: sale del precio actual sin tocar el estado.
+    """
+
+    def __init__(self, periodo: int = PERIODO, dias: int = DIAS_HISTORIA):
+        self.periodo = periodo
+        self.dias = dias
+        self._lock = threading.Lock()
+        self._estados: dict[str, tuple] = {}   # ticker -> (prom_suba, prom_baja, ultimo_cierre, fecha_barra)
+        self._al_dia: dict[str, date] = {}     # ticker -> día en que se puso al día
+        self.recalculos = 0
+        self.avances = 0
+
+    def calcular(self, tickers, db: Session | None = None, hoy: date | None = None) -> dict:
+        """{ticker: {"valor", "fecha", "provisorio"}} de los tickers con historia suficiente"""
+        tickers = sorted({t.upper() for t in tickers})
+        hoy = hoy or datetime.now(TZ_NY).date()
+        with self._lock:
+            atrasados = [t for t in tickers if self._al_dia.get(t) != hoy]
+        if atrasados:
+            self._poner_al_dia(atrasados, hoy, db)
+
+        actuales = self._precios_de_hoy(tickers, hoy)
+        resultado = {}
+        with self._lock:
+            for ticker in tickers:
+                estado = self._estados.get(ticker)
+                if estado is None:
+                    continue
+                provisorio = ticker in actuales
+                if provisorio:
+                    estado = avanzar(estado, actuales[ticker], hoy, self.periodo)
+                resultado[ticker] = {
+                    "valor": float(rsi_desde_promedios(estado[0], estado[1])),
+                    "fecha": estado[3].isoformat(),
+                    "provisorio": provisorio,
+                }
+        return resultado
+
+    # ========== ESTADO ==========
+    def _poner_al_dia(self, tickers: list[str], hoy: date, db: Session | None):
+        objetivo = self._rueda_anterior(hoy)
+        if db is not None:
+            self._cargar(db, tickers)
+
+        with self._lock:
+            estados = {t: self._estados.get(t) for t in tickers}
+        sin_estado = [t for t, estado in estados.items() if estado is None]
+        atrasados = [t for t, estado in estados.items() if estado is not None and estado[3] < objetivo]
+        revisados = set(tickers) - set(sin_estado) - set(atrasados)
+
+        cambiados = {}
+        if atrasados:
+            # Desde la barra del estado inclusive, para comparar su cierre con el guardado
+            desde = min(estados[t][3] for t in atrasados)
+            barras = self._descargar(atrasados, desde, hoy)
+            for ticker in atrasados:
+                if ticker not in barras:
+                    continue  # la descarga falló: se reintenta en el próximo ciclo
+                estado = estados[ticker]
+                ancla = next((cierre for fecha, cierre in barras[ticker] if fecha == estado[3]), None)
+                # La serie es ajustada: si el cierre del estado cambió, hubo un split o un
+                # dividendo y los promedios guardados quedaron en otra escala
+                if ancla is None or abs(ancla - estado[2]) > TOLERANCIA_AJUSTE * abs(estado[2]):
+                    sin_estado.append(ticker)
+                    continue
+                nuevas = [(fecha, cierre) for fecha, cierre in barras[ticker] if fecha > estado[3]]
+                # Hueco: faltan ruedas entre el estado y la última rueda cerrada
+                if [fecha for fecha, _ in nuevas] != self._ruedas_entre(estado[3], objetivo):
+                    sin_estado.append(ticker)
+                    continue
+                for fecha, cierre in nuevas:
+                    estado = avanzar(estado, cierre, fecha, self.periodo)
+                cambiados[ticker] = estado
+                revisados.add(ticker)
+                self.avances += len(nuevas)
+
+        if sin_estado:
+            barras = self._descargar(sin_estado, hoy - timedelta(days=self.dias), hoy)
+            cambiados.update(self._recalcular(barras))
+            revisados.update(barras)
+
+        with self._lock:
+            self._estados.update(cambiados)
+            for ticker in revisados:
+                self._al_dia[ticker] = hoy
+        if db is not None and cambiados:
+            self._guardar(db, cambiados)
+
+    def _recalcular(self, barras: dict) -> dict:
+        """Estado desde la historia completa, todos los tickers juntos sobre una matriz"""
+        series = [(t, cierres) for t, cierres in barras.items() if len(cierres) > self.periodo]
+        if not series:
+            return {}
+        largo = max(len(cierres) for _, cierres in series)
+        matriz = np.full((len(series), largo), np.nan)
+        for i, (_, cierres) in enumerate(series):
+            matriz[i, largo - len(cierres):] = [cierre for _, cierre in cierres]
+        prom_suba, prom_baja, _ = promedios_wilder(matriz, self.periodo)
+        self.recalculos += len(series)
+        return {
+            ticker: (float(prom_suba[i]), float(prom_baja[i]), cierres[-1][1], cierres[-1][0])
+            for i, (ticker, cierres) in enumerate(series)
+        }
+
+    def _cargar(self, db: Session, tickers: list[str]):
+        with self._lock:
+            faltantes = [t for t in tickers if t not in self._estados]
+        if not faltantes:
+            return
+        filas = db.query(
+            RSIEstado.ticker, RSIEstado.prom_suba, RSIEstado.prom_baja, RSIEstado.ultimo_cierre, RSIEstado.fecha_barra
+        ).filter(RSIEstado.ticker.in_(faltantes)).all()
+        with self._lock:
+            for ticker, *estado in filas:
+                self._estados.setdefault(ticker, tuple(estado))
+
+    @staticmethod
+    def _guardar(db: Session, estados: dict):
+        """Upsert multi-fila de los estados que cambiaron; el commit queda a cargo del llamador"""
+        stmt = pg_insert(RSIEstado).values([
+            {"ticker": t, "prom_suba": e[0], "prom_baja": e[1], "ultimo_cierre": e[2], "fecha_barra": e[3]}
+            for t, e in estados.items()
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[RSIEstado.ticker],
+            set_={
+                "prom_suba": stmt.excluded.prom_suba,
+                "prom_baja": stmt.excluded.prom_baja,
+                "ultimo_cierre": stmt.excluded.ultimo_cierre,
+                "fecha_barra": stmt.excluded.fecha_barra,
+                "updated_at": datetime.now(),
+            }
+        ))
+
+    # ========== HELPERS ==========
+    def _descargar(self, tickers: list[str], desde: date, hoy: date) -> dict:
+        """
+        Cierres anteriores a hoy en lotes multi-símbolo: {ticker: [(fecha, cierre), ...]}.
+        yf.download hace una consulta por símbolo: cada lote cuesta un crédito por ticker
+        y el plazo se estira con lo que tarda en reponerse el cupo por minuto.
+        """
+        proveedor = obtener_proveedor()
+        fuente = proveedor.fuente("barras")
+        capacidad = pool_consultas.capacidad(fuente) or TAMANO_LOTE
+        tamano = min(TAMANO_LOTE, capacidad)
+        lotes = [tuple(tickers[i:i + tamano]) for i in range(0, len(tickers), tamano)]
+        cierres = {}
+        for lote, resultado, error in pool_consultas.mapear(
+            fuente, lambda simbolos: proveedor.cierres_diarios(list(simbolos), desde), lotes,
+            plazo=60 + 60 * len(tickers) / capacidad, creditos=len
+        ):
+            if error:
+                print(f"❌ Error descargando cierres de {len(lote)} tickers: {getattr(error, 'detail', error)}")
+                continue
+            for ticker in lote:
+                # La barra de hoy (parcial) no entra al estado: el precio actual la reemplaza
+                cierres[ticker] = [(fecha, cierre) for fecha, cierre in resultado.get(ticker, []) if fecha < hoy]
+        return cierres
+
+    @staticmethod
+    def _rueda_anterior(hoy: date) -> date:
+        fecha = hoy - timedelta(days=1)
+        while not calendario_mercado.es_dia_habil(fecha):
+            fecha -= timedelta(days=1)
+        return fecha
+
+    @staticmethod
+    def _ruedas_entre(desde: date, hasta: date) -> list[date]:
+        """Ruedas posteriores a `desde` hasta `hasta` inclusive"""
+        fechas, fecha = [], desde + timedelta(days=1)
+        while fecha <= hasta:
+            if calendario_mercado.es_dia_habil(fecha):
+                fechas.append(fecha)
+            fecha += timedelta(days=1)
+        return fechas
+
+    @staticmethod
+    def _precios_de_hoy(tickers: list[str], hoy: date) -> dict:
+        """Precio actual como cierre provisorio de hoy, solo si hoy hubo rueda y ya abrió"""
+        apertura = calendario_mercado.apertura(hoy)
+        if apertura is None or time.time() < apertura:
+            return {}
+        try:
+            snapshot = PreciosService.obtener_snapshot(tickers, ["precio"])
+        except HTTPException as e:
+            print(f"❌ Error obteniendo precios para RSI: {e.detail}")
+            return {}
+        return dict(zip(snapshot["tickers"], snapshot["precio"]))
+
+
+motor_rsi = MotorRSI()
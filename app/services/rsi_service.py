@@ -1,100 +1,65 @@
-import requests
-import os
 from datetime import datetime, timedelta, date
 from fastapi import HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
 from app.models.rsi import RSI, SeguimientoRSI # Asegurando imports
+from app.providers.registro import obtener_proveedor
+from app.services.rsi_local import motor_rsi
+from app.services.calendario_mercado import calendario_mercado, TZ_ARG
+from app.services.pool_consultas import pool_consultas
 # Asumiendo que el archivo de modelos rsi.py ya tiene la clase SeguimientoRSI
 
 class RSIService:
     
-    # --- MÉTODOS DE OPTIMIZACIÓN DE RATE LIMIT ---
-    
+    # --- MÉTODOS EXISTENTES ---
+
     @staticmethod
-    def obtener_conteo_uso_hoy(db: Session) -> int:
-        """Cuenta cuántas peticiones exitosas (guardadas en RSI history) hicimos hoy."""
-        # Se asume que cada registro exitoso en RSI history es una petición a la API
-        hoy = datetime.now().date()
-        # Filtramos por la fecha de la columna timestamp
-        return db.query(RSI).filter(func.date(RSI.timestamp) == hoy).count()
+    def obtener_rsi_actual(ticker: str) -> dict:
+        """RSI diario calculado localmente (cierres diarios + precio actual)"""
+        resultado = RSIService.calcular_rsi([ticker]).get(ticker.upper())
+        if resultado is None:
+            raise HTTPException(404, f"Sin historia suficiente para calcular el RSI de {ticker.upper()}")
+        return resultado
 
     @staticmethod
-    def obtener_candidatos_actualizacion(db: Session, limite: int) -> list[str]:
+    def calcular_rsi(tickers, db: Session | None = None) -> dict:
         """
-        Estrategia LRU (Least Recently Used):
-        Devuelve los 'limite' tickers seguidos, ordenados por su última actualización 
-        (los más viejos o los que nunca se han actualizado, primero).
+        RSI de todos los tickers en una sola pasada: {ticker: {"ticker", "rsi_value", "timestamp", "signal", "provisorio"}}.
+        Con `db` el estado de Wilder se lee y se guarda en rsi_estado (el commit queda a cargo del llamador).
         """
-        # Consulta SQL optimizada:
-        # 1. LEFT JOIN: Une los tickers seguidos (SeguimientoRSI) con la última fecha de RSI (MAX(timestamp)).
-        # 2. ORDER BY ... ASC NULLS FIRST: Ordena de la fecha más antigua a la más reciente. Los tickers 
-        #    que no tienen registro (NULL) van primero, asegurando que se actualicen inmediatamente.
-        sql_query = text("""
-            WITH ultima_actualizacion AS (
-                SELECT ticker, MAX(timestamp) as last_update
-                FROM rsi_history
-                GROUP BY ticker
-            )
-            SELECT DISTINCT s.ticker, r.last_update
-            FROM seguimiento_rsi s
-            LEFT JOIN ultima_actualizacion r ON s.ticker = r.ticker
-            ORDER BY r.last_update ASC NULLS FIRST, s.ticker
-            LIMIT :limite
-        """)
-        
-        # Ejecutar la consulta
-        result = db.execute(sql_query, {"limite": limite}).fetchall()
-        
-        # Extraer el ticker del resultado (solo la primera columna [0])
-        return [row[0] for row in result]
-
-    # --- MÉTODOS EXISTENTES ---
-
-    @staticmethod
-    def obtener_rsi_actual(ticker: str) -> dict:
-        """Obtiene RSI desde Twelve Data"""
-        api_key = os.getenv('TWELVEDATA_API_KEY')
-        if not api_key:
-            raise HTTPException(400, "TWELVEDATA_API_KEY no configurada")
-        
-        url = "https://api.twelvedata.com/rsi"
-        params = {
-            "symbol": ticker.upper(),
-            "interval": "1day",
-            "time_period": 14,
-            "apikey": api_key
+        return {
+            ticker: {
+                "ticker": ticker,
+                "rsi_value": round(ultimo["valor"], 2),
+                "timestamp": ultimo["fecha"],
+                "signal": RSIService._determinar_signal(ultimo["valor"]),
+                "provisorio": ultimo["provisorio"]
+            }
+            for ticker, ultimo in motor_rsi.calcular(tickers, db).items()
         }
 
-        try:
-            response = requests.get(url, params=params, timeout=10)
-
-            if response.status_code != 200:
-                # TwelveData devuelve mensajes de error útiles en el JSON
-                error_msg = response.json().get("message", f"Error TwelveData: {response.status_code}")
-                raise HTTPException(503, error_msg)
-            
-            data = response.json()
-            values = data.get("values")
-            if not values:
-                raise HTTPException(
-                    503,
-                    f"TwelveData no devolvío valores para {ticker}: {data}"
-                )
-
-            # Último valor RSI
-            ultimo = values[0]
-            rsi_value = float(ultimo["rsi"])
-
-            return {
-                "ticker": ticker.upper(),
-                "rsi_value": round(rsi_value, 2),
-                "timestamp": ultimo["datetime"],
-                "signal": RSIService._determinar_signal(rsi_value)
-            }
-        
-        except requests.exceptions.RequestException as e:
-            raise HTTPException(503, f"Error conectando con Twelve Data: {str(e)}")
+    @staticmethod
+    def obtener_rsi_proveedor(tickers) -> dict:
+        """
+        Último RSI diario según el proveedor externo (TwelveData), para contrastar el cálculo local.
+        Consultas multi-símbolo de hasta el cupo por minuto del plan (un crédito por símbolo).
+        """
+        proveedor = obtener_proveedor()
+        fuente = proveedor.fuente("rsi")
+        tickers = sorted({t.upper() for t in tickers})
+        tamano = pool_consultas.capacidad(fuente) or len(tickers) or 1
+        lotes = [tuple(tickers[i:i + tamano]) for i in range(0, len(tickers), tamano)]
+
+        resultado = {}
+        for lote, valores, error in pool_consultas.mapear(
+            fuente, lambda simbolos: proveedor.rsi_lote(list(simbolos)), lotes, plazo=20, creditos=len
+        ):
+            if error:
+                print(f"❌ Error consultando RSI de {', '.join(lote)}: {getattr(error, 'detail', error)}")
+                continue
+            for ticker, ultimo in valores.items():
+                resultado[ticker] = {"ticker": ticker, "rsi_value": round(ultimo["valor"], 2), "timestamp": ultimo["fecha"]}
+        return resultado
     
     @staticmethod
     def _determinar_signal(rsi_value: float) -> str:
@@ -121,6 +86,15 @@ class RSIService:
         
         db.commit()
         return rsi_record
+
+    @staticmethod
+    def guardar_rsi_lote(db: Session, valores: dict):
+        """Reemplaza el RSI de varios tickers en una sola transacción: {ticker: rsi_value}"""
+        if not valores:
+            return
+        db.query(RSI).filter(RSI.ticker.in_(list(valores))).delete(synchronize_session=False)
+        db.add_all([RSI(ticker=ticker, rsi_value=rsi_value) for ticker, rsi_value in valores.items()])
+        db.commit()
     
     @staticmethod
     def agregar_seguimiento(db: Session, user_id: int, ticker: str):
@@ -180,24 +154,44 @@ class RSIService:
         .order_by(RSI.timestamp.desc())\
         .first()
 
-        # Calcular proxima act
-        proxima_actualizacion = RSIService._calcular_proxima_actualizacion()
+        return RSIService._con_estado(
+            ticker,
+            ultimo_registro.rsi_value if ultimo_registro else None,
+            ultimo_registro.timestamp if ultimo_registro else None,
+            RSIService._calcular_proxima_actualizacion(),
+            datetime.now()
+        )
 
-        if ultimo_registro:
+    @staticmethod
+    def obtener_rsi_seguimientos(db: Session, user_id: int) -> list[dict]:
+        """
+        RSI con estado de todos los tickers que sigue el usuario en una sola consulta:
+        último registro por ticker con DISTINCT ON, unido a sus seguimientos.
+        """
+        seguidos = select(SeguimientoRSI.ticker).where(SeguimientoRSI.user_id == user_id)
+        ultimos = select(RSI.ticker, RSI.rsi_value, RSI.timestamp)\
+            .where(RSI.ticker.in_(seguidos))\
+            .distinct(RSI.ticker)\
+            .order_by(RSI.ticker, RSI.timestamp.desc())\
+            .subquery()
+
+        filas = db.query(SeguimientoRSI.ticker, ultimos.c.rsi_value, ultimos.c.timestamp)\
+            .outerjoin(ultimos, ultimos.c.ticker == SeguimientoRSI.ticker)\
+            .filter(SeguimientoRSI.user_id == user_id)\
+            .order_by(SeguimientoRSI.id)\
+            .all()
 
-            edad = datetime.now() - ultimo_registro.timestamp
-            es_dato_en_vivo = edad < timedelta(minutes=15)
+        # Una vez por request, no por ticker
+        proxima_actualizacion = RSIService._calcular_proxima_actualizacion()
+        ahora = datetime.now()
+        return [
+            RSIService._con_estado(ticker, rsi_value, timestamp, proxima_actualizacion, ahora)
+            for ticker, rsi_value, timestamp in filas
+        ]
 
-            return {
-                "ticker": ticker,
-                "rsi_value": ultimo_registro.rsi_value,
-                "timestamp": ultimo_registro.timestamp,
-                "signal": RSIService._determinar_signal(ultimo_registro.rsi_value),
-                "proxima_actualizacion": proxima_actualizacion,
-                "tiene_datos": True,
-                "es_dato_en_vivo": es_dato_en_vivo
-            }
-        else:
+    @staticmethod
+    def _con_estado(ticker: str, rsi_value: float | None, timestamp: datetime | None, proxima_actualizacion: str, ahora: datetime) -> dict:
+        if rsi_value is None:
             return {
                 "ticker": ticker,
                 "rsi_value": None,
@@ -207,44 +201,30 @@ class RSIService:
                 "tiene_datos": False,
                 "es_dato_en_vivo": False
             }
+        return {
+            "ticker": ticker,
+            "rsi_value": rsi_value,
+            "timestamp": timestamp,
+            "signal": RSIService._determinar_signal(rsi_value),
+            "proxima_actualizacion": proxima_actualizacion,
+            "tiene_datos": True,
+            "es_dato_en_vivo": ahora - timestamp < timedelta(minutes=15)
+        }
         
     @staticmethod
     def _calcular_proxima_actualizacion():
         """Calcular cuando sera la proxima act"""
-        import pytz
+        if calendario_mercado.esta_abierto():
+            return f"Actualización continua (cada 1 min)"
 
-        tz_arg = pytz.timezone('America/Argentina/Buenos_Aires')
-        ahora = datetime.now(tz_arg)
-
-        # Horario mercado: 11:30 - 18:00
-        hora_apertura = ahora.replace(hour=11, minute=30, second=0, microsecond=0)
-        hora_cierre = ahora.replace(hour=18, minute=0, second=0, microsecond=0)
-
-        # Fin de semana
-        if ahora.weekday() >= 5:
-            dias_hasta_lunes = 7 - ahora.weekday()
-            proxima = (ahora + timedelta(days=dias_hasta_lunes)).replace(hour=11, minute=30)
-            return f"Mercado cerrado - próxima: {proxima.strftime('%d/%m %H:%M')}"
-        
-        # Antes de apertura
-        if ahora < hora_apertura:
-            return f"Mercado cerrado - abre a las {hora_apertura.strftime('%H:%M')}"
-        
-        # Después de apertura
-        if ahora >= hora_cierre:
-            # Si ya es 18:00:00 o más tarde
-            proxima = (ahora + timedelta(days=1)).replace(hour=11, minute=30)
-            # Ajustar al próximo lunes si es viernes
-            if ahora.weekday() == 4: # Viernes
-                 proxima = (ahora + timedelta(days=3)).replace(hour=11, minute=30)
-            return f"Mercado cerrado - próxima: {proxima.strftime('%d/%m %H:%M')}"
-        
-        # Durante horario de mercado, la próxima es en el próximo minuto.
-        return f"Actualización continua (cada 1 min)"
+        proxima = datetime.fromtimestamp(calendario_mercado.proxima_apertura(), TZ_ARG)
+        if proxima.date() == datetime.now(TZ_ARG).date():
+            return f"Mercado cerrado - abre a las {proxima.strftime('%H:%M')}"
+        return f"Mercado cerrado - próxima: {proxima.strftime('%d/%m %H:%M')}"
 
     @staticmethod
     def obtener_todos_los_tickers_seguidos(db: Session):
-        """Lista única de tickers que algún usuario sigue (Método obsoleto en el nuevo job inteligente)"""
+        """Lista única de tickers que algún usuario sigue"""
 
         result = db.query(SeguimientoRSI.ticker)\
             .distinct()\
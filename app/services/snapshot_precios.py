@@ -0,0 +1,120 @@
+# app/services/snapshot_precios.py
+import threading
+from datetime import datetime
+from app.services.cache_compartido import ArchivoPrecios, ruta
+
+
+class SnapshotPrecios:
+    """
+    Último precio/volumen por ticker, con una versión por (ticker, campo)
+    que solo avanza cuando el valor cambia.
+    Con `archivo`, el snapshot vive en un archivo compartido: lo escribe el proceso
+    líder del refresco y lo leen todos los workers.
+    Los precios restaurados al arrancar quedan con versión 0 (`stale`) hasta el primer refresco.
+    """
+
+    def __init__(self, archivo: ArchivoPrecios | None = None):
+        self._lock = threading.Lock()
+        self._archivo = archivo
+        self._datos: dict[str, dict] = {}
+        self._versiones: dict[tuple, int] = {}
+        self._cambiado_at: dict[tuple, datetime] = {}
+
+    def actualizar(self, ticker: str, precio: float, cambio: float, volumen) -> bool:
+        """Guarda la cotización nueva. Devuelve True si precio o volumen se movieron"""
+        with self._lock:
+            if self._archivo is not None and ticker not in self._datos:
+                # Un líder nuevo sigue las versiones donde las dejó el anterior
+                self._cargar_fila(self._archivo.leer(ticker))
+            anterior = self._datos.get(ticker)
+            self._datos[ticker] = {"symbol": ticker, "price": precio, "change": cambio, "volume": volumen, "stale": False}
+            movido = False
+            for campo, valor in (("precio", precio), ("volumen", volumen)):
+                clave = (ticker, campo)
+                # Un dato restaurado cuenta como cambio aunque el valor coincida
+                if anterior is None or anterior["stale"] or anterior["price" if campo == "precio" else "volume"] != valor:
+                    self._versiones[clave] = self._versiones.get(clave, 0) + 1
+                    self._cambiado_at[clave] = datetime.now()
+                    movido = True
+
+            if self._archivo is not None:
+                self._archivo.escribir(
+                    ticker, precio, cambio, volumen,
+                    (self._versiones[(ticker, "precio")], self._versiones[(ticker, "volumen")]),
+                    (self._cambiado_at[(ticker, "precio")].timestamp(), self._cambiado_at[(ticker, "volumen")].timestamp())
+                )
+            return movido
+
+    def restaurar(self, filas) -> int:
+        """
+        Carga cotizaciones guardadas (ticker, precio, cambio, volumen, actualizado_at)
+        marcadas como desactualizadas. No pisa tickers que ya tienen dato.
+        """
+        cargados = 0
+        with self._lock:
+            for ticker, precio, cambio, volumen, actualizado_at in filas:
+                if ticker in self._datos or (self._archivo is not None and self._archivo.leer(ticker) is not None):
+                    continue
+                self._datos[ticker] = {"symbol": ticker, "price": precio, "change": cambio, "volume": volumen, "stale": True}
+                for campo in ("precio", "volumen"):
+                    self._versiones[(ticker, campo)] = 0
+                    self._cambiado_at[(ticker, campo)] = actualizado_at
+                if self._archivo is not None:
+                    self._archivo.escribir(ticker, precio, cambio, volumen, (0, 0), (actualizado_at.timestamp(),) * 2)
+                cargados += 1
+        return cargados
+
+    def obtener(self, ticker: str) -> dict | None:
+        return self.leer(ticker)[0]
+
+    def leer(self, ticker: str) -> tuple[dict | None, dict]:
+        """Datos y versiones de un ticker leídos juntos (consistentes entre sí)"""
+        if self._archivo is not None:
+            fila = self._archivo.leer(ticker)
+            if fila is None:
+                return None, {"precio": None, "volumen": None}
+            datos, versiones, _ = self._desde_fila(fila)
+            return datos, versiones
+        with self._lock:
+            versiones = {campo: self._versiones.get((ticker, campo)) for campo in ("precio", "volumen")}
+            return self._datos.get(ticker), versiones
+
+    def como_dict(self) -> dict:
+        if self._archivo is not None:
+            return {datos["symbol"]: datos for datos, _, _ in map(self._desde_fila, self._archivo.leer_todo())}
+        with self._lock:
+            return dict(self._datos)
+
+    def version(self, ticker: str, campo: str) -> int | None:
+        """Versión del dato (None si el ticker todavía no se cotizó)"""
+        return self.leer(ticker)[1][campo]
+
+    def cambiado_at(self, ticker: str, campo: str) -> datetime | None:
+        if self._archivo is not None:
+            fila = self._archivo.leer(ticker)
+            return self._desde_fila(fila)[2][campo] if fila else None
+        with self._lock:
+            return self._cambiado_at.get((ticker, campo))
+
+    @staticmethod
+    def _desde_fila(fila: tuple) -> tuple:
+        ticker, precio, volumen, cambio, v_precio, v_volumen, c_precio, c_volumen = fila
+        ticker = ticker.rstrip(b"\0").decode()
+        datos = {"symbol": ticker, "price": precio, "change": cambio, "volume": None if volumen < 0 else volumen, "stale": v_precio == 0}
+        versiones = {"precio": v_precio, "volumen": v_volumen}
+        cambiados = {"precio": datetime.fromtimestamp(c_precio), "volumen": datetime.fromtimestamp(c_volumen)}
+        return datos, versiones, cambiados
+
+    def _cargar_fila(self, fila: tuple | None):
+        if fila is None:
+            return
+        datos, versiones, cambiados = self._desde_fila(fila)
+        ticker = datos["symbol"]
+        self._datos[ticker] = datos
+        for campo in ("precio", "volumen"):
+            self._versiones[(ticker, campo)] = versiones[campo]
+            self._cambiado_at[(ticker, campo)] = cambiados[campo]
+
+
+_ruta = ruta("precios.bin")
+snapshot_precios = SnapshotPrecios(ArchivoPrecios(_ruta) if _ruta else None)
@@ -0,0 +1,44 @@
+# app/services/tickers_usuario.py
+import os
+import threading
+import time
+from sqlalchemy import select, union
+from sqlalchemy.orm import Session
+from app.models.alertas import AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta
+
+
+class TickersUsuario:
+    """
+    Tickers con alertas activas de cada usuario, cacheados por `ttl` segundos.
+    Se invalidan al crear o quitar alertas en este proceso; el TTL cubre los
+    cambios hechos en otros workers.
+    """
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache: dict[int, tuple[float, list]] = {}  # user_id -> (vence, tickers)
+
+    def obtener(self, db: Session, user_id: int) -> list[str]:
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._cache.get(user_id)
+        if entrada is not None and entrada[0] > ahora:
+            return entrada[1]
+
+        # Una sola consulta (UNION de las 4 tablas) en vez de cargar las alertas completas
+        consulta = union(*[
+            select(model.ticker).where(model.user_id == user_id, model.activo == True)
+            for model in (AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta)
+        ])
+        tickers = sorted(db.execute(consulta).scalars().all())
+        with self._lock:
+            self._cache[user_id] = (ahora + self.ttl, tickers)
+        return tickers
+
+    def invalidar(self, user_id: int):
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+
+tickers_usuario = TickersUsuario(ttl=float(os.getenv("TICKERS_USUARIO_TTL", "60")))
@@ -0,0 +1,80 @@
+# app/services/transiciones_alertas.py
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.models.alertas import AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta
+
+TABLAS = {
+    "simple": AlertaSimple.__table__,
+    "rango": AlertaRango.__table__,
+    "porcentaje": AlertaPorcentaje.__table__,
+    "compuesta": AlertaCompuesta.__table__,
+}
+
+# Filas escritas por tabla desde que arrancó el proceso
+filas_escritas = Counter()
+_lock = threading.Lock()
+
+
+class TransicionesAlertas:
+    """
+    Cambios de `activada_at` de un ciclo de evaluación (activaciones, entradas y
+    salidas de rango, disparos de porcentaje) que se escriben juntos al final.
+    """
+
+    def __init__(self):
+        self._cambios = defaultdict(dict)  # tipo -> {alerta_id: activada_at}
+        self.aplicadas = set()  # (tipo, alerta_id) que este ciclo cambió de verdad en la BD
+
+    def activar(self, tipo: str, alerta_id: int):
+        self._cambios[tipo][alerta_id] = datetime.now()
+
+    def resetear(self, tipo: str, alerta_id: int):
+        self._cambios[tipo][alerta_id] = None
+
+    def disparadas(self) -> list[tuple]:
+        """Alertas de un solo disparo activadas en el ciclo (los rangos se pueden resetear)"""
+        return [
+            (tipo, alerta_id)
+            for tipo, cambios in self._cambios.items() if tipo != "rango"
+            for alerta_id, activada_at in cambios.items() if activada_at
+        ]
+
+    def __len__(self):
+        return sum(len(cambios) for cambios in self._cambios.values())
+
+    def flush(self, db: Session) -> dict:
+        """
+        Hasta dos UPDATE ... RETURNING por tabla (activaciones y reseteos), condicionados
+        al estado anterior: si otro worker ya hizo la misma transición, la fila no cambia
+        y no queda en `aplicadas`. El commit queda a cargo del llamador.
+        """
+        filas = {}
+        ahora = datetime.now()
+        for tipo, cambios in self._cambios.items():
+            if not cambios:
+                continue
+            tabla = TABLAS[tipo]
+            activadas = [alerta_id for alerta_id, activada_at in cambios.items() if activada_at]
+            reseteadas = [alerta_id for alerta_id, activada_at in cambios.items() if not activada_at]
+            ids = []
+            for grupo, condicion, valor in (
+                (activadas, tabla.c.activada_at.is_(None), ahora),
+                (reseteadas, tabla.c.activada_at.is_not(None), None),
+            ):
+                if grupo:
+                    ids += db.execute(
+                        update(tabla)
+                        .where(tabla.c.id.in_(grupo), condicion)
+                        .values(activada_at=valor, updated_at=func.now())
+                        .returning(tabla.c.id)
+                    ).scalars().all()
+            self.aplicadas.update((tipo, alerta_id) for alerta_id in ids)
+            filas[tipo] = len(ids)
+
+        with _lock:
+            filas_escritas.update(filas)
+        self._cambios.clear()
+        return filas
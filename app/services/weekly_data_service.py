@@ -1,7 +1,8 @@
 # app/services/weekly_data_service.py
 
-from datetime import datetime, timedelta
-import yfinance as yf
+from datetime import datetime, timedelta, date
+from app.providers.registro import obtener_proveedor
+from app.services.pool_consultas import pool_consultas
 
 from typing import Dict, Optional
 
@@ -26,14 +27,16 @@ class WeeklyDataServices:
     def obtener_cambio_semanal(ticker: str) -> Optional[Dict]:
         """Calcula el % de cambio semanal (cierre a cierre)"""
         try:
-            data = yf.Ticker(ticker).history(period='1mo', interval='1wk')
+            barras = obtener_proveedor().barras_diarias(ticker, date.today() - timedelta(days=31))
 
-            if len(data) < 2:
+            # Cierre semanal = último cierre diario de cada semana
+            cierres_semanales = {}
+            for barra in barras:
+                cierres_semanales[barra["fecha"].isocalendar()[:2]] = barra["cierre"]
+            if len(cierres_semanales) < 2:
                 return None
-        
-            # Código
-            cierre_semana_anterior = data.iloc[-2]['Close']
-            cierre_semana_actual = data.iloc[-1]['Close']
+
+            cierre_semana_anterior, cierre_semana_actual = list(cierres_semanales.values())[-2:]
             cambio_porcentual = ((cierre_semana_actual - cierre_semana_anterior) / cierre_semana_anterior) * 100
 
             return {"ticker": ticker,
@@ -49,18 +52,16 @@ class WeeklyDataServices:
     def obtener_datos_semanales() -> Dict:
         """Obtiene datos semanales de todos los índices y sectores."""
 
-        indices_data = []
-        sectores_data = []
-
-        for ticker in WeeklyDataServices.INDICES:
-            resultado = WeeklyDataServices.obtener_cambio_semanal(ticker)
-            if resultado:
-                indices_data.append(resultado)
-        
-        for ticker in WeeklyDataServices.SECTORES:
-            resultado = WeeklyDataServices.obtener_cambio_semanal(ticker)
-            if resultado:
-                sectores_data.append(resultado)
+        # Todos los tickers en paralelo; después se respeta el orden de las listas
+        fuente = obtener_proveedor().fuente("barras")
+        tickers = WeeklyDataServices.INDICES + WeeklyDataServices.SECTORES
+        resultados = {
+            ticker: resultado
+            for ticker, resultado, _ in pool_consultas.mapear(fuente, WeeklyDataServices.obtener_cambio_semanal, tickers, plazo=120)
+            if resultado
+        }
+        indices_data = [resultados[t] for t in WeeklyDataServices.INDICES if t in resultados]
+        sectores_data = [resultados[t] for t in WeeklyDataServices.SECTORES if t in resultados]
 
         rango = WeeklyDataServices.obtener_rango_semana_pasada()
 
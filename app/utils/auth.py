@@ -1,5 +1,5 @@
 # finz/app/utils/auth.py
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials
 from app.middlewares.jwt_bearer import JWTBearer
 from datetime import datetime, timedelta, timezone
@@ -52,4 +52,15 @@ def get_current_user_id(
 ) -> int:
     """Dependencia para obtener el user_id del token JWT"""
     jwt_bearer = JWTBearer()
-    return jwt_bearer.get_user_id_from_token(credentials.credentials)
\ No newline at end of file
+    return jwt_bearer.get_user_id_from_token(credentials.credentials)
+
+def get_current_user_id_stream(request: Request, token: str | None = None) -> int:
+    """Como get_current_user_id, pero también acepta ?token= (EventSource no permite headers)"""
+    if token is None:
+        esquema, _, token = request.headers.get("Authorization", "").partition(" ")
+        if esquema.lower() != "bearer":
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token inválido")
+    jwt_bearer = JWTBearer()
+    if not jwt_bearer.verify_jwt(token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token inválido")
+    return jwt_bearer.get_user_id_from_token(token)
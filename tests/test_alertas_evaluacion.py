@@ -0,0 +1,320 @@
+import time
+import pytest
+from sqlalchemy.orm import Session
+from app.config.database import engine
+from app.models.usuarios import Usuarios
+from app.models.alertas import AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta, CondicionAlerta, GrupoCondicion, AlertaRegistro
+from app.models.notificaciones import NotificacionOutbox, CooldownNotificacion, Suscripcion
+from app.schemas.alertas import AlertaCompuestaCreate
+from app.enums.alertas import CampoEnum, TipoCondicionEnum
+from app.services import alertas as alertas_service
+from app.services.alertas import AlertasService
+from app.services.snapshot_precios import SnapshotPrecios
+from app.services.historial_intradia import HistorialIntradia
+from app.services.precios_service import PreciosService
+from app.services.indice_alertas import indice_alertas
+from app.services.cola_cambios import cola_cambios
+from app.jobs import alertas_job
+from app.services import outbox_notificaciones
+from concurrent.futures import Future
+
+PRECIOS = {
+    "AAPL": {"precio": 150.0, "volumen": 1000},
+    "MSFT": {"precio": 300.0, "volumen": 5000},
+}
+
+@pytest.fixture
+def db(monkeypatch):
+    llamadas = []
+
+    def obtener_snapshot(tickers, campos=("precio", "volumen")):
+        llamadas.extend(sorted(tickers))
+        cotizados = [t for t in sorted(tickers) if t in PRECIOS]
+        return {"tickers": cotizados, **{campo: [PRECIOS[t][campo] for t in cotizados] for campo in campos}}
+
+    monkeypatch.setattr(PreciosService, "obtener_snapshot", staticmethod(obtener_snapshot))
+    monkeypatch.setattr(AlertasService, "_watermarks", {})
+    monkeypatch.setattr(alertas_service, "snapshot_precios", SnapshotPrecios())
+
+    session = Session(engine)
+    session.llamadas = llamadas
+    yield session
+    for model in [CondicionAlerta, GrupoCondicion, AlertaSimple, AlertaRango, AlertaPorcentaje, AlertaCompuesta, AlertaRegistro, NotificacionOutbox, CooldownNotificacion, Suscripcion]:
+        session.query(model).delete()
+    session.commit()
+    indice_alertas.reconstruir(session)
+    session.close()
+
+def _user_id(db):
+    return db.query(Usuarios).filter(Usuarios.correo == "demo@finz.com").first().id
+
+def test_bulk_consulta_cada_ticker_una_vez(db):
+    user_id = _user_id(db)
+    db.add_all([
+        AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=100),
+        AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.VOLUMEN, tipo_condicion=TipoCondicionEnum.MENOR_QUE, valor=10),
+        AlertaRango(user_id=user_id, ticker="MSFT", campo=CampoEnum.PRECIO, valor_minimo=250, valor_maximo=350),
+        AlertaPorcentaje(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, porcentaje_cambio=10, precio_referencia=100),
+    ])
+    compuesta = AlertaCompuesta(user_id=user_id, ticker="MSFT", operador_logico="AND")
+    compuesta.condiciones = [
+        CondicionAlerta(campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=200, orden=1),
+        CondicionAlerta(campo=CampoEnum.VOLUMEN, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=1000, orden=2),
+    ]
+    db.add(compuesta)
+    db.commit()
+    indice_alertas.reconstruir(db)
+
+    resultado = AlertasService(db).evaluar_alertas_bulk()
+
+    assert sorted(db.llamadas) == ["AAPL", "MSFT"]
+    assert resultado["tickers_evaluados"] == 2
+    assert resultado["alertas_evaluadas"] == 5
+    assert resultado["total_activadas"] == 4
+    assert resultado["filas_actualizadas"] == {"simple": 1, "rango": 1, "porcentaje": 1, "compuesta": 1}
+
+def test_rango_se_resetea_al_salir(db):
+    user_id = _user_id(db)
+    db.add(AlertaRango(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, valor_minimo=140, valor_maximo=160))
+    db.commit()
+    service = AlertasService(db)
+
+    assert service.evaluar_alertas(user_id)["total_activadas"] == 1
+    assert service.evaluar_alertas(user_id)["total_activadas"] == 0
+
+    PRECIOS["AAPL"] = {"precio": 170.0, "volumen": 1000}
+    try:
+        resultado = service.evaluar_alertas(user_id)
+    finally:
+        PRECIOS["AAPL"] = {"precio": 150.0, "volumen": 1000}
+    assert resultado["alertas_activadas"][0]["id"].startswith("rango-salida")
+    assert db.query(AlertaRango).first().activada_at is None
+
+def test_bulk_solo_reevalua_cruces(db):
+    user_id = _user_id(db)
+    db.add_all([
+        AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=155),
+        AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MENOR_QUE, valor=120),
+    ])
+    db.commit()
+    indice_alertas.reconstruir(db)
+    service = AlertasService(db)
+
+    assert service.evaluar_alertas_bulk()["total_activadas"] == 0
+
+    # Sin movimiento no se carga ninguna alerta
+    assert service.evaluar_alertas_bulk()["alertas_evaluadas"] == 0
+
+    PRECIOS["AAPL"] = {"precio": 160.0, "volumen": 1000}
+    try:
+        resultado = service.evaluar_alertas_bulk()
+    finally:
+        PRECIOS["AAPL"] = {"precio": 150.0, "volumen": 1000}
+    assert resultado["alertas_evaluadas"] == 1
+    assert resultado["total_activadas"] == 1
+
+def test_compuesta_con_grupos_anidados(db):
+    user_id = _user_id(db)
+    # precio > 100 AND (volumen > 5000 OR precio < 120)
+    alerta = AlertaCompuestaCreate(
+        ticker="aapl",
+        operador_logico="AND",
+        condiciones=[{"campo": "precio", "tipo_condicion": "mayor_que", "valor": 100, "orden": 1}],
+        grupos=[{
+            "operador_logico": "OR",
+            "condiciones": [
+                {"campo": "volumen", "tipo_condicion": "mayor_que", "valor": 5000, "orden": 1},
+                {"campo": "precio", "tipo_condicion": "menor_que", "valor": 120, "orden": 2},
+            ],
+        }],
+    )
+    service = AlertasService(db)
+    service.crear_alerta_compuesta(alerta, user_id)
+    assert service.evaluar_alertas(user_id)["total_activadas"] == 0
+
+    PRECIOS["AAPL"] = {"precio": 150.0, "volumen": 9000}
+    try:
+        resultado = service.evaluar_alertas(user_id)
+    finally:
+        PRECIOS["AAPL"] = {"precio": 150.0, "volumen": 1000}
+    assert resultado["total_activadas"] == 1
+    assert db.llamadas == ["AAPL", "AAPL"]
+
+def test_job_evalua_solo_tickers_que_cambiaron(db, monkeypatch):
+    user_id = _user_id(db)
+    db.add_all([
+        AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=100),
+        AlertaSimple(user_id=user_id, ticker="MSFT", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=100),
+    ])
+    db.commit()
+    indice_alertas.reconstruir(db)
+    alertas_service.snapshot_precios.actualizar("AAPL", 150.0, 0, 1000)
+    alertas_service.snapshot_precios.actualizar("MSFT", 300.0, 0, 5000)
+
+    cola_cambios.tomar()
+    alertas_job.evaluar_alertas(db)
+    assert db.query(AlertaSimple).filter(AlertaSimple.activada_at.isnot(None)).count() == 0
+
+    cola_cambios.publicar("AAPL")
+    alertas_job.evaluar_alertas(db)
+
+    activadas = db.query(AlertaSimple).filter(AlertaSimple.activada_at.isnot(None)).all()
+    assert [a.ticker for a in activadas] == ["AAPL"]
+    assert db.llamadas == []
+
+def test_watermark_saltea_alertas_sin_cambios(db):
+    user_id = _user_id(db)
+    db.add(AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=155))
+    db.commit()
+    snapshot = alertas_service.snapshot_precios
+    snapshot.actualizar("AAPL", 150.0, 0, 1000)
+    service = AlertasService(db)
+
+    assert service.evaluar_alertas(user_id)["alertas_omitidas"] == 0
+    assert service.evaluar_alertas(user_id)["alertas_omitidas"] == 1
+
+    # Cambia solo el volumen: la alerta de precio sigue sin datos nuevos
+    snapshot.actualizar("AAPL", 150.0, 0, 2000)
+    assert service.evaluar_alertas(user_id)["alertas_omitidas"] == 1
+
+    snapshot.actualizar("AAPL", 160.0, 0, 2000)
+    resultado = service.evaluar_alertas(user_id)
+    assert resultado["alertas_omitidas"] == 0
+    assert resultado["total_activadas"] == 1
+    assert db.llamadas == []
+
+class DespachadorFalso:
+    def __init__(self):
+        self.enviados = []
+
+    def encolar(self, subscription_info, titulo, cuerpo, plazo=None):
+        self.enviados.append((subscription_info["endpoint"], titulo, cuerpo))
+        futuro = Future()
+        futuro.set_result(True)
+        return futuro
+
+def test_outbox_entrega_una_vez_y_respeta_cooldown(db):
+    user_id = _user_id(db)
+    db.add(Suscripcion(user_id=user_id, subscription_data={"endpoint": "https://push/demo"}))
+    db.add_all([
+        AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=100),
+        AlertaSimple(user_id=user_id, ticker="MSFT", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=100),
+    ])
+    db.commit()
+    PRECIOS["AAPL"] = {"precio": 150.0, "volumen": 1000}
+    AlertasService(db).evaluar_alertas(user_id)
+
+    # Las activaciones quedaron en el outbox junto con activada_at
+    assert db.query(NotificacionOutbox).filter(NotificacionOutbox.estado == "pendiente").count() == 2
+
+    despachador = DespachadorFalso()
+    assert outbox_notificaciones.drenar(db, despachador=despachador) == {"enviada": 2}
+    db.commit()
+    assert outbox_notificaciones.drenar(db, despachador=despachador) == {}
+    assert len(despachador.enviados) == 1 and despachador.enviados[0][1] == "🔔 2 Alerta(s) Activada(s)"
+
+    # Otra activación dentro de los 5 minutos: cooldown compartido en la BD
+    db.add(AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.VOLUMEN, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=10))
+    db.commit()
+    AlertasService(db).evaluar_alertas(user_id)
+    assert outbox_notificaciones.drenar(db, despachador=despachador) == {"cooldown": 1}
+    db.commit()
+    assert len(despachador.enviados) == 1
+
+def test_activacion_concurrente_escribe_un_solo_outbox(db):
+    from app.services.transiciones_alertas import TransicionesAlertas
+    user_id = _user_id(db)
+    alerta = AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=100)
+    db.add(alerta)
+    db.commit()
+
+    # El job y el endpoint por usuario evaluaron la alerta cuando todavía no estaba activada
+    service = AlertasService(db)
+    resultados = []
+    for _ in range(2):
+        transiciones = TransicionesAlertas()
+        transiciones.activar("simple", alerta.id)
+        resultados.append(service._guardar_transiciones(transiciones, {}, [("simple", alerta, {"id": f"simple-{alerta.id}", "mensaje": "AAPL"})]))
+
+    assert [filas for filas, _ in resultados] == [{"simple": 1}, {"simple": 0}]
+    assert not resultados[1][1]
+    assert db.query(NotificacionOutbox).count() == 1
+
+def test_outbox_reintenta_sin_cooldown_si_el_push_falla(db):
+    user_id = _user_id(db)
+    db.add(Suscripcion(user_id=user_id, subscription_data={"endpoint": "https://push/demo"}))
+    db.add(AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=100))
+    db.commit()
+    AlertasService(db).evaluar_alertas(user_id)
+
+    class DespachadorCaido(DespachadorFalso):
+        def encolar(self, subscription_info, titulo, cuerpo, plazo=None):
+            futuro = Future()
+            futuro.set_exception(RuntimeError("push caído"))
+            return futuro
+
+    # Falla: la fila sigue pendiente con un intento y el usuario no queda en cooldown
+    assert outbox_notificaciones.drenar(db, despachador=DespachadorCaido()) == {"reintento": 1}
+    db.commit()
+    fila = db.query(NotificacionOutbox).one()
+    assert (fila.estado, fila.intentos) == ("pendiente", 1)
+
+    # Sigue en vuelo al terminar la espera: queda en_envio y no se vuelve a encolar
+    en_vuelo = Future()
+
+    class DespachadorLento(DespachadorFalso):
+        def encolar(self, subscription_info, titulo, cuerpo, plazo=None):
+            assert plazo < 60
+            return en_vuelo
+
+    assert outbox_notificaciones.drenar(db, espera=0.01, despachador=DespachadorLento()) == {"en_envio": 1}
+    db.add(AlertaSimple(user_id=user_id, ticker="AAPL", campo=CampoEnum.VOLUMEN, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=10))
+    db.commit()
+    AlertasService(db).evaluar_alertas(user_id)
+    despachador = DespachadorFalso()
+    assert outbox_notificaciones.drenar(db, despachador=despachador) == {}
+    assert despachador.enviados == []
+
+    # Cuando el push termina, su resultado se guarda aparte y el usuario entra en cooldown
+    en_vuelo.set_result(True)
+    db.expire_all()
+    assert (fila.estado, fila.intentos) == ("enviada", 1)
+    assert outbox_notificaciones.drenar(db, despachador=despachador) == {"cooldown": 1}
+    assert despachador.enviados == []
+
+def test_porcentaje_con_ventana_usa_el_historial(db, monkeypatch):
+    user_id = _user_id(db)
+    historial = HistorialIntradia(capacidad=50)
+    monkeypatch.setattr(alertas_service, "historial_intradia", historial)
+    db.add(AlertaPorcentaje(user_id=user_id, ticker="AAPL", campo=CampoEnum.PRECIO, porcentaje_cambio=3, precio_referencia=150, ventana_minutos=30))
+    db.commit()
+    service = AlertasService(db)
+
+    # +2% en la ventana: no alcanza
+    ahora = time.time()
+    historial.agregar("AAPL", 150.0, 1000, timestamp=ahora - 600)
+    historial.agregar("AAPL", 153.0, 1000, timestamp=ahora)
+    alertas_service.snapshot_precios.actualizar("AAPL", 153.0, 0, 1000)
+    assert service.evaluar_alertas(user_id)["total_activadas"] == 0
+
+    historial.agregar("AAPL", 155.0, 1000, timestamp=ahora + 1)
+    alertas_service.snapshot_precios.actualizar("AAPL", 155.0, 0, 1000)
+    resultado = service.evaluar_alertas(user_id)
+    assert resultado["total_activadas"] == 1
+    assert "en los últimos 30 min" in resultado["alertas_activadas"][0]["mensaje"]
+
+
+def test_columnas_agregadas_en_una_base_existente():
+    from sqlalchemy import inspect, text
+    from app.config.database import COLUMNAS_AGREGADAS, agregar_columnas
+
+    # Simula una base creada antes de las columnas nuevas
+    with engine.begin() as conexion:
+        for tabla, columna in COLUMNAS_AGREGADAS:
+            conexion.execute(text(f"ALTER TABLE {tabla} DROP COLUMN {columna.split()[0]}"))
+    agregar_columnas()
+    agregar_columnas()  # idempotente
+
+    for tabla, columna in COLUMNAS_AGREGADAS:
+        assert columna.split()[0] in {c["name"] for c in inspect(engine).get_columns(tabla)}
+    assert any(fk["constrained_columns"] == ["grupo_id"] for fk in inspect(engine).get_foreign_keys("condiciones_alerta"))
@@ -0,0 +1,128 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.main import app
+from app.config.database import engine
+from app.models.alertas import AlertaSimple, AlertaRango, AlertaRegistro, AlertaCompuesta, CondicionAlerta
+from app.models.usuarios import Usuarios
+from app.enums.alertas import CampoEnum, TipoCondicionEnum
+from app.services.alertas import AlertasService
+
+client = TestClient(app)
+
+def _headers():
+    response = client.post("/login", json={"correo": "demo@finz.com", "contrasena": "demo123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_ids_globales_y_gestion_de_alertas():
+    headers = _headers()
+    client.post("/alertas/simple", headers=headers, json={"ticker": "aapl", "campo": "precio", "tipo_condicion": "mayor_que", "valor": 200})
+    client.post("/alertas/rango", headers=headers, json={"ticker": "msft", "campo": "precio", "valor_minimo": 100, "valor_maximo": 200})
+
+    alertas = client.get("/alertas/mis-alertas", headers=headers).json()
+    simple, rango = alertas["simple"][0], alertas["rango"][0]
+    assert simple["ticker"] == "AAPL" and simple["tipo_condicion"] == "mayor_que"
+    assert rango["valor_maximo"] == 200
+    assert simple["id"] != rango["id"]
+
+    assert client.get(f"/alertas/{rango['id']}", headers=headers).json()["ticker"] == "MSFT"
+    assert client.put(f"/alertas/{rango['id']}/desactivar", headers=headers).status_code == 200
+    assert client.delete(f"/alertas/{simple['id']}", headers=headers).status_code == 200
+    assert client.delete(f"/alertas/{simple['id']}", headers=headers).status_code == 404
+
+    alertas = client.get("/alertas/mis-alertas", headers=headers).json()
+    assert alertas["simple"] == []
+    assert alertas["rango"][0]["activo"] is False
+
+    client.delete(f"/alertas/{rango['id']}", headers=headers)
+
+def test_sparkline_no_registra_ventanas(monkeypatch):
+    import time
+    from app.routers import alertas as alertas_router
+    from app.services.historial_intradia import HistorialIntradia
+
+    historial = HistorialIntradia(capacidad=50)
+    monkeypatch.setattr(alertas_router, "historial_intradia", historial)
+    ahora = time.time()
+    for segundos, precio in ((1200, 10.0), (600, 12.0), (300, 9.0), (0, 11.0)):
+        historial.agregar("ZZSP", precio, 1, timestamp=ahora - segundos)
+
+    headers = _headers()
+    for minutos in (15, 16, 30):
+        respuesta = client.get(f"/alertas/sparkline/zzsp?minutos={minutos}", headers=headers).json()
+    assert (respuesta["primero"], respuesta["minimo"], respuesta["maximo"]) == (10.0, 9.0, 12.0)
+    assert len(respuesta["puntos"]) == 4
+    assert historial._buffers["ZZSP"].ventanas == {}
+
+def test_sincronizar_registro_alertas_previas():
+    db = Session(engine)
+    try:
+        user_id = db.query(Usuarios).filter(Usuarios.correo == "demo@finz.com").first().id
+        previa = AlertaSimple(id=9000, user_id=user_id, ticker="NVDA", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=1)
+        db.add(previa)
+        db.commit()
+
+        service = AlertasService(db)
+        service.sincronizar_registro()
+
+        assert service.obtener_alerta_por_id(9000, user_id).ticker == "NVDA"
+        assert service._registrar("rango", user_id) > 9000
+        db.rollback()
+        assert service.eliminar_alerta(9000, user_id)
+    finally:
+        db.query(AlertaRegistro).delete()
+        db.commit()
+        db.close()
+
+
+def test_sincronizar_registro_reasigna_ids_repetidos_entre_tablas():
+    db = Session(engine)
+    try:
+        user_id = db.query(Usuarios).filter(Usuarios.correo == "demo@finz.com").first().id
+        db.add(AlertaSimple(id=9100, user_id=user_id, ticker="NVDA", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=1))
+        db.add(AlertaCompuesta(id=9100, user_id=user_id, ticker="AMD", operador_logico="AND"))
+        db.flush()
+        db.add(CondicionAlerta(alerta_compuesta_id=9100, campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MENOR_QUE, valor=5, orden=1))
+        db.commit()
+
+        service = AlertasService(db)
+        service.sincronizar_registro()
+        service.sincronizar_registro()  # idempotente
+
+        # La simple conserva su ID; la compuesta pasa a uno nuevo con sus condiciones
+        assert service.obtener_alerta_por_id(9100, user_id).ticker == "NVDA"
+        compuesta = db.query(AlertaCompuesta).filter(AlertaCompuesta.ticker == "AMD").one()
+        assert compuesta.id != 9100 and len(compuesta.condiciones) == 1
+        assert service.obtener_alerta_por_id(compuesta.id, user_id).ticker == "AMD"
+
+        assert service.desactivar_alerta(compuesta.id, user_id)
+        assert service.eliminar_alerta(compuesta.id, user_id)
+        assert service.eliminar_alerta(9100, user_id)
+    finally:
+        db.rollback()
+        db.query(AlertaRegistro).delete()
+        db.commit()
+        db.close()
+
+
+def test_sincronizar_registro_espera_a_otro_worker():
+    import threading
+    from sqlalchemy import text
+    from app.services.alertas import LOCK_SINCRONIZAR_REGISTRO
+
+    otro, db = Session(engine), Session(engine)
+    try:
+        # Otro worker está sincronizando (tiene el lock hasta su commit)
+        otro.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_SINCRONIZAR_REGISTRO})
+        hilo = threading.Thread(target=AlertasService(db).sincronizar_registro)
+        hilo.start()
+        hilo.join(0.3)
+        assert hilo.is_alive()
+        otro.commit()
+        hilo.join(5)
+        assert not hilo.is_alive()
+    finally:
+        otro.close()
+        db.rollback()
+        db.query(AlertaRegistro).delete()
+        db.commit()
+        db.close()
@@ -0,0 +1,59 @@
+# tests/test_cache_compartido.py
+from app.services.cache_compartido import ArchivoPrecios, CacheJSON, LiderRefresco
+from app.services.snapshot_precios import SnapshotPrecios
+
+
+def test_lector_ve_lo_que_escribe_el_lider(tmp_path):
+    ruta = str(tmp_path / "precios.bin")
+    lider = SnapshotPrecios(ArchivoPrecios(ruta, capacidad=8))
+    worker = SnapshotPrecios(ArchivoPrecios(ruta, capacidad=8))
+
+    assert worker.leer("AAPL") == (None, {"precio": None, "volumen": None})
+    assert lider.actualizar("AAPL", 150.0, 1.2, 1000)
+    assert lider.actualizar("MSFT", 300.0, -0.5, None)
+    assert not lider.actualizar("AAPL", 150.0, 1.2, 1000)
+    lider.actualizar("AAPL", 151.0, 1.9, 1000)
+
+    datos, versiones = worker.leer("AAPL")
+    assert datos == {"symbol": "AAPL", "price": 151.0, "change": 1.9, "volume": 1000, "stale": False}
+    assert versiones == {"precio": 2, "volumen": 1}
+    assert worker.como_dict()["MSFT"]["volume"] is None
+
+    # Un líder nuevo continúa las versiones del archivo
+    sucesor = SnapshotPrecios(ArchivoPrecios(ruta, capacidad=8))
+    sucesor.actualizar("AAPL", 152.0, 2.5, 1000)
+    assert worker.version("AAPL", "precio") == 3
+
+
+def test_cache_json_y_un_solo_lider(tmp_path):
+    escritor, lector = CacheJSON(str(tmp_path / "mag7.json")), CacheJSON(str(tmp_path / "mag7.json"))
+    assert lector.leer() == {}
+    escritor.guardar({"data": [{"ticker": "SPY"}], "year": 2025})
+    assert lector.leer()["year"] == 2025
+
+    a, b = LiderRefresco(str(tmp_path / "refresco.lock")), LiderRefresco(str(tmp_path / "refresco.lock"))
+    assert a.intentar() and a.es_lider
+    assert not b.intentar()
+    assert LiderRefresco(None).intentar()
+
+
+def test_historial_intradia_compartido_entre_workers(tmp_path):
+    from app.services.cache_compartido import ArchivoHistorial
+    from app.services.historial_intradia import HistorialIntradia
+
+    ruta = str(tmp_path / "historial.bin")
+    lider = HistorialIntradia(capacidad=4, archivo=ArchivoHistorial(ruta, capacidad=8, muestras=4))
+    worker = HistorialIntradia(capacidad=4, archivo=ArchivoHistorial(ruta, capacidad=8, muestras=4))
+
+    assert worker.serie("AAPL", 60, ahora=1000) == []
+    for i, precio in enumerate([10.0, 12.0, 9.0]):
+        lider.agregar("AAPL", precio, 100 + i, timestamp=700 + i * 60)
+    assert worker.ventana("AAPL", 10, ahora=1000) == {"primero": 10.0, "minimo": 9.0, "maximo": 12.0, "muestras": 3}
+
+    # El worker copia solo lo nuevo; el buffer circular ya pisó la primera muestra
+    lider.agregar("AAPL", 11.0, None, timestamp=880)
+    lider.agregar("AAPL", 13.0, None, timestamp=940)
+    lider.agregar("AAPL", 8.0, None, timestamp=500)  # fuera de orden: se descarta
+    assert worker.ventana("AAPL", 10, ahora=1000) == {"primero": 12.0, "minimo": 9.0, "maximo": 13.0, "muestras": 4}
+    assert [p for _, p, _ in worker.serie("AAPL", 60, ahora=1000)] == [12.0, 9.0, 11.0, 13.0]
+    assert lider.serie("AAPL", 60, ahora=1000) == worker.serie("AAPL", 60, ahora=1000)
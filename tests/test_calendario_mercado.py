@@ -0,0 +1,35 @@
+from datetime import date, datetime
+from app.services.calendario_mercado import CalendarioMercado, CompuertaMercado, TZ_NY, TZ_ARG
+
+
+def _ts(*args):
+    return TZ_NY.localize(datetime(*args)).timestamp()
+
+
+def test_feriados_medias_ruedas_y_horario_de_verano():
+    calendario = CalendarioMercado()
+    assert not calendario.esta_abierto(_ts(2026, 11, 26, 11, 0))   # Thanksgiving
+    assert not calendario.esta_abierto(_ts(2026, 7, 3, 11, 0))     # 4 de julio cae sábado
+    assert calendario.esta_abierto(_ts(2026, 11, 27, 12, 59))
+    assert not calendario.esta_abierto(_ts(2026, 11, 27, 13, 0))   # media rueda
+
+    # En Buenos Aires la apertura se corre una hora cuando EEUU cambia de horario
+    assert calendario.horario(date(2026, 3, 6))["apertura_arg"] == "11:30"
+    assert calendario.horario(date(2026, 3, 9))["apertura_arg"] == "10:30"
+
+    viernes_cierre = _ts(2026, 4, 2, 16, 30)  # el viernes siguiente es Good Friday
+    proxima = datetime.fromtimestamp(calendario.proxima_apertura(viernes_cierre), TZ_ARG)
+    assert proxima == TZ_ARG.localize(datetime(2026, 4, 6, 10, 30))
+    # Después de lo precalculado se extiende sola
+    assert calendario.proxima_apertura(_ts(2031, 12, 31, 17, 0)) == _ts(2032, 1, 2, 9, 30)
+
+
+def test_compuerta_frena_los_jobs_fuera_de_rueda():
+    compuerta = CompuertaMercado(CalendarioMercado())
+    sabado = _ts(2026, 10, 17, 12, 0)
+    assert compuerta.permitir("precios", cada=1800, ts=sabado)
+    assert not compuerta.permitir("precios", cada=1800, ts=sabado + 15)
+    assert compuerta.permitir("precios", cada=1800, ts=sabado + 1800)
+    assert not compuerta.permitir("rsi", ts=sabado)
+    assert compuerta.permitir("rsi", ts=_ts(2026, 10, 19, 10, 0))
+    assert compuerta.evitadas == {"precios": 1, "rsi": 1}
@@ -0,0 +1,49 @@
+import asyncio
+import json
+from app.services.difusion_precios import DifusionPrecios
+from app.services.snapshot_precios import SnapshotPrecios
+
+
+def _evento(texto: str) -> tuple[str, dict]:
+    evento, datos = texto.strip().split("\n")
+    return evento.removeprefix("event: "), json.loads(datos.removeprefix("data: "))
+
+
+def test_stream_difunde_solo_los_tickers_del_cliente():
+    snapshot = SnapshotPrecios()
+    snapshot.actualizar("AAPL", 150.0, 1.0, 1000)
+    difusion = DifusionPrecios(snapshot, intervalo=0.01)
+
+    async def escenario():
+        async def tickers_a():
+            return ["AAPL", "MSFT"]
+
+        async def tickers_b():
+            return ["AAPL"]
+
+        async def conectado():
+            return False
+
+        a = difusion.stream(tickers_a, conectado)
+        b = difusion.stream(tickers_b, conectado)
+        inicial = _evento(await a.__anext__())
+        await b.__anext__()
+        assert inicial == ("snapshot", {"tickers": [
+            {"symbol": "AAPL", "price": 150.0, "change": 1.0, "stale": False},
+            {"symbol": "MSFT", "price": None, "change": 0},
+        ]})
+        # Un difusor por ticker, compartido por los dos clientes
+        assert difusion.metricas() == {"clientes": 2, "tickers": 2, "eventos": 0}
+
+        snapshot.actualizar("MSFT", 300.0, -0.5, 10)
+        assert _evento(await a.__anext__()) == ("precio", {"symbol": "MSFT", "price": 300.0, "change": -0.5, "stale": False})
+        snapshot.actualizar("AAPL", 151.0, 1.5, 1000)
+        assert _evento(await b.__anext__())[1]["price"] == 151.0
+        assert _evento(await a.__anext__())[1]["price"] == 151.0
+        assert difusion.metricas()["eventos"] == 2
+
+        await a.aclose()
+        await b.aclose()
+        assert difusion.metricas() == {"clientes": 0, "tickers": 0, "eventos": 2}
+
+    asyncio.run(escenario())
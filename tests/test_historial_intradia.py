@@ -0,0 +1,33 @@
+# tests/test_historial_intradia.py
+from app.services.historial_intradia import BufferTicker, HistorialIntradia
+
+
+def test_ventana_primero_minimo_maximo():
+    buffer = BufferTicker(capacidad=100)
+    for minuto, precio in enumerate([100, 104, 98, 101, 99, 103]):
+        buffer.agregar(minuto * 60, precio, 1000)
+
+    # Últimos 3 minutos: muestras de los minutos 2..5
+    assert buffer.ventana(180, ahora=300) == {"primero": 98, "minimo": 98, "maximo": 103, "muestras": 4}
+    # Más tarde la ventana se achica sin muestras nuevas
+    assert buffer.ventana(180, ahora=420) == {"primero": 99, "minimo": 99, "maximo": 103, "muestras": 2}
+    assert buffer.ventana(180, ahora=600) is None
+
+
+def test_buffer_circular_descarta_lo_pisado():
+    buffer = BufferTicker(capacidad=4)
+    buffer.ventana(10_000, ahora=0)  # ventana registrada antes de llenar el buffer
+    for segundo, precio in enumerate([1, 50, 2, 3, 4, 5]):
+        buffer.agregar(segundo, precio, None)
+
+    assert buffer.ventana(10_000, ahora=5) == {"primero": 2, "minimo": 2, "maximo": 5, "muestras": 4}
+    assert [p for _, p, _ in buffer.serie(0)] == [2, 3, 4, 5]
+
+
+def test_historial_por_ticker():
+    historial = HistorialIntradia(capacidad=10)
+    historial.agregar("AAPL", 150.0, 10, timestamp=1000)
+    historial.agregar("AAPL", 153.0, 20, timestamp=1060)
+    assert historial.ventana("AAPL", 30, ahora=1060)["minimo"] == 150.0
+    assert historial.serie("AAPL", 1, ahora=1100) == [(1060, 153.0, 20)]
+    assert historial.ventana("MSFT", 30) is None
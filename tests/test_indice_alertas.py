@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+from app.enums.alertas import CampoEnum, TipoCondicionEnum
+from app.services.indice_alertas import IndiceAlertas
+
+def _simple(id, tipo_condicion, valor):
+    return SimpleNamespace(id=id, ticker="AAPL", campo=CampoEnum.PRECIO, tipo_condicion=tipo_condicion, valor=valor)
+
+def _indice_con_valor(alertas, valor):
+    indice = IndiceAlertas()
+    for tipo, alerta in alertas:
+        indice.agregar(tipo, alerta)
+    indice.confirmar("AAPL", "precio", valor, indice.candidatos("AAPL", "precio", valor))
+    return indice
+
+def test_cruce_solo_devuelve_umbrales_entre_precios():
+    indice = _indice_con_valor([
+        ("simple", _simple(1, TipoCondicionEnum.MAYOR_QUE, 105)),
+        ("simple", _simple(2, TipoCondicionEnum.MAYOR_QUE, 120)),
+        ("simple", _simple(3, TipoCondicionEnum.MENOR_QUE, 95)),
+    ], 100)
+
+    assert indice.candidatos("AAPL", "precio", 110) == {("simple", 1)}
+    indice.confirmar("AAPL", "precio", 110)
+    assert indice.candidatos("AAPL", "precio", 90) == {("simple", 3)}
+
+def test_pendiente_sigue_hasta_confirmar():
+    indice = _indice_con_valor([("simple", _simple(1, TipoCondicionEnum.MAYOR_QUE, 105))], 100)
+    indice.agregar("simple", _simple(2, TipoCondicionEnum.MAYOR_QUE, 90))
+
+    # El ciclo falló antes de confirmar: la alerta nueva se vuelve a evaluar
+    assert indice.candidatos("AAPL", "precio", 100) == {("simple", 2)}
+    claves = indice.candidatos("AAPL", "precio", 100)
+    indice.agregar("simple", _simple(3, TipoCondicionEnum.MAYOR_QUE, 90))
+    indice.confirmar("AAPL", "precio", 100, claves)
+    assert indice.candidatos("AAPL", "precio", 100) == {("simple", 3)}
+
+def test_rango_y_porcentaje():
+    rango = SimpleNamespace(id=7, ticker="AAPL", campo=CampoEnum.PRECIO, valor_minimo=90, valor_maximo=110)
+    porcentaje = SimpleNamespace(id=8, ticker="AAPL", campo=CampoEnum.PRECIO, porcentaje_cambio=-10, precio_referencia=100, ventana_minutos=None)
+    indice = _indice_con_valor([("rango", rango), ("porcentaje", porcentaje)], 100)
+
+    assert indice.candidatos("AAPL", "precio", 105) == set()
+    assert indice.candidatos("AAPL", "precio", 111) == {("rango", 7), ("porcentaje", 8)}
+    assert indice.candidatos("AAPL", "precio", 89) == {("rango", 7), ("porcentaje", 8)}
+
+def test_quitar_alerta():
+    indice = _indice_con_valor([("simple", _simple(1, TipoCondicionEnum.MAYOR_QUE, 105))], 100)
+    indice.quitar("simple", 1)
+
+    assert indice.candidatos("AAPL", "precio", 110) == set()
+    assert indice.tickers() == []
+
+def test_distancia_al_umbral_mas_cercano_y_niveles():
+    from app.services.planificador_precios import PlanificadorPrecios
+    indice = _indice_con_valor([
+        ("simple", _simple(1, TipoCondicionEnum.MAYOR_QUE, 102)),
+        ("simple", _simple(2, TipoCondicionEnum.MENOR_QUE, 80)),
+    ], 100)
+    assert indice.tomar_nuevos() == {"AAPL"} and indice.tomar_nuevos() == set()
+    assert indice.distancia("AAPL", 100) == 0.02
+    assert indice.distancia("AAPL", 101.5) < 0.01
+    assert indice.distancia("MSFT", 100) is None
+
+    planificador = PlanificadorPrecios(niveles=((0.01, 15), (0.05, 60), (float("inf"), 600)))
+    assert planificador.vencidos({"AAPL", "MSFT"}, ahora=0) == ["AAPL", "MSFT"]
+    assert planificador.reclasificar("AAPL", indice.distancia("AAPL", 101.5), ahora=0) == 15
+    assert planificador.reclasificar("MSFT", 0.4, ahora=0) == 600
+    assert planificador.vencidos({"AAPL", "MSFT"}, ahora=15) == ["AAPL"]
+    assert planificador.vencidos({"AAPL", "MSFT"}, urgentes={"MSFT"}, ahora=1) == ["MSFT"]
+    assert planificador.metricas() == {"tickers_por_intervalo": {"15s": 1, "600s": 1}, "refrescos_por_minuto": 4.1}
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy.orm import Session
+from app.config.database import engine
+from app.models.precios import PrecioSnapshot
+from app.services import persistencia_precios
+from app.services.snapshot_precios import SnapshotPrecios
+from app.services.historial_intradia import HistorialIntradia
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(persistencia_precios, "snapshot_precios", SnapshotPrecios())
+    monkeypatch.setattr(persistencia_precios, "historial_intradia", HistorialIntradia())
+    session = Session(engine)
+    yield session
+    session.rollback()
+    session.query(PrecioSnapshot).filter(PrecioSnapshot.ticker.in_(["ZZTA", "ZZTB"])).delete(synchronize_session=False)
+    session.commit()
+    session.close()
+
+
+def test_reinicio_arranca_con_precios_desactualizados(db):
+    persistencia_precios.guardar(db, [("ZZTA", 10.0, 1.5, 100), ("ZZTB", 20.0, -0.5, None)])
+    persistencia_precios.guardar(db, [("ZZTA", 11.0, 2.0, 150)])
+    db.commit()
+    assert db.get(PrecioSnapshot, "ZZTA").precio == 11.0
+
+    snapshot = persistencia_precios.snapshot_precios
+    assert persistencia_precios.restaurar(db) >= 2
+    datos, versiones = snapshot.leer("ZZTA")
+    assert datos == {"symbol": "ZZTA", "price": 11.0, "change": 2.0, "volume": 150, "stale": True}
+    assert versiones == {"precio": 0, "volumen": 0}
+
+    # El primer refresco lo marca al día y cuenta como cambio aunque el precio coincida
+    assert snapshot.actualizar("ZZTA", 11.0, 2.0, 150)
+    assert snapshot.leer("ZZTA") == (
+        {"symbol": "ZZTA", "price": 11.0, "change": 2.0, "volume": 150, "stale": False},
+        {"precio": 1, "volumen": 1},
+    )
+    assert snapshot.obtener("ZZTB")["stale"]
@@ -0,0 +1,72 @@
+# tests/test_pool_consultas.py
+import time
+from app.services.pool_consultas import PoolConsultas, LimiteTokens, CupoAgotado
+
+
+def test_limite_tokens_respeta_el_cupo_y_el_deadline():
+    limite = LimiteTokens(capacidad=2, periodo=60)
+    assert limite.tomar() and limite.tomar()
+    # El tercer token tarda 30s en reponerse: no llega antes del deadline
+    assert limite.tomar(deadline=time.monotonic() + 0.1) is False
+
+
+def test_mapear_en_paralelo_con_cupo_y_plazo():
+    pool = PoolConsultas(workers=4, limites={"lento": [(3, 60)]})
+
+    def consultar(ticker):
+        time.sleep(0.2)
+        return ticker.lower()
+
+    inicio = time.monotonic()
+    resultados = {ticker: (resultado, error) for ticker, resultado, error in pool.mapear("lento", consultar, ["A", "B", "C", "D"], plazo=1)}
+    pool.detener()
+
+    # Tres entran en el cupo y corren juntas; la cuarta se queda sin token dentro del plazo
+    assert time.monotonic() - inicio < 1.5
+    assert len([r for r, e in resultados.values() if e is None]) == 3
+    assert len([e for r, e in resultados.values() if isinstance(e, TimeoutError)]) == 1
+
+
+def test_libro_de_cuotas_suma_entre_procesos():
+    from datetime import datetime, timezone
+    from sqlalchemy.orm import Session
+    from app.config.database import engine
+    from app.models.cuota_api import CuotaAPI
+    from app.services.cuota_api import LibroCuotas
+
+    # Dos libros simulan dos workers que vuelcan en la misma fila del día
+    libros = [LibroCuotas(intervalo=3600, limites={"zzprueba": 10}) for _ in range(2)]
+    pool = PoolConsultas(workers=2, limites={"zzprueba": [(10, 60)]}, registro=libros[0].registrar)
+    list(pool.mapear("zzprueba", lambda x: 1 / x, [1, 0], plazo=1))
+    pool.detener()
+    libros[1].registrar("zzprueba", creditos=5)
+
+    db = Session(engine)
+    try:
+        # El libro usa su propia sesión: lo pendiente de quien lo llama no se confirma
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.add(CuotaAPI(proveedor="zzajena", dia=ahora.date(), consultas=1, creditos=1, primera_at=ahora, ultima_at=ahora))
+        db.flush()
+        libros[1].volcar()
+        uso = libros[0].uso()["zzprueba"]
+        # La consulta que falló también consumió cupo
+        assert (uso["consultas"], uso["creditos"], uso["restantes"]) == (3, 7, 3)
+        assert uso["creditos_por_minuto"] > 0
+        db.rollback()
+        assert db.query(CuotaAPI).filter(CuotaAPI.proveedor == "zzajena").count() == 0
+
+        # Las métricas salen de memoria: lo volcado más lo pendiente, sin consultar la BD
+        libros[1].registrar("zzprueba", creditos=2)
+        metricas = libros[1].metricas()["proveedores"]["zzprueba"]
+        assert (metricas["consultas"], metricas["creditos"]) == (2, 7)
+
+        # El cupo diario se controla contra la BD: con 9 de 10 créditos usados entra una sola consulta
+        libros[1].volcar()
+        otro = PoolConsultas(workers=1, limites={}, registro=libros[0].registrar, restantes=libros[0].restantes, diarios={"zzprueba"})
+        resultados = [error for _, _, error in otro.mapear("zzprueba", lambda x: x, [1, 1], plazo=5, creditos=lambda x: x)]
+        otro.detener()
+        assert resultados[0] is None and isinstance(resultados[1], CupoAgotado)
+    finally:
+        db.query(CuotaAPI).filter(CuotaAPI.proveedor == "zzprueba").delete()
+        db.commit()
+        db.close()
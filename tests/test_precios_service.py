@@ -0,0 +1,130 @@
+# tests/test_precios_service.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from app.services import precios_service
+from app.services.precios_service import PreciosService
+from app.services.cache_cotizaciones import CacheCotizaciones
+
+
+def test_snapshot_consulta_en_lotes_y_devuelve_columnas(monkeypatch):
+    lotes = []
+
+    def consultar_lote(simbolos):
+        lotes.append(simbolos)
+        return {s: {"precio": 10.0 * len(s), "volumen": 100, "cambio": 1.5} for s in simbolos if s != "XXXX"}
+
+    monkeypatch.setattr(precios_service, "cache_cotizaciones", CacheCotizaciones())
+    monkeypatch.setattr(precios_service, "TAMANO_LOTE", 2)
+    monkeypatch.setattr(PreciosService, "_consultar_lote", staticmethod(consultar_lote))
+
+    snapshot = PreciosService.obtener_snapshot(["aapl", "MSFT", "XXXX", "AAPL", "KO"], ("precio", "cambio"))
+
+    assert sorted(lotes) == [["AAPL", "MSFT"], ["XXXX", "KO"]]
+    assert snapshot == {"tickers": ["AAPL", "MSFT", "KO"], "precio": [40.0, 40.0, 20.0], "cambio": [1.5, 1.5, 1.5]}
+
+
+def test_lote_fallido_no_queda_en_cache_como_ausente(monkeypatch):
+    caido, lotes = [True], []
+
+    def consultar_lote(simbolos):
+        lotes.append(simbolos)
+        if caido[0] and "MSFT" in simbolos:
+            raise ConnectionError("timeout")
+        return {s: {"precio": 1.0, "volumen": 1, "cambio": 0.0} for s in simbolos if s != "XXXX"}
+
+    monkeypatch.setattr(precios_service, "cache_cotizaciones", CacheCotizaciones())
+    monkeypatch.setattr(precios_service, "TAMANO_LOTE", 2)
+    monkeypatch.setattr(PreciosService, "_consultar_lote", staticmethod(consultar_lote))
+
+    assert PreciosService.obtener_snapshot(["AAPL", "XXXX", "MSFT", "KO"])["tickers"] == ["AAPL"]
+    # Dentro del TTL: el lote que falló se vuelve a pedir y el ticker inválido no
+    caido[0] = False
+    lotes.clear()
+    assert PreciosService.obtener_snapshot(["AAPL", "XXXX", "MSFT", "KO"])["tickers"] == ["AAPL", "MSFT", "KO"]
+    assert lotes == [["MSFT", "KO"]]
+
+
+def test_snapshot_falla_solo_si_no_cotizo_nada(monkeypatch):
+    def consultar_lote(simbolos):
+        raise ConnectionError("sin red")
+
+    monkeypatch.setattr(precios_service, "cache_cotizaciones", CacheCotizaciones())
+    monkeypatch.setattr(PreciosService, "_consultar_lote", staticmethod(consultar_lote))
+    with pytest.raises(HTTPException) as error:
+        PreciosService.obtener_snapshot(["AAPL"])
+    assert error.value.status_code == 503
+
+
+def test_cache_reusa_y_colapsa_consultas_concurrentes(monkeypatch):
+    cache = CacheCotizaciones()
+    consultas = []
+    liberar = threading.Event()
+
+    def consultar(simbolos):
+        consultas.append(simbolos)
+        liberar.wait(timeout=5)
+        return {s: {"precio": 1.0, "volumen": 1, "cambio": 0.0} for s in simbolos}, set()
+
+    monkeypatch.setattr(precios_service, "cache_cotizaciones", cache)
+    monkeypatch.setattr(PreciosService, "_consultar", staticmethod(consultar))
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futuros = [pool.submit(PreciosService.obtener_datos, "AAPL") for _ in range(10)]
+        time.sleep(0.2)
+        liberar.set()
+        resultados = [f.result() for f in futuros]
+
+    assert consultas == [["AAPL"]]
+    assert all(r == {"precio": 1.0, "volumen": 1} for r in resultados)
+    assert PreciosService.obtener_dato("AAPL", "precio") == 1.0
+    metricas = cache.metricas()
+    assert metricas["misses"] == 1 and metricas["coalescidas"] + metricas["hits"] == 10
+
+
+def test_nivel_rapido_consulta_al_proveedor_en_cada_ciclo(monkeypatch):
+    from sqlalchemy.orm import Session
+    from app.config.database import engine
+    from app.jobs import precios_job
+    from app.models.alertas import AlertaSimple
+    from app.models.usuarios import Usuarios
+    from app.enums.alertas import CampoEnum, TipoCondicionEnum
+    from app.services.planificador_precios import PlanificadorPrecios
+    from app.services.snapshot_precios import SnapshotPrecios
+    from app.services.historial_intradia import HistorialIntradia
+
+    reloj = [1000.0]
+    consultas = []
+
+    def consultar(simbolos):
+        consultas.append(reloj[0])
+        reloj[0] += 2  # una consulta lenta: el refresco termina 2s después del inicio del ciclo
+        return {s: {"precio": 100.0, "volumen": 1, "cambio": 0.0} for s in simbolos}, set()
+
+    monkeypatch.setattr(time, "monotonic", lambda: reloj[0])
+    monkeypatch.setattr(precios_service, "cache_cotizaciones", CacheCotizaciones())
+    monkeypatch.setattr(PreciosService, "_consultar", staticmethod(consultar))
+    monkeypatch.setattr(precios_job, "planificador_precios", PlanificadorPrecios())
+    monkeypatch.setattr(precios_job, "snapshot_precios", SnapshotPrecios())
+    monkeypatch.setattr(precios_job, "historial_intradia", HistorialIntradia())
+    monkeypatch.setattr(precios_job.persistencia_precios, "guardar", lambda db, cotizaciones: None)
+    monkeypatch.setattr(precios_job.indice_alertas, "distancia", lambda ticker, precio: 0.001)
+
+    db = Session(engine)
+    user_id = db.query(Usuarios.id).filter(Usuarios.correo == "demo@finz.com").scalar()
+    alerta = AlertaSimple(user_id=user_id, ticker="ZZPA", campo=CampoEnum.PRECIO, tipo_condicion=TipoCondicionEnum.MAYOR_QUE, valor=101)
+    db.add(alerta)
+    db.commit()
+    try:
+        for ciclo in range(4):
+            reloj[0] = 1000.0 + ciclo * 15
+            precios_job.actualizar_precios_cache()
+    finally:
+        db.delete(alerta)
+        db.commit()
+        db.close()
+
+    # Nivel de 15s: una consulta real por ciclo, sin hits del cache ni ciclos salteados
+    assert consultas == [1000.0, 1015.0, 1030.0, 1045.0]
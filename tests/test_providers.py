@@ -0,0 +1,98 @@
+# tests/test_providers.py
+from datetime import date
+from app.providers.replay import ProveedorReplay
+from app.providers import registro
+from app.services import precios_service
+from app.services.cache_cotizaciones import CacheCotizaciones
+from app.services.precios_service import PreciosService
+from app.services.rsi_service import RSIService
+
+
+def test_replay_es_deterministico_por_semilla():
+    a, b, c = ProveedorReplay(semilla=1), ProveedorReplay(semilla=1), ProveedorReplay(semilla=2)
+    serie_a = [a.cotizaciones(["AAPL", "MSFT"]) for _ in range(5)]
+    serie_b = [b.cotizaciones(["AAPL", "MSFT"]) for _ in range(5)]
+    serie_c = [c.cotizaciones(["AAPL", "MSFT"]) for _ in range(5)]
+
+    assert serie_a == serie_b
+    assert serie_a != serie_c
+    assert len({fila["AAPL"]["precio"] for fila in serie_a}) > 1
+    assert a.barras_diarias("AAPL", date(2024, 1, 1)) == b.barras_diarias("AAPL", date(2024, 1, 1))
+    assert a.fundamentales("AAPL") == b.fundamentales("AAPL") != c.fundamentales("AAPL")
+
+
+def test_replay_sirve_fixtures_grabadas():
+    proveedor = ProveedorReplay(fixtures={
+        "cotizaciones": {"AAPL": [{"precio": 10.0, "volumen": 1, "cambio": 0.0}, {"precio": 11.0, "volumen": 2, "cambio": 10.0}]},
+        "rsi": {"AAPL": {"valor": 72.5, "fecha": "2024-05-01"}},
+        "earnings": {"AAPL": ["2024-05-02", "2024-08-01"]},
+        "fundamentales": {"AAPL": {"nombre": "Apple Inc.", "pe_ratio": 30.1}},
+    })
+    assert [proveedor.cotizaciones(["AAPL"])["AAPL"]["precio"] for _ in range(3)] == [10.0, 11.0, 10.0]
+    assert proveedor.earnings("AAPL", date(2024, 1, 1), date(2024, 6, 30)) == [date(2024, 5, 2)]
+    assert proveedor.fundamentales("AAPL") == {"nombre": "Apple Inc.", "pe_ratio": 30.1}
+
+    registro.configurar_proveedor(proveedor)
+    try:
+        assert RSIService.obtener_rsi_proveedor(["aapl"]) == {"AAPL": {"ticker": "AAPL", "rsi_value": 72.5, "timestamp": "2024-05-01"}}
+    finally:
+        registro.configurar_proveedor(None)
+
+
+def test_precios_service_usa_el_proveedor_configurado(monkeypatch):
+    monkeypatch.setattr(precios_service, "cache_cotizaciones", CacheCotizaciones())
+    proveedor = ProveedorReplay(semilla=3)
+    registro.configurar_proveedor(proveedor)
+    try:
+        snapshot = PreciosService.obtener_snapshot(["AAPL", "KO", "MSFT"])
+    finally:
+        registro.configurar_proveedor(None)
+
+    assert snapshot["tickers"] == ["AAPL", "KO", "MSFT"]
+    assert proveedor.llamadas["cotizaciones"] == 1
+
+
+def test_twelvedata_pide_varios_simbolos_en_una_consulta(monkeypatch):
+    from app.providers import twelvedata
+    from app.services import rsi_service
+    from app.services.pool_consultas import PoolConsultas
+
+    class Respuesta:
+        status_code = 200
+
+        def __init__(self, datos):
+            self.datos = datos
+
+        def json(self):
+            return self.datos
+
+    pedidos = []
+
+    def get(url, params, timeout):
+        simbolos = params["symbol"].split(",")
+        pedidos.append(simbolos)
+        # Indexada por símbolo salvo con uno solo; un símbolo desconocido viene con error propio
+        datos = {
+            s: {"status": "error", "message": "not found"} if s == "ZZZ" else
+               {"values": [{"datetime": "2024-05-01", "rsi": "55.123"}], "status": "ok"}
+            for s in simbolos
+        }
+        return Respuesta(datos if len(simbolos) > 1 else datos[simbolos[0]])
+
+    monkeypatch.setenv("TWELVEDATA_API_KEY", "x")
+    monkeypatch.setattr(twelvedata.requests, "get", get)
+    registros = []
+    pool = PoolConsultas(workers=2, limites={"twelvedata": [(3, 1)]}, registro=lambda p, creditos: registros.append(creditos))
+    monkeypatch.setattr(rsi_service, "pool_consultas", pool)
+    registro.configurar_proveedor(twelvedata.ProveedorTwelveData())
+    try:
+        resultado = RSIService.obtener_rsi_proveedor(["aapl", "msft", "zzz", "ko"])
+    finally:
+        registro.configurar_proveedor(None)
+        pool.detener()
+
+    # Lotes del tamaño del cupo por minuto; cada lote registra un crédito por símbolo
+    assert sorted(map(len, pedidos)) == [1, 3]
+    assert sorted(registros) == [1, 3]
+    assert sorted(resultado) == ["AAPL", "KO", "MSFT"]
+    assert resultado["AAPL"]["rsi_value"] == 55.12
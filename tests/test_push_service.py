@@ -0,0 +1,118 @@
+# tests/test_push_service.py
+import base64
+import os
+from types import SimpleNamespace
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from pywebpush import WebPushException
+from sqlalchemy.orm import Session
+from app.config.database import engine
+from app.models.notificaciones import Suscripcion
+from app.services.push_service import DespachadorPush, EmisorPush
+
+
+class EmisorFalso:
+    firmas = 0
+
+    def __init__(self, estados):
+        self.estados = list(estados)
+        self.llamadas = 0
+
+    def enviar(self, subscription_info, data, timeout=None):
+        self.llamadas += 1
+        estado = self.estados.pop(0)
+        if estado > 202:
+            raise WebPushException("error", response=SimpleNamespace(status_code=estado))
+
+    def cerrar(self):
+        pass
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).decode().strip("=")
+
+
+def _suscripcion(endpoint: str) -> dict:
+    clave = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return {"endpoint": endpoint, "keys": {"p256dh": _b64(clave), "auth": _b64(os.urandom(16))}}
+
+
+def test_reintenta_errores_transitorios():
+    emisor = EmisorFalso([503, 201])
+    despachador = DespachadorPush(emisor, workers=2, backoff=0)
+    try:
+        assert despachador.encolar({"endpoint": "x"}, "t", "b").result(timeout=5) is True
+    finally:
+        despachador.detener()
+
+    metricas = despachador.metricas()
+    assert emisor.llamadas == 2
+    assert metricas["enviadas"] == 1 and metricas["reintentos"] == 1
+
+
+def test_plazo_corta_los_reintentos():
+    import time
+    emisor = EmisorFalso([503, 503, 503, 503])
+    despachador = DespachadorPush(emisor, workers=1, backoff=1)
+    try:
+        inicio = time.monotonic()
+        # El backoff de 1s no entra en el plazo: un solo intento y se resuelve enseguida
+        assert despachador.encolar({"endpoint": "x"}, "t", "b", plazo=0.5).result(timeout=5) is False
+        assert time.monotonic() - inicio < 0.5
+    finally:
+        despachador.detener()
+
+    assert emisor.llamadas == 1
+
+
+def test_no_reintenta_suscripcion_vencida():
+    despachador = DespachadorPush(EmisorFalso([410]), workers=1, backoff=0)
+    try:
+        assert despachador.encolar({"endpoint": "x"}, "t", "b").result(timeout=5) is False
+    finally:
+        despachador.detener()
+
+    assert despachador.metricas()["fallidas"] == 1
+    assert despachador.metricas()["reintentos"] == 0
+
+
+def test_emisor_firma_una_vez_por_origen_y_borra_vencidas(monkeypatch):
+    clave_privada = ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value.to_bytes(32, "big")
+    emisor = EmisorPush(clave_privada=_b64(clave_privada), email="test@finz.com")
+    enviados = []
+
+    def post(sesion, endpoint, data=None, headers=None, timeout=None):
+        enviados.append((sesion, headers["Authorization"]))
+        estado = 410 if endpoint.endswith("vencida") else 201
+        return SimpleNamespace(status_code=estado, reason="", text="")
+
+    monkeypatch.setattr(requests.Session, "post", post)
+    db = Session(engine)
+    try:
+        db.add(Suscripcion(user_id=999001, subscription_data=_suscripcion("https://fcm.googleapis.com/fcm/send/vencida")))
+        db.commit()
+
+        for endpoint in ("https://fcm.googleapis.com/fcm/send/a", "https://fcm.googleapis.com/fcm/send/b"):
+            emisor.enviar(_suscripcion(endpoint), "{}")
+        try:
+            emisor.enviar(_suscripcion("https://fcm.googleapis.com/fcm/send/vencida"), "{}")
+            assert False, "un 410 debe lanzar WebPushException"
+        except WebPushException as e:
+            assert e.response.status_code == 410
+
+        # Mismo origen: una sola firma, misma sesión y mismo token
+        assert emisor.firmas == 1
+        assert len({id(sesion) for sesion, _ in enviados}) == 1
+        assert len({token for _, token in enviados}) == 1
+        assert db.query(Suscripcion).filter(Suscripcion.user_id == 999001).count() == 0
+
+        emisor.enviar(_suscripcion("https://updates.push.services.mozilla.com/wpush/v2/c"), "{}")
+        assert emisor.firmas == 2
+    finally:
+        db.query(Suscripcion).filter(Suscripcion.user_id == 999001).delete()
+        db.commit()
+        db.close()
+        emisor.cerrar()
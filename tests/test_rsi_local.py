@@ -0,0 +1,151 @@
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config.database import engine
+from app.models.rsi import RSIEstado
+from app.providers import registro
+from app.providers.replay import ProveedorReplay
+from app.services.calendario_mercado import calendario_mercado
+from app.services.rsi_local import MotorRSI, rsi_wilder
+
+
+def _rsi_escalar(cierres, periodo=14):
+    deltas = np.diff(cierres)
+    subas, bajas = np.clip(deltas, 0, None), np.clip(-deltas, 0, None)
+    prom_suba, prom_baja = subas[:periodo].mean(), bajas[:periodo].mean()
+    for suba, baja in zip(subas[periodo:], bajas[periodo:]):
+        prom_suba = (prom_suba * (periodo - 1) + suba) / periodo
+        prom_baja = (prom_baja * (periodo - 1) + baja) / periodo
+    return 100 - 100 / (1 + prom_suba / prom_baja)
+
+
+def test_rsi_wilder_vectorizado_coincide_con_el_calculo_por_ticker():
+    rng = np.random.default_rng(7)
+    cierres = 100 * np.cumprod(1 + rng.normal(0, 0.02, (3, 120)), axis=1)
+    matriz = cierres.copy()
+    matriz[1, :60] = np.nan   # ticker con menos historia
+    matriz[2, :110] = np.nan  # sin cierres suficientes
+
+    rsi = rsi_wilder(matriz)
+    assert np.isclose(rsi[0], _rsi_escalar(cierres[0]))
+    assert np.isclose(rsi[1], _rsi_escalar(cierres[1, 60:]))
+    assert np.isnan(rsi[2])
+    assert rsi_wilder([np.arange(1, 20)])[0] == 100.0
+
+
+def test_motor_descarga_la_historia_una_vez_por_dia(monkeypatch):
+    from app.services import rsi_local
+    from app.services.pool_consultas import PoolConsultas
+
+    proveedor = ProveedorReplay(semilla=3)
+    registro.configurar_proveedor(proveedor)
+    registrados = []
+    pool = PoolConsultas(workers=2, limites={"replay": [(60, 60)]}, registro=lambda fuente, creditos: registrados.append((fuente, creditos)))
+    monkeypatch.setattr(rsi_local, "pool_consultas", pool)
+    monkeypatch.setattr(MotorRSI, "_precios_de_hoy", staticmethod(lambda tickers, hoy: {"AAPL": 500.0}))
+    try:
+        motor = MotorRSI()
+        primero = motor.calcular(["aapl", "MSFT"])
+        segundo = motor.calcular(["AAPL", "MSFT"])
+    finally:
+        registro.configurar_proveedor(None)
+        pool.detener()
+
+    assert proveedor.llamadas["barras"] == 2
+    # Un lote de dos símbolos son dos consultas a Yahoo: dos créditos
+    assert registrados == [("replay", 2)]
+    assert set(primero) == {"AAPL", "MSFT"} and primero == segundo
+    # El precio actual entra como cierre de hoy
+    assert primero["AAPL"]["valor"] > primero["MSFT"]["valor"] and primero["AAPL"]["valor"] > 70
+
+
+def _barras(hasta: date, sin: date | None = None) -> list[dict]:
+    rng = np.random.default_rng(11)
+    barras, fecha, cierre = [], date(2025, 1, 2), 100.0
+    while fecha <= hasta:
+        if calendario_mercado.es_dia_habil(fecha):
+            cierre = round(cierre * (1 + rng.normal(0, 0.02)), 2)
+            if fecha != sin:
+                barras.append({"fecha": fecha.isoformat(), "cierre": cierre})
+        fecha += timedelta(days=1)
+    return barras
+
+
+def test_estado_avanza_en_o1_y_recalcula_solo_con_huecos(monkeypatch):
+    monkeypatch.setattr(MotorRSI, "_precios_de_hoy", staticmethod(lambda tickers, hoy: {}))
+    db = Session(engine)
+    try:
+        registro.configurar_proveedor(ProveedorReplay(fixtures={"barras": {"ZZRA": _barras(date(2026, 9, 30)), "ZZRB": _barras(date(2026, 9, 30), sin=date(2026, 9, 2))}}))
+        primero = MotorRSI()
+        primero.calcular(["ZZRA", "ZZRB"], db, hoy=date(2026, 9, 1))
+        db.commit()
+        assert db.get(RSIEstado, "ZZRA").fecha_barra == date(2026, 8, 31)
+
+        # Otro proceso (o un reinicio) retoma el estado guardado y solo avanza las barras nuevas
+        siguiente = MotorRSI()
+        incremental = siguiente.calcular(["ZZRA", "ZZRB"], db, hoy=date(2026, 9, 3))
+        assert siguiente.avances == 2 and siguiente.recalculos == 1  # ZZRB tiene un hueco el 2/9
+        assert incremental["ZZRA"]["fecha"] == "2026-09-02" and not incremental["ZZRA"]["provisorio"]
+
+        completo = MotorRSI().calcular(["ZZRA"], hoy=date(2026, 9, 3))
+        assert np.isclose(incremental["ZZRA"]["valor"], completo["ZZRA"]["valor"])
+
+        # Split 2:1 con la serie ajustada hacia atrás: el cierre guardado ya no coincide y se recalcula
+        ajustadas = [{**barra, "cierre": round(barra["cierre"] / 2, 2)} for barra in _barras(date(2026, 9, 30))]
+        registro.configurar_proveedor(ProveedorReplay(fixtures={"barras": {"ZZRA": ajustadas}}))
+        otro = MotorRSI()
+        ajustado = otro.calcular(["ZZRA"], db, hoy=date(2026, 9, 4))
+        assert otro.avances == 0 and otro.recalculos == 1
+        assert np.isclose(ajustado["ZZRA"]["valor"], MotorRSI().calcular(["ZZRA"], hoy=date(2026, 9, 4))["ZZRA"]["valor"])
+        db.commit()
+        db.expire_all()
+        cierre_ajustado = next(barra["cierre"] for barra in ajustadas if barra["fecha"] == "2026-09-03")
+        assert np.isclose(db.get(RSIEstado, "ZZRA").ultimo_cierre, cierre_ajustado)
+    finally:
+        registro.configurar_proveedor(None)
+        db.rollback()
+        db.query(RSIEstado).filter(RSIEstado.ticker.in_(["ZZRA", "ZZRB"])).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+def test_mis_rsi_en_una_consulta_sin_importar_los_seguimientos():
+    from datetime import datetime
+    from sqlalchemy import event
+    from app.models.rsi import RSI, SeguimientoRSI
+    from app.models.usuarios import Usuarios
+    from app.services.rsi_service import RSIService
+
+    db = Session(engine)
+    tickers = ["ZZRA", "ZZRB", "ZZRC"]
+    try:
+        user_id = db.query(Usuarios.id).filter(Usuarios.correo == "demo@finz.com").scalar()
+        db.add_all([SeguimientoRSI(user_id=user_id, ticker=t) for t in tickers])
+        db.add_all([
+            RSI(ticker="ZZRA", rsi_value=25.0, timestamp=datetime.now() - timedelta(days=1)),
+            RSI(ticker="ZZRA", rsi_value=75.0, timestamp=datetime.now()),
+            RSI(ticker="ZZRB", rsi_value=50.0, timestamp=datetime.now() - timedelta(hours=1)),
+        ])
+        db.commit()
+
+        consultas = []
+        escuchar = lambda *args: consultas.append(args[2])
+        event.listen(engine, "before_cursor_execute", escuchar)
+        try:
+            filas = RSIService.obtener_rsi_seguimientos(db, user_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", escuchar)
+
+        assert len(consultas) == 1
+        por_ticker = {fila["ticker"]: fila for fila in filas}
+        assert [fila["ticker"] for fila in filas] == tickers
+        assert por_ticker["ZZRA"]["rsi_value"] == 75.0 and por_ticker["ZZRA"]["es_dato_en_vivo"]
+        assert por_ticker["ZZRB"]["signal"] == "neutral" and not por_ticker["ZZRB"]["es_dato_en_vivo"]
+        assert por_ticker["ZZRC"]["tiene_datos"] is False
+        assert len({fila["proxima_actualizacion"] for fila in filas}) == 1
+    finally:
+        db.rollback()
+        db.query(SeguimientoRSI).filter(SeguimientoRSI.ticker.in_(tickers)).delete(synchronize_session=False)
+        db.query(RSI).filter(RSI.ticker.in_(tickers)).delete(synchronize_session=False)
+        db.commit()
+        db.close()